@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""Generates many timelines in parallel, for example a month of daily operational timelines.
+
+Each *Job* is a *Configuration File* together with a start date, a duration and a TLE. The jobs are run in a pool of
+processes, each job in its own output directory below the output directory of the batch, where the *Science Mode Timeline*,
+the *XML-Timeline* and a log of the job are saved. A job which fails does not stop the other jobs. When all jobs are done a
+summary is logged and saved as *batch_summary.json* in the output directory of the batch.
+
+The batch can also be run from the command line, for example 30 daily timelines starting at 2022/11/04 12:00:00::
+
+    python -m mats_planningtool.Batch configfile.json "2022/11/04 12:00:00" --days 30 -o Output_batch
+
+"""
+
+import argparse
+import concurrent.futures
+import datetime as DT
+import json
+import logging
+import os
+import time
+import traceback
+
+from mats_planningtool import configFile as configFile
+from mats_planningtool.OrbitSimulator import Ephemeris
+
+Logger = logging.getLogger("OPT_logger")
+
+"Name of the summary saved in the output directory of a batch"
+SUMMARY_FILE = "batch_summary.json"
+
+"Name of the log saved in the output directory of each job"
+JOB_LOG_FILE = "job.log"
+
+
+class Job:
+    """A timeline to generate.
+
+    Attributes:
+        config_file (str): Path to the *Configuration File*.
+        start_date (str): Start date of the timeline ('%Y/%m/%d %H:%M:%S'). The date in the *Configuration File* is used if None.
+        duration (int): Duration of the timeline [s]. The duration in the *Configuration File* is used if None.
+        TLE (list of str): The two rows of the TLE. The TLE in the *Configuration File* is used if None.
+        name (str): Name of the job, used as the name of its output directory.
+
+    """
+
+    def __init__(self, config_file, start_date=None, duration=None, TLE=None, name=None):
+        if isinstance(start_date, DT.datetime):
+            start_date = start_date.strftime("%Y/%m/%d %H:%M:%S")
+        self.config_file = config_file
+        self.start_date = start_date
+        self.duration = duration
+        self.TLE = TLE
+        if name is None:
+            name = os.path.splitext(os.path.basename(config_file))[0]
+            if start_date is not None:
+                name = name + "_" + DT.datetime.strptime(start_date, "%Y/%m/%d %H:%M:%S").strftime("%Y%m%d-%H%M%S")
+        self.name = name
+
+    def __repr__(self):
+        return "Job(" + self.name + ")"
+
+    def configure(self, output_dir):
+        """Creates the *configFile* of the job.
+
+        Arguments:
+            output_dir (str): Output directory of the job.
+
+        Returns:
+            (:obj:`configFile`): The config file.
+
+        """
+        TLE = self.TLE if self.TLE is not None else [None, None]
+        configfile = configFile.configFile(self.config_file, self.start_date, TLE1=TLE[0], TLE2=TLE[1])
+
+        if self.duration is not None:
+            configfile.Timeline_settings()["duration"]["day"] = 0
+            configfile.Timeline_settings()["duration"]["hours"] = int(self.duration // 3600)
+            configfile.Timeline_settings()["duration"]["seconds"] = int(self.duration % 3600)
+            configfile.set_duration()
+
+            "Mode120 can not search for stars after the end of the timeline"
+            TimeToConsider = configfile.Mode120_settings()["TimeToConsider"]
+            if TimeToConsider["TimeToConsider"] > self.duration:
+                TimeToConsider["hours"] = int(self.duration // 3600)
+                TimeToConsider["seconds"] = int(self.duration % 3600)
+                TimeToConsider["TimeToConsider"] = int(self.duration)
+
+        configfile.output_dir = output_dir
+        return configfile
+
+
+def daily_jobs(config_file, start_date, days, TLE=None, duration=24 * 3600):
+    """Returns one job per day.
+
+    Arguments:
+        config_file (str): Path to the *Configuration File*.
+        start_date (str or :obj:`datetime.datetime`): Start date of the first timeline ('%Y/%m/%d %H:%M:%S').
+        days (int): Number of timelines.
+        TLE (list of str): The two rows of the TLE, used for all timelines.
+        duration (int): Duration of each timeline [s].
+
+    Returns:
+        (list of :obj:`Job`): The jobs.
+
+    """
+    if not isinstance(start_date, DT.datetime):
+        start_date = DT.datetime.strptime(start_date, "%Y/%m/%d %H:%M:%S")
+
+    return [Job(config_file, start_date + DT.timedelta(days=day), duration, TLE) for day in range(days)]
+
+
+def run_job(job, output_dir, xml=True, use_cache=True):
+    """Generates the *Science Mode Timeline*, and the *XML-Timeline* if *xml* is True, of a job.
+
+    Everything logged while the job runs is also written to *JOB_LOG_FILE* in the output directory of the job.
+    Errors are caught and returned in the result so that the other jobs of a batch can continue.
+
+    Arguments:
+        job (:obj:`Job`): The job.
+        output_dir (str): Output directory of the batch. The job is run in a subdirectory named after the job.
+        xml (bool): If the *XML-Timeline* is generated.
+        use_cache (bool): Sets *configFile.use_cache*.
+
+    Returns:
+        (dict): Result of the job with the keys 'name', 'output_dir', 'succeeded', 'error', 'runtime' [s] and 'files'.
+
+    """
+    job_dir = os.path.join(output_dir, job.name)
+    os.makedirs(job_dir, exist_ok=True)
+
+    "The logger of OPT is set up again by each program, so the log of the job is attached to the root logger"
+    handler = logging.FileHandler(os.path.join(job_dir, JOB_LOG_FILE), mode="w")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)6s : %(message)s :: %(module)s :: %(funcName)s"))
+    root_logger = logging.getLogger()
+    root_logger.addHandler(handler)
+
+    result = {"name": job.name, "output_dir": job_dir, "succeeded": False, "error": None, "runtime": 0, "files": []}
+    start = time.time()
+    try:
+        configfile = job.configure(job_dir)
+        configfile.use_cache = use_cache
+        "The jobs of a batch already use all cores"
+        configfile.processes = 1
+        configfile.CheckConfigFile()
+        configfile.Timeline_gen()
+        if xml:
+            configfile.XML_gen()
+        result["succeeded"] = True
+    except Exception:
+        result["error"] = traceback.format_exc()
+        Logger.error("Job " + job.name + " failed:\n" + result["error"])
+    finally:
+        result["runtime"] = time.time() - start
+        result["files"] = sorted(name for name in os.listdir(job_dir) if name != JOB_LOG_FILE)
+        root_logger.removeHandler(handler)
+        handler.close()
+
+    return result
+
+
+def run_batch(jobs, output_dir, processes=None, xml=True, use_cache=True):
+    """Runs jobs in a pool of processes.
+
+    Arguments:
+        jobs (list of :obj:`Job`): The jobs. Their names must be unique.
+        output_dir (str): Output directory of the batch.
+        processes (int): Number of processes. Defaults to the number of cores.
+        xml (bool): If the *XML-Timeline* of each job is generated.
+        use_cache (bool): Sets *configFile.use_cache*.
+
+    Returns:
+        (list of dict): The results of the jobs, in the same order as *jobs*. See *run_job*.
+
+    """
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("The names of the jobs of a batch must be unique")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=Ephemeris.prewarm) as executor:
+        futures = [executor.submit(run_job, job, output_dir, xml, use_cache) for job in jobs]
+        results = []
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except Exception:
+                "The process running the job died"
+                results.append(
+                    {
+                        "name": job.name,
+                        "output_dir": os.path.join(output_dir, job.name),
+                        "succeeded": False,
+                        "error": traceback.format_exc(),
+                        "runtime": 0,
+                        "files": [],
+                    }
+                )
+
+    write_summary(results, output_dir)
+    return results
+
+
+def write_summary(results, output_dir):
+    """Logs which jobs failed and saves the results as *SUMMARY_FILE* in the output directory of the batch.
+
+    Arguments:
+        results (list of dict): The results of the jobs, see *run_job*.
+        output_dir (str): Output directory of the batch.
+
+    Returns:
+        (list of dict): The results of the jobs which failed.
+
+    """
+    failed = [result for result in results if not result["succeeded"]]
+
+    Logger.info(str(len(results) - len(failed)) + " of " + str(len(results)) + " jobs succeeded")
+    for result in failed:
+        Logger.error("Job " + result["name"] + " failed: " + result["error"].strip().splitlines()[-1])
+
+    with open(os.path.join(output_dir, SUMMARY_FILE), "w") as summary_file:
+        json.dump(results, summary_file, indent=2)
+
+    return failed
+
+
+def main(args):
+    if (args.TLE1 is None) != (args.TLE2 is None):
+        raise ValueError("Both rows of the TLE must be given")
+    TLE = [args.TLE1, args.TLE2] if args.TLE1 is not None else None
+    jobs = daily_jobs(args.configfile, args.start_date, args.days, TLE, args.duration)
+    results = run_batch(jobs, args.output_dir, args.processes, xml=not args.no_xml, use_cache=not args.no_cache)
+
+    return 0 if all(result["succeeded"] for result in results) else 1
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Generate one timeline per day in parallel")
+
+    parser.add_argument("configfile",
+                        help="input config file")
+    parser.add_argument("start_date",
+                        help="start date of the first timeline ('%%Y/%%m/%%d %%H:%%M:%%S')")
+    parser.add_argument("-d", "--days", type=int, default=1,
+                        help="number of timelines")
+    parser.add_argument("--duration", type=int, default=24 * 3600,
+                        help="duration of each timeline [s]")
+    parser.add_argument("-o", "--output-dir", dest="output_dir", default="Output",
+                        help="output directory of the batch")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="number of processes (default: number of cores)")
+    parser.add_argument("--tle1", dest="TLE1",
+                        help="first row of the TLE")
+    parser.add_argument("--tle2", dest="TLE2",
+                        help="second row of the TLE")
+    parser.add_argument("--no-xml", dest="no_xml",
+                        help="only generate the Science Mode Timelines", action="store_true")
+    parser.add_argument("--no-cache", dest="no_cache",
+                        help="recalculate cached simulation results", action="store_true")
+
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(parse_arguments()))
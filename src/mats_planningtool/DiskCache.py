@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Content addressed on-disk cache for results of expensive simulations.
+
+Results are pickled into a cache directory, one file per key. The key is a hash of the inputs of the simulation
+together with *CACHE_VERSION* and the version of OPT, so that results are recalculated whenever the inputs or the code change.
+The version of OPT is "unknown" when running from a checkout, so *CACHE_VERSION* must be increased by hand whenever a
+change of the code (for example in *Mode120*, *MatsBana* or *Propagator*) changes the cached results.
+When the total size of the cache directory grows above *MAX_SIZE*, the least recently used entries are removed.
+
+The cache is used when *configFile.use_cache* is True (default), and can be bypassed with the
+*--no-cache* flag of *generate.py*.
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+from mats_planningtool import __version__
+
+Logger = logging.getLogger("OPT_logger")
+
+"Version of the cached results, increase whenever a change of the code changes them"
+CACHE_VERSION = 1
+
+"Name of the cache directory, created inside of the output directory"
+CACHE_DIR = "Cache"
+
+"Maximum total size of the cache directory [bytes]"
+MAX_SIZE = 500 * 1024 ** 2
+
+_SUFFIX = ".pkl"
+
+
+def cache_key(*inputs):
+    """Returns the key of a cache entry.
+
+    Arguments:
+        *inputs: JSON serializable inputs which determine the cached result. Datetimes and other objects are converted with *str*.
+
+    Returns:
+        (str): The key.
+
+    """
+    content = json.dumps([CACHE_VERSION, __version__, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class DiskCache:
+    """Directory of pickled results, evicted by least recent use.
+
+    Attributes:
+        directory (str): Path to the cache directory.
+        max_size (int): Maximum total size of the cache directory [bytes].
+
+    """
+
+    def __init__(self, directory, max_size=MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def __contains__(self, key):
+        return os.path.isfile(self._path(key))
+
+    def get(self, key):
+        """Returns the cached result of a key, or None if there is none."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                value = pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            Logger.warning("Corrupt cache entry removed: " + path)
+            self._remove(path)
+            return None
+
+        "Mark the entry as recently used"
+        os.utime(path)
+        return value
+
+    def put(self, key, value):
+        """Saves a result in the cache and evicts old entries if the cache is too large."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temporary_path = path + ".tmp" + str(os.getpid())
+        with open(temporary_path, "wb") as cache_file:
+            pickle.dump(value, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the cache is smaller than *max_size*."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            Logger.debug("Evicting cache entry: " + path)
+            self._remove(path)
+            size -= entry_size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def cached(configFile, key, function):
+    """Returns the cached result of a key, calling *function* and caching its result on a miss.
+
+    Arguments:
+        configFile (obj): The config file, gives *use_cache* and the output directory.
+        key (str): Key of the result, see *cache_key*.
+        function (function): Function without arguments which calculates the result.
+
+    Returns:
+        The result.
+
+    """
+    if not getattr(configFile, "use_cache", True):
+        return function()
+
+    cache = DiskCache(os.path.join(configFile.output_dir, CACHE_DIR))
+    value = cache.get(key)
+    if value is not None:
+        Logger.info("Result read from cache: " + key)
+        return value
+
+    value = function()
+    try:
+        cache.put(key, value)
+    except OSError:
+        Logger.warning("Result could not be saved to the cache: " + key)
+    return value
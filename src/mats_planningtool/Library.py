@@ -2,12 +2,14 @@
 """Functions that are commonly used by the Operational Planning Tool.
 """
 
+import bisect
 import ephem
 import datetime as DT
 import time
 import logging
 import os
 import sys
+import numpy as np
 from pylab import (
     cos,
     sin,
@@ -24,9 +26,11 @@ from pylab import (
 )
 from skyfield import api
 
+from mats_planningtool.OrbitSimulator import Ephemeris, GeoidLib, Propagator
+from mats_planningtool.RunContext import RunHandler, current_run, outside_of_runs
 
-timescale_skyfield = api.load.timescale()
-database_skyfield = api.load("de421.bsp")
+
+timescale_skyfield = Ephemeris.timescale()
 
 
 def rot_arbit(angle, u_v):
@@ -159,20 +163,245 @@ def lat_calculator(Satellite_skyfield, date):
 
     date_skyfield = timescale_skyfield.utc(year, month, day, hour, minute, second)
 
-    satellite_geo = Satellite_skyfield.at(date_skyfield)
-    satellite_subpoint = satellite_geo.subpoint()
-    latitude = satellite_subpoint.latitude.degrees
+    position_km = Propagator.position_velocity(Satellite_skyfield, date_skyfield)[0]
+    latitude = GeoidLib.ecef2geodetic(GeoidLib.eci2ecef(position_km*1e3, GeoidLib.rotation_to_itrs(date_skyfield)), deg=True)[0][0]
 
     return latitude
 
 
+class _ScheduledDates(list):
+    """List of (startDate, endDate) of one Mode/CMD in an *OccupiedTimeline*, which keeps the index of the timeline up to date."""
+
+    def __init__(self, Occupied_Timeline, dates=()):
+        super().__init__(dates)
+        self._Occupied_Timeline = Occupied_Timeline
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def append(self, dates):
+        super().append(dates)
+        self._Occupied_Timeline._add(dates)
+
+    def _changed(method):
+        def wrapper(self, *args):
+            result = method(self, *args)
+            self._Occupied_Timeline._rebuild = True
+            return result
+        return wrapper
+
+    extend = _changed(list.extend)
+    insert = _changed(list.insert)
+    remove = _changed(list.remove)
+    pop = _changed(list.pop)
+    clear = _changed(list.clear)
+    __setitem__ = _changed(list.__setitem__)
+    __delitem__ = _changed(list.__delitem__)
+    __iadd__ = _changed(list.__iadd__)
+    del _changed
+
+
+class OccupiedTimeline(dict):
+    """Dictionary of the scheduled Modes/CMDs with a sorted index of all their scheduled dates.
+
+    Works as the *Occupied_Timeline* dictionary, with keys equal to planned and scheduled Modes/CMDs and entries equal to lists of
+    their start and end dates as duples of datetime.datetime. All dates are also kept in a list sorted by start date together
+    with the running maximum of the end dates, so that free time can be found with binary search instead of by
+    comparing with every scheduled date.
+
+    Dates appended to the lists of the dictionary are inserted into the index directly. Other changes to the lists cause the
+    index to be rebuilt the next time it is used.
+
+    """
+
+    def __init__(self, Occupied_Timeline=None):
+        super().__init__()
+        self._intervals = []
+        self._starts = []
+        self._max_ends = []
+        self._rebuild = False
+        if Occupied_Timeline is not None:
+            self.update(Occupied_Timeline)
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    def __setitem__(self, key, dates):
+        super().__setitem__(key, _ScheduledDates(self, dates))
+        self._rebuild = True
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._rebuild = True
+
+    def update(self, *args, **kwargs):
+        for key, dates in dict(*args, **kwargs).items():
+            self[key] = dates
+
+    def setdefault(self, key, dates=()):
+        if key not in self:
+            self[key] = dates
+        return self[key]
+
+    def pop(self, *args):
+        self._rebuild = True
+        return super().pop(*args)
+
+    def popitem(self):
+        self._rebuild = True
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self._rebuild = True
+
+    def insert(self, key, date, endDate):
+        """Schedules a Mode/CMD.
+
+        Arguments:
+            key (str): Name of the Mode/CMD.
+            date (:obj:`datetime.datetime`): The scheduled startdate.
+            endDate (:obj:`datetime.datetime`): The scheduled end-date.
+
+        """
+        self.setdefault(key).append((date, endDate))
+
+    def _add(self, dates):
+        if type(dates[0]) is ephem.Date:
+            raise TypeError('busy_date is ephem date and not datetime')
+        if self._rebuild:
+            return
+        x = bisect.bisect_right(self._intervals, dates)
+        self._intervals.insert(x, dates)
+        self._starts.insert(x, dates[0])
+        del self._max_ends[x:]
+
+    def _index(self):
+        "Rebuilds the index if needed and updates the running maximum of the end dates"
+        if self._rebuild:
+            self._intervals = []
+            self._rebuild = False
+            for busy_dates in self.values():
+                for busy_date in busy_dates:
+                    if type(busy_date[0]) is ephem.Date:
+                        raise TypeError('busy_date is ephem date and not datetime')
+                    self._intervals.append(busy_date)
+            self._intervals.sort()
+            self._starts = [busy_date[0] for busy_date in self._intervals]
+            self._max_ends = []
+
+        for busy_date in self._intervals[len(self._max_ends):]:
+            if self._max_ends:
+                self._max_ends.append(max(self._max_ends[-1], busy_date[1]))
+            else:
+                self._max_ends.append(busy_date[1])
+
+    def intervals(self):
+        """Returns all scheduled dates as a list of (startDate, endDate) sorted in chronological order."""
+        self._index()
+        return list(self._intervals)
+
+    def first_free_slot(self, date, duration):
+        """Finds the earliest start date, not before *date*, at which a Mode/CMD of length *duration* does not collide with anything scheduled.
+
+        Arguments:
+            date (:obj:`datetime.datetime`): The earliest wanted startdate.
+            duration (:obj:`datetime.timedelta`): The length of the Mode/CMD.
+
+        Returns:
+            (tuple): tuple containing:
+
+                - **date** (*datetime.datetime*): The first available startdate.
+                - **iterations** (*int*): The number of times the date got postponed.
+
+        """
+        self._index()
+        iterations = 0
+        while True:
+            endDate = date + duration
+            "Scheduled dates starting before endDate (or at date if the duration is zero) can collide"
+            if duration:
+                x = bisect.bisect_left(self._starts, endDate)
+            else:
+                x = bisect.bisect_right(self._starts, date)
+            if x == 0 or self._max_ends[x-1] <= date:
+                return date, iterations
+            "Postpone to the end of the latest ending of them, no earlier start is available"
+            date = self._max_ends[x-1]
+            iterations = iterations + 1
+
+    def overlaps(self, date, endDate, touching=True):
+        """Checks if anything scheduled collides with a Mode/CMD from *date* to *endDate*.
+
+        Arguments:
+            date (:obj:`datetime.datetime`): The startdate of the Mode/CMD.
+            endDate (:obj:`datetime.datetime`): The end-date of the Mode/CMD, after *date*.
+            touching (bool): If scheduled dates which only touch *date* or *endDate* collide.
+
+        Returns:
+            (bool): True if the Mode/CMD collides with any scheduled date.
+
+        """
+        self._index()
+        "Only the scheduled dates starting before endDate can collide, the latest ending of them decides"
+        if touching:
+            x = bisect.bisect_right(self._starts, endDate)
+            return x > 0 and self._max_ends[x-1] >= date
+        x = bisect.bisect_left(self._starts, endDate)
+        return x > 0 and self._max_ends[x-1] > date
+
+    def gaps(self, start, end):
+        """Yields the free time between *start* and *end*, with overlapping scheduled dates merged.
+
+        Arguments:
+            start (:obj:`datetime.datetime`): Start of the time to consider.
+            end (:obj:`datetime.datetime`): End of the time to consider.
+
+        Yields:
+            (tuple): (startDate, endDate) of each free window, in chronological order.
+
+        """
+        self._index()
+        free_from = start
+        "Skip the scheduled dates which all end before start"
+        x = bisect.bisect_right(self._max_ends, start)
+        for busy_start, busy_end in self._intervals[x:]:
+            if free_from >= end:
+                return
+            if busy_start > free_from:
+                yield free_from, min(busy_start, end)
+            if busy_end > free_from:
+                free_from = busy_end
+        if free_from < end:
+            yield free_from, end
+
+    def free_windows(self, start, end, min_duration=DT.timedelta(0), separation=DT.timedelta(0)):
+        """Yields the windows where a Mode can fill out the free time between *start* and *end*.
+
+        Free time shorter than *min_duration* is skipped. Each window ends *separation* before the next scheduled date (or *end*).
+
+        Arguments:
+            start (:obj:`datetime.datetime`): Start of the time to consider.
+            end (:obj:`datetime.datetime`): End of the time to consider.
+            min_duration (:obj:`datetime.timedelta`): The least amount of free time needed for a window.
+            separation (:obj:`datetime.timedelta`): Time to leave free at the end of each window.
+
+        Yields:
+            (tuple): (startDate, endDate) of each window, in chronological order.
+
+        """
+        for free_start, free_end in self.gaps(start, end):
+            if free_end - free_start > min_duration:
+                yield free_start, free_end - separation
+
+
 def scheduler(Occupied_Timeline, date, endDate):
     """ Function that checks if the scheduled time is available.
 
     Changes the date until available or until no time is determined to be available.
 
     Arguments:
-        Occupied_Timeline (dict): A dictionary of currently planned Modes containing lists with their scheduled times ([startDate, endDate]) as ephem.Date class.
+        Occupied_Timeline (:obj:`OccupiedTimeline`): A dictionary of currently planned Modes containing lists with their scheduled times ([startDate, endDate]) as datetime.datetime.
         date (:obj:`datetime.datetime`): The scheduled startdate of the current Mode.
         endDate (:obj:`datetime.datetime`): The scheduled end-date of the current Mode.
 
@@ -185,43 +414,83 @@ def scheduler(Occupied_Timeline, date, endDate):
 
     """
 
-    iterations = 0
-    restart = True
-    "## Checks if date is available and postpones starting date of mode until available"
-    while restart == True:
-        restart = False
-
-        "Extract the start and end dates of scheduled mode"
-        for busy_dates in Occupied_Timeline.values():
-            if restart:
-                break
-            if busy_dates == []:
-                continue
-            else:
+    if type(date) is ephem.Date:
+        raise TypeError('date is ephem date and not datetime')
 
-                "Extract the start and end date of each instance of a scheduled mode"
-                for busy_date in busy_dates:
+    if not isinstance(Occupied_Timeline, OccupiedTimeline):
+        Occupied_Timeline = OccupiedTimeline(Occupied_Timeline)
 
-                    if type(busy_date[0]) is ephem.Date:
-                        raise TypeError('busy_date is ephem date and not datetime')
-                    if type(date) is ephem.Date:
-                        raise TypeError('date is ephem date and not datetime')
+    "## Postpones starting date of mode until available"
+    duration = endDate - date
+    date, iterations = Occupied_Timeline.first_free_slot(date, duration)
+    endDate = date + duration
 
-                    "If the planned date collides with any already scheduled ones -> post-pone and restart loop"
-                    if (
-                        busy_date[0] <= date < busy_date[1]
-                        or busy_date[0] < endDate <= busy_date[1]
-                        or (date < busy_date[0] and endDate > busy_date[1])
-                    ):
+    return date, endDate, iterations
 
-                        endDate = endDate + abs(date - busy_date[1])
-                        date = busy_date[1]
 
-                        iterations = iterations + 1
-                        restart = True
-                        break
+def find_crossings(function, start, end, coarse_step, tolerance=0.01):
+    """Finds the times when continuous functions of time cross zero.
 
-    return date, endDate, iterations
+    The functions are first evaluated on a coarse grid from *start* to *end*. Every step of the grid where a function
+    changes sign is then refined by bisection, all of them at once, until the crossing is known within *tolerance*.
+    Crossings which happen twice within one step of the coarse grid cancel out and are not found.
+
+    Arguments:
+        function (function): Takes an array of times [s] and returns the values of the functions at those times, with shape (N,) or (N,M).
+        start (float): Start of the search [s].
+        end (float): End of the search [s].
+        coarse_step (float): Step of the coarse grid [s].
+        tolerance (float): Accuracy of the crossing times [s].
+
+    Returns:
+        (tuple): tuple containing:
+
+            - **crossings** (*array*): Sorted times of the crossings [s]. The first time with the new sign, within *tolerance*.
+            - **columns** (*array*): Index of the function which crosses zero at each time.
+
+    """
+
+    times = np.arange(start, end, coarse_step)
+    times = np.append(times, end) if len(times) == 0 or times[-1] < end else times
+    signs = np.asarray(function(times)).reshape(len(times), -1) > 0
+
+    steps, columns = np.nonzero(signs[1:] != signs[:-1])
+    upper = refine_crossings(
+        lambda middle: np.asarray(function(middle)).reshape(len(middle), -1)[np.arange(len(middle)), columns],
+        times[steps], times[steps + 1], tolerance, signs[steps, columns])
+
+    order = np.argsort(upper, kind="stable")
+    return upper[order], columns[order]
+
+
+def refine_crossings(function, lower, upper, tolerance=0.01, signs=None):
+    """Refines the times when continuous functions of time cross zero by bisection, all of them at once.
+
+    Arguments:
+        function (function): Takes an array of times [s], one for each crossing, and returns the value of the function of each crossing at its time.
+        lower (array): Times before the crossings [s].
+        upper (array): Times after the crossings [s], where the functions have the other sign.
+        tolerance (float): Accuracy of the crossing times [s].
+        signs (array): If the functions are positive at *lower*. Evaluated if None.
+
+    Returns:
+        (array): Times of the crossings [s]. The first time with the new sign, within *tolerance*.
+
+    """
+
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    if len(lower) == 0:
+        return upper
+    initial_signs = np.asarray(function(lower)) > 0 if signs is None else signs
+
+    while np.max(upper - lower) > tolerance:
+        middle = (lower + upper) / 2
+        before = (np.asarray(function(middle)) > 0) == initial_signs
+        lower = np.where(before, middle, lower)
+        upper = np.where(before, upper, middle)
+
+    return upper
 
 
 def dict_comparator(dict1, dict2, Logger=None):
@@ -246,7 +515,8 @@ def dict_comparator(dict1, dict2, Logger=None):
 
     "Check if the dictionaries are different"
     if dict1 != dict2:
-        dict_new = dict2
+        "Copied, so that the settings of the Configuration File are not changed"
+        dict_new = dict(dict2)
         "Loop through keys and exchange values"
         for key in dict1.keys():
             dict_new[key] = dict1[key]
@@ -302,6 +572,8 @@ def onboardTime_to_utc(onboardGPSTime):
 def SetupLogger(LoggerName):
     """Removes previous handlers and sets up a logger with both a file handler and a stream handler.
 
+    If called during a run (see *RunContext*), the handlers are set up for that run only and the handlers of other runs are kept.
+
     Arguments:
         LoggerName (str): The name of the Logger.
 
@@ -311,30 +583,43 @@ def SetupLogger(LoggerName):
 
     Logger = logging.getLogger(LoggerName)
     name = sys._getframe(1).f_code.co_name
+    run = current_run()
     "######## Try to Create a directory for storage of Logs #######"
     try:
         os.mkdir("Logs_" + name)
     except:
         pass
 
-    "Remove all previous handlers of the logger"
-    for handler in Logger.handlers[:]:
-        Logger.removeHandler(handler)
-
     timestr = time.strftime("%Y%m%d-%H%M%S")
-    logstring = os.path.join("Logs_" + name, name + "__" + timestr + ".log")
+    if run is None:
+        logstring = os.path.join("Logs_" + name, name + "__" + timestr + ".log")
+    else:
+        logstring = os.path.join("Logs_" + name, name + "__" + timestr + "_run" + str(run.id) + ".log")
     Handler = logging.FileHandler(logstring, mode="a")
     formatter = logging.Formatter(
         "%(levelname)6s : %(message)-80s :: %(module)s :: %(funcName)s"
     )
     Handler.setFormatter(formatter)
-    Logger.addHandler(Handler)
     Logger.setLevel(logging.DEBUG)
 
     streamHandler = logging.StreamHandler()
     streamHandler.setLevel(logging.INFO)
     streamHandler.setFormatter(formatter)
-    Logger.addHandler(streamHandler)
+
+    if run is not None:
+        run.set_handlers([Handler, streamHandler])
+        if not any(isinstance(handler, RunHandler) for handler in Logger.handlers):
+            Logger.addHandler(RunHandler())
+        return
+
+    "Remove all previous handlers of the logger, except the one passing records on to the current run"
+    for handler in Logger.handlers[:]:
+        if not isinstance(handler, RunHandler):
+            Logger.removeHandler(handler)
+
+    for handler in [Handler, streamHandler]:
+        handler.addFilter(outside_of_runs)
+        Logger.addHandler(handler)
 
 
 def calculate_time_per_row(NCOL, NCBIN, NCBINFPGA, NRSKIP, NROW, NRBIN, NFLUSH):
@@ -865,11 +1150,7 @@ def SunAngle(PositionVector, SimulationTime):
         year, month, day, hour, minute, second
     )
 
-    Sun = database_skyfield["Sun"]
-    Earth = database_skyfield["Earth"]
-
-    SunFromEarth = Earth.at(current_time_skyfield).observe(Sun)
-    r_SunFromEarth_km = SunFromEarth.position.km
+    r_SunFromEarth_km = Ephemeris.position("Sun", current_time_skyfield)
 
     SunAngle = arccos(
         dot(PositionVector, r_SunFromEarth_km)
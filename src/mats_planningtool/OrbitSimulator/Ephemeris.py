@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Process wide provider of the Skyfield timescale and the JPL ephemeris.
+
+The timescale and the ephemeris kernel (*de421.bsp*) are loaded once, the first time they are requested,
+and are then shared by every module of OPT. The segments of the SPK kernel are memory mapped by jplephem,
+so only the parts of the file that are actually evaluated are read from disk.
+
+Call *prewarm* at startup to load everything up front instead of on the first simulated timestep.
+
+The geocentric positions of the Sun, the Moon and the planets change smoothly over hours, so *position* does not
+evaluate the kernel at every time asked for. It interpolates tables of the astrometric position and velocity of the body,
+sampled every *TABLE_STEP* and built once per body and day (see *BodyTable*), with a cubic Hermite spline.
+The *TABLE_CACHE_SIZE* most recently used tables are kept, so long running processes do not keep every day they covered.
+The interpolated directions agree with the kernel to about a milliarcsecond.
+
+"""
+
+import functools
+import logging
+
+import numpy as np
+from scipy.interpolate import CubicHermiteSpline, CubicSpline
+from skyfield import api
+
+Logger = logging.getLogger("OPT_logger")
+
+"Name of the ephemeris kernel, looked for in the current directory and downloaded if missing"
+EPHEMERIS_FILE = "de421.bsp"
+
+_timescale = None
+_ephemeris = None
+_bodies = {}
+
+"Spacing of the samples of the interpolation tables of *position* [days]"
+TABLE_STEP = 1 / 24
+
+"Largest number of interpolation tables kept, a month of tables for the Sun, the Moon and the planets, apparent and astrometric"
+TABLE_CACHE_SIZE = 512
+
+
+def timescale():
+    """Returns the shared Skyfield timescale.
+
+    Returns:
+        (:obj:`skyfield.timelib.Timescale`): The timescale.
+
+    """
+    global _timescale
+
+    if _timescale is None:
+        _timescale = api.load.timescale(builtin=True)
+
+    return _timescale
+
+
+def ephemeris():
+    """Returns the shared ephemeris kernel, loading it on the first call.
+
+    Returns:
+        (:obj:`skyfield.jpllib.SpiceKernel`): The ephemeris defined by *EPHEMERIS_FILE*.
+
+    """
+    global _ephemeris
+
+    if _ephemeris is None:
+        Logger.debug("Loading ephemeris: " + EPHEMERIS_FILE)
+        _ephemeris = api.load(EPHEMERIS_FILE)
+
+    return _ephemeris
+
+
+def body(name):
+    """Returns a body of the shared ephemeris.
+
+    Arguments:
+        name (str): Name of the body as known by the kernel, for example 'Earth', 'Sun', 'Moon', 'Mars' or 'JUPITER BARYCENTER'.
+
+    Returns:
+        (:obj:`skyfield.vectorlib.VectorFunction`): The body.
+
+    """
+
+    key = name.upper()
+    if key not in _bodies:
+        _bodies[key] = ephemeris()[name]
+
+    return _bodies[key]
+
+
+def earth():
+    """Returns the Earth of the shared ephemeris."""
+    return body("Earth")
+
+
+def sun():
+    """Returns the Sun of the shared ephemeris."""
+    return body("Sun")
+
+
+def moon():
+    """Returns the Moon of the shared ephemeris."""
+    return body("Moon")
+
+
+def prewarm():
+    """Loads the timescale, the ephemeris and the bodies used by OPT.
+
+    Meant to be called once at startup so that the cost of loading is not paid inside the simulations.
+
+    """
+
+    timescale()
+    for name in ["Earth", "Sun", "Moon", "Mars", "JUPITER BARYCENTER"]:
+        body(name)
+
+
+class BodyTable:
+    """Interpolation table of the position of a body as observed from the center of the Earth over one day.
+
+    The day starts at the Julian date *day* (TT). The table holds the astrometric position and velocity sampled every *TABLE_STEP*,
+    from the start to the end of the day, which are interpolated with a cubic Hermite spline. For the apparent position the
+    corrections for aberration and deflection, which change slowly, are sampled at the same times and added with a cubic spline.
+
+    Attributes:
+        name (str): Name of the body as known by the kernel.
+        day (float): Start of the day as a Julian date (TT), a whole number.
+        apparent (bool): If the table holds the apparent position, corrected for aberration and deflection, instead of the astrometric position.
+        spline (:obj:`scipy.interpolate.CubicHermiteSpline`): Astrometric position [km] as a function of the time since *day* [days].
+        correction (:obj:`scipy.interpolate.CubicSpline`): Apparent minus astrometric position [km], None if not *apparent*.
+
+    """
+
+    def __init__(self, name, day, apparent=False):
+        self.name = name
+        self.day = day
+        self.apparent = apparent
+        samples = np.linspace(0, 1, int(round(1 / TABLE_STEP)) + 1)
+        astrometric = earth().at(timescale().tt_jd(day, samples)).observe(body(name))
+        self.spline = CubicHermiteSpline(samples, astrometric.position.km.T, astrometric.velocity.km_per_s.T * 86400, axis=0)
+        self.correction = None
+        if apparent:
+            self.correction = CubicSpline(samples, (astrometric.apparent().position.km - astrometric.position.km).T, axis=0)
+
+    def __call__(self, fraction):
+        """Returns the interpolated position.
+
+        Arguments:
+            fraction (array): Time since the start of the day [days], between 0 and 1.
+
+        Returns:
+            (array): Positions [km] in GCRS with shape (len(fraction),3).
+
+        """
+        if self.correction is None:
+            return self.spline(fraction)
+        return self.spline(fraction) + self.correction(fraction)
+
+
+def table(name, day, apparent=False):
+    """Returns the interpolation table of a body for a day, building it unless it is one of the *TABLE_CACHE_SIZE* most recently used.
+
+    Arguments:
+        name (str): Name of the body as known by the kernel.
+        day (float): Start of the day as a Julian date (TT), a whole number.
+        apparent (bool): See *BodyTable*.
+
+    Returns:
+        (:obj:`BodyTable`): The table.
+
+    """
+
+    return _table(name.upper(), float(day), apparent)
+
+
+@functools.lru_cache(maxsize=TABLE_CACHE_SIZE)
+def _table(name, day, apparent):
+    return BodyTable(name, day, apparent)
+
+
+def position(name, times, apparent=False):
+    """Returns the position of a body as observed from the center of the Earth, interpolated in tables.
+
+    The same as *earth().at(times).observe(body(name)).position.km*, or with *.apparent()* if *apparent* is True,
+    but with time along the first axis. The position as observed from somewhere else close to the Earth is found
+    by subtracting the GCRS position of the observer.
+
+    Arguments:
+        name (str): Name of the body as known by the kernel, for example 'Sun', 'Moon', 'Mars' or 'JUPITER BARYCENTER'.
+        times (:obj:`skyfield.timelib.Time`): One or several times.
+        apparent (bool): If the apparent position is returned instead of the astrometric position.
+
+    Returns:
+        (array): Positions [km] in GCRS with shape (3,) for one time, or (N,3).
+
+    """
+
+    "The Julian date is split into whole days and fractions, to not lose precision"
+    whole = np.atleast_1d(times.whole).astype(float)
+    fraction = np.atleast_1d(times.tt_fraction).astype(float)
+    days = np.floor(fraction)
+    whole, fraction = np.broadcast_arrays(whole + days, fraction - days)
+
+    positions = np.empty(whole.shape + (3,))
+    for day in np.unique(whole):
+        today = whole == day
+        positions[today] = table(name, day, apparent)(fraction[today])
+
+    if np.ndim(times.tt) == 0:
+        return positions[0]
+    return positions
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Calendar of the events of MATS during a timeline, used by the *Operational Science Modes* of *XML_gen*.
+
+The events are the changes of the conditions which decide when the UV and nadir CCDs are switched on and off:
+
+    - Nadir eclipse entry and exit, when the solar zenith angle below MATS crosses *NADIR_ECLIPSE_ANGLE*.
+    - Terminator crossings (dusk and dawn), when the solar zenith angle below MATS crosses 90 degrees.
+    - Ascending and descending nodes, when the latitude of MATS crosses 0.
+    - Latitude crossings of the LP, when the latitude of the LP crosses a limit (see *EventCalendar.latitude_condition*).
+
+The events are found once per orbit table (see *OrbitTable*), that is once per TLE and timeline, from the columns of the table
+on a coarse grid which are refined with *Library.find_crossings*. The modes then look up the events and the conditions at any
+time in the calendar instead of simulating MATS.
+
+"""
+
+import logging
+
+import ephem
+import numpy as np
+
+from mats_planningtool.Library import find_crossings
+from mats_planningtool.OrbitSimulator.OrbitTable import get_orbit_table
+
+Logger = logging.getLogger("OPT_logger")
+
+"Radius of the Earth [m] and altitude where the Sun is deemed to reflect in the atmosphere, determining night and day below MATS [m]"
+R_MEAN = 6371000
+HEIGHT_ABOVE_SURFACE = 35000
+
+"Solar zenith angle below MATS when nadir enters eclipse [degrees]"
+NADIR_ECLIPSE_ANGLE = np.rad2deg(np.arccos(R_MEAN / (R_MEAN + HEIGHT_ABOVE_SURFACE))) + 90
+
+"Step of the coarse grid used to find the events [s]"
+COARSE_STEP = 60
+
+"Accuracy of the times of the events [s]"
+TOLERANCE = 0.01
+
+"Conditions in every calendar, with the column of the orbit table, the value where it changes and the events when it becomes true and false"
+CONDITIONS = {
+    "nadir_eclipse": ("SolarZenithAngleNadir", NADIR_ECLIPSE_ANGLE, "nadir_eclipse_entry", "nadir_eclipse_exit"),
+    "nadir_night": ("SolarZenithAngleNadir", 90, "dusk", "dawn"),
+    "northern": ("Latitude [degrees]", 0, "ascending_node", "descending_node"),
+}
+
+_calendars = {}
+
+
+class EventCalendar:
+    """Sorted times of the events of MATS during a timeline.
+
+    A condition is true where a column of the orbit table is above (or below) a value. The events of a condition are the times when
+    it becomes true and false, which alternate. All times are ephem dates.
+
+    Attributes:
+        table (:obj:`OrbitTable`): The orbit table the events are found in.
+        start (float): Start of the calendar (ephem date).
+        end (float): End of the calendar (ephem date).
+        conditions (dict): For each condition, its value at *start* (bool) and the sorted times when it changes (array).
+
+    """
+
+    def __init__(self, table, duration):
+        self.table = table
+        self.start = float(ephem.Date(table.start))
+        self.end = self.start + duration * ephem.second
+        self.conditions = {}
+        self._names = {name: CONDITIONS[name][2:] for name in CONDITIONS}
+        self._events = None
+
+        self.add_conditions({name: (column, value, 1) for name, (column, value, *_) in CONDITIONS.items()})
+
+    def add_conditions(self, conditions):
+        """Finds the changes of conditions and adds them to the calendar.
+
+        Arguments:
+            conditions (dict): For each name, the column of the orbit table, the value where the condition changes and
+                the sign (1 if the condition is true above the value, -1 if below).
+
+        """
+        names = list(conditions)
+        columns = [conditions[name] for name in names]
+        duration = (self.end - self.start) / ephem.second
+
+        def values(seconds):
+            return np.stack([sign * (self.table.column(column, seconds) - value) for column, value, sign in columns], axis=1)
+
+        crossings, indices = find_crossings(values, 0, duration, COARSE_STEP, TOLERANCE)
+        initial = values(np.array([0.0]))[0] > 0
+        for index, name in enumerate(names):
+            self.conditions[name] = (bool(initial[index]), self.start + crossings[indices == index] * ephem.second)
+        self._events = None
+
+    def latitude_condition(self, lat):
+        """Returns the name of the condition that the LP is beyond a latitude limit, adding it to the calendar if needed.
+
+        The condition is the same as *MODES.check_lat*: the latitude of the LP is above *lat* if *lat* is positive and below *lat*
+        if it is negative. Its events are named '<name>_entry' and '<name>_exit'.
+
+        Arguments:
+            lat (float): Latitude limit [degrees]. The condition is always true if -999.
+
+        Returns:
+            (str): The name of the condition.
+
+        """
+        name = "LP_latitude_" + str(lat)
+        if name not in self.conditions:
+            if lat == -999:
+                self.conditions[name] = (True, np.zeros(0))
+                self._events = None
+            else:
+                self.add_conditions({name: ("EstimatedLatitude_LP [degrees]", lat, -1 if lat < 0 else 1)})
+            self._names[name] = (name + "_entry", name + "_exit")
+        return name
+
+    def event_names(self, name):
+        """Returns the names of the events of a condition.
+
+        Arguments:
+            name (str): Name of the condition.
+
+        Returns:
+            (tuple): The names of the events when the condition becomes true and false.
+
+        """
+        return self._names[name]
+
+    def state(self, name, time):
+        """Returns the value of a condition at a time.
+
+        Arguments:
+            name (str): Name of the condition.
+            time (float or array): The times (ephem dates). Times outside of the calendar get the value at its start or end.
+
+        Returns:
+            (bool or array): The value of the condition.
+
+        """
+        initial, changes = self.conditions[name]
+        return np.searchsorted(changes, time, side="right") % 2 == (0 if initial else 1)
+
+    def events(self, start=None, end=None, kinds=None):
+        """Returns the events between two times.
+
+        Arguments:
+            start (float): Start of the interval (ephem date), included. Defaults to the start of the calendar.
+            end (float): End of the interval (ephem date), included. Defaults to the end of the calendar.
+            kinds (list of str): Names of the events to return. All events if None.
+
+        Returns:
+            (list of tuple): The events as (time, name), sorted by time.
+
+        """
+        if self._events is None:
+            times, names = [], []
+            for condition, (initial, changes) in self.conditions.items():
+                true, false = self._names[condition]
+                times.append(changes)
+                names.append(np.where(np.arange(len(changes)) % 2 == (1 if initial else 0), true, false))
+            times = np.concatenate(times)
+            order = np.argsort(times, kind="stable")
+            self._events = (times[order], np.concatenate(names)[order])
+
+        times, names = self._events
+        first = 0 if start is None else np.searchsorted(times, start, side="left")
+        last = len(times) if end is None else np.searchsorted(times, end, side="right")
+        return [(float(time), str(name)) for time, name in zip(times[first:last], names[first:last])
+                if kinds is None or name in kinds]
+
+    def next_event(self, time, kinds=None):
+        """Returns the first event after a time.
+
+        Arguments:
+            time (float): The time (ephem date), not included.
+            kinds (list of str): Names of the events to look for. All events if None.
+
+        Returns:
+            (tuple): The event as (time, name), or None if there is none before the end of the calendar.
+
+        """
+        for event in self.events(np.nextafter(time, np.inf), None, kinds):
+            return event
+        return None
+
+
+def get_event_calendar(configFile, Timeline_settings):
+    """Returns the event calendar of a timeline, finding the events the first time it is asked for.
+
+    Arguments:
+        configFile (obj): The config file, gives the TLE and the output directory.
+        Timeline_settings (dict): Settings of the timeline, gives the start date, duration and yaw settings.
+
+    Returns:
+        (:obj:`EventCalendar`): The calendar, covering the timeline at *StandardPointingAltitude*.
+
+    """
+    table = get_orbit_table(configFile, Timeline_settings)
+    if table.key not in _calendars:
+        Logger.info("Finding the events of the timeline")
+        _calendars[table.key] = EventCalendar(table, Timeline_settings["duration"]["duration"])
+    return _calendars[table.key]
@@ -21,42 +21,57 @@
 #  MA 02110-1301, USA.
 #  
 #  
+"""WGS84 geodesy for the simulation of MATS.
+
+All functions take NumPy arrays as well as scalars. Vectors are arrays with shape (N,3) and rotation matrices arrays
+with shape (N,3,3), with time along the first axis, so that a whole time series is converted at once.
+The rotations between ECI (GCRS) and ECEF (ITRS) are calculated once with *rotation_to_itrs* and then passed on.
+
+"""
 #WGS84
+import numpy as np
 from numpy import cos, sin, tan, pi,arcsin, arctan, arctan2,sqrt, abs
+from skyfield.constants import tau
+from skyfield.functions import mxm, rot_z
+from mats_planningtool.OrbitSimulator import Propagator
 a=6378137.0
 #f=298.257223563
 #e=1/f
 f=1/298.257223563
 #f=1e-6
 e=sqrt(f*(2-f))  # fixat per lantmeteriet sida 2021-1-07 
+"Semi-minor axis, square of the eccentricity and square of the second eccentricity"
+b=a*(1-f)
+e2=f*(2-f)
+ep2=e2/(1-e2)
 def Rcurv (phi) : 
     Rn=a/sqrt(1-e*e*(sin(phi)**2))
     return Rn
 def geodetic_lat2geocentric_lat (phi, h=0.0,deg=True) :
     if deg :
-        phi*=pi/180
+        phi=phi*pi/180
     Rn=Rcurv(phi)
     phi_c=arctan((1-e**2*Rn/(Rn+h))*tan(phi))
     if deg :
-        phi_c*=180/pi
+        phi_c=phi_c*180/pi
     return phi_c
     
 def geocentric_lat2geodetic_lat (phi_c, h=0.0, deg=True):
     if deg :
-        phi_c*=pi/180
+        phi_c=phi_c*pi/180
     Rn=Rcurv(phi_c)
     phi=arctan(tan(phi_c)/(1-e*e*Rn/(Rn+h)))
     #recompute Rn using phi
     Rn=Rcurv(phi)
     phi=arctan(tan(phi_c)/(1-e*e*Rn/(Rn+h)))
     if deg :
-        phi*=180/pi
+        phi=phi*180/pi
     return phi
     
 def geodetic2xyzECEF (phi,lamda,h=0.0,deg=True):
     if deg :
-        phi*=pi/180
-        lamda*=pi/180
+        phi=phi*pi/180
+        lamda=lamda*pi/180
     Rn=Rcurv(phi)
     x=(Rn+h)*cos(phi)*cos(lamda)
     y=(Rn+h)*cos(phi)*sin(lamda)
@@ -64,31 +79,137 @@ def geodetic2xyzECEF (phi,lamda,h=0.0,deg=True):
     return [x,y,z]
     
 def xyxECEF2geodetic (x,y,z, deg=False):
-    lamda=arctan2(y,x)
-    r=sqrt(x*x+y*y+z*z)
-    p=sqrt(x*x+y*y)
-    phi_c=arcsin(z/r)
-    phi_iter=phi_c
-    phi=0.0
-    Rn=Rcurv(phi_iter)
-    counter = 0
-    while abs(phi-phi_iter)>0.00000000001:
-        phi=phi_iter
-        h=p/cos(phi_iter)-Rn
-        Rn=Rcurv(phi_iter)
-        phi_iter = arctan(z/p/(1-e*e*Rn/(Rn+h)))
-        counter+=1
-    phi=phi_iter    
-    h=p/cos(phi)-Rn
-    if deg :
-        phi*=180/pi
-        lamda*=180/pi
+    phi,lamda,h=ecef2geodetic(np.stack(np.broadcast_arrays(x,y,z),axis=-1),deg=deg)
     return [phi,lamda,h]    
         
 def earth_radius (phi,deg=False):
     if deg :
-        phi/=180/pi
+        phi=phi/(180/pi)
     return sqrt(1./(cos(phi)**2/a**2+sin(phi)**2/(a*(1-f))**2));
-        
-    
-    
\ No newline at end of file
+
+
+def rotation_to_itrs(current_time_skyfield):
+    """Rotation matrices from ECI (GCRS) to ECEF (ITRS).
+
+    Arguments:
+        current_time_skyfield (:obj:`skyfield.timelib.Time`): Time object with one or several times.
+
+    Returns:
+        (array): Rotation matrices with shape (N,3,3).
+
+    """
+    "As *skyfield.framelib.itrs.rotation_at*, with the interpolated nutation of *Propagator.equinox_of_date*"
+    M, gast = Propagator.equinox_of_date(current_time_skyfield)
+    R = mxm(rot_z(-gast * tau / 24), M)
+    if current_time_skyfield.ts.polar_motion_table is not None:
+        R = mxm(current_time_skyfield.polar_motion_matrix(), R)
+    if R.ndim == 2:
+        return R[None, :, :]
+    return np.moveaxis(R, -1, 0)
+
+
+def eci2ecef(vectors, R):
+    """Rotates vectors from ECI into ECEF.
+
+    Arguments:
+        vectors (array): Vectors in ECI with shape (N,3).
+        R (array): Rotation matrices from ECI to ECEF with shape (N,3,3), see *rotation_to_itrs*.
+
+    Returns:
+        (array): Vectors in ECEF with shape (N,3).
+
+    """
+    return np.einsum("tij,tj->ti", R, vectors)
+
+
+def ecef2eci(vectors, R):
+    """Rotates vectors from ECEF into ECI, the inverse of *eci2ecef*.
+
+    Arguments:
+        vectors (array): Vectors in ECEF with shape (N,3).
+        R (array): Rotation matrices from ECI to ECEF with shape (N,3,3), see *rotation_to_itrs*.
+
+    Returns:
+        (array): Vectors in ECI with shape (N,3).
+
+    """
+    return np.einsum("tji,tj->ti", R, vectors)
+
+
+def ecef2geodetic(xyz, deg=False):
+    """Converts ECEF positions into geodetic coordinates with Bowring's formula, without iterations.
+
+    Bowring's formula is applied twice, the second time with the reduced latitude of the first result, which makes
+    the latitude accurate to about 1e-14 degrees up to heights of several thousand km.
+
+    Arguments:
+        xyz (array): ECEF positions [m] with shape (N,3).
+        deg (bool): If the angles are returned in degrees instead of radians.
+
+    Returns:
+        (tuple): Geodetic latitude, longitude and height above the ellipsoid [m], each with shape (N,).
+
+    """
+    xyz = np.asarray(xyz, dtype=float)
+    x, y, z = xyz[..., 0], xyz[..., 1], xyz[..., 2]
+    p = np.hypot(x, y)
+    theta = arctan2(z * a, p * b)
+    lat = arctan2(z + ep2 * b * sin(theta) ** 3, p - e2 * a * cos(theta) ** 3)
+    theta = arctan2((1 - f) * sin(lat), cos(lat))
+    lat = arctan2(z + ep2 * b * sin(theta) ** 3, p - e2 * a * cos(theta) ** 3)
+    lon = arctan2(y, x)
+    sin_lat = sin(lat)
+    height = p * cos(lat) + z * sin_lat - a * sqrt(1 - e2 * sin_lat ** 2)
+    if deg:
+        lat, lon = np.rad2deg(lat), np.rad2deg(lon)
+    return lat, lon, height
+
+
+def geodetic2ecef(lat, lon, height=0.0, deg=False):
+    """Converts geodetic coordinates into ECEF positions, the inverse of *ecef2geodetic*.
+
+    Arguments:
+        lat (array): Geodetic latitude.
+        lon (array): Longitude.
+        height (array): Height above the ellipsoid [m].
+        deg (bool): If the angles are given in degrees instead of radians.
+
+    Returns:
+        (array): ECEF positions [m] with shape (N,3).
+
+    """
+    if deg:
+        lat, lon = np.deg2rad(lat), np.deg2rad(lon)
+    return np.stack(np.broadcast_arrays(*geodetic2xyzECEF(lat, lon, height, deg=False)), axis=-1)
+
+
+def zenith(lat, lon, deg=False):
+    """Local zenith, the outward normal of the ellipsoid, at geodetic coordinates.
+
+    Arguments:
+        lat (array): Geodetic latitude.
+        lon (array): Longitude.
+        deg (bool): If the angles are given in degrees instead of radians.
+
+    Returns:
+        (array): ECEF unit vectors with shape (N,3).
+
+    """
+    if deg:
+        lat, lon = np.deg2rad(lat), np.deg2rad(lon)
+    return np.stack(np.broadcast_arrays(cos(lat) * cos(lon), cos(lat) * sin(lon), sin(lat)), axis=-1)
+
+
+def ray_height(pos, direction, distance):
+    """Geodetic height of points along rays, for example lines of sight.
+
+    Arguments:
+        pos (array): ECEF positions where the rays start [m] with shape (N,3).
+        direction (array): ECEF directions of the rays (unit vectors) with shape (N,3).
+        distance (array): Distance along each ray [m] with shape (N,).
+
+    Returns:
+        (array): Height above the ellipsoid [m] with shape (N,).
+
+    """
+    return ecef2geodetic(pos + np.asarray(distance)[..., None] * direction)[2]
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Limb geometry of MATS on the WGS84 ellipsoid.
+
+Solves for the tangent point of a line of sight and for the pitch needed to put the tangent point at a
+given geodetic height. Replaces the nested *minimize_scalar* of the former *findpitch* and *findtangent* in
+*MatsBana*, which are kept as reference implementations in the unit tests. *MatsBana.findpitch* now runs
+*find_pitch* for a single time.
+All functions work on arrays with time along the first axis, so a whole orbit can be solved at once.
+
+The line of sight is transformed to the Earth fixed frame (ITRS), where the WGS84 ellipsoid is fixed.
+The closest approach of the line of sight to the ellipsoid is first calculated analytically by scaling the
+ellipsoid into a sphere. It is then refined with Newton steps on the derivative of the geodetic height along
+the line of sight. The pitch is found with secant steps on the tangent height, starting from a spherical
+Earth estimate.
+
+"""
+
+import logging
+
+import numpy as np
+
+from mats_planningtool.OrbitSimulator import GeoidLib
+from mats_planningtool.OrbitSimulator.GeoidLib import a, f, b
+
+"Default tolerance of the tangent height [m]"
+TOLERANCE = 0.01
+"Maximum number of Newton or secant steps before giving up"
+MAX_ITERATIONS = 20
+
+Logger = logging.getLogger("OPT_logger")
+
+
+def look_direction(look_vector, yaw, pitch):
+    """Vectorized version of *MatsBana.rotate* without roll.
+
+    Arguments:
+        look_vector (array): Instrument look vector in satellite coordinates.
+        yaw (array): Yaw angles [radians].
+        pitch (array): Pitch angles [radians].
+
+    Returns:
+        (array): Rotated look vectors with shape (N,3).
+
+    """
+    x, y, z = look_vector
+    cos_pitch, sin_pitch = np.cos(pitch), np.sin(pitch)
+    cos_yaw, sin_yaw = np.cos(yaw), np.sin(yaw)
+    x_pitch = cos_pitch * x + sin_pitch * z
+    z_pitch = -sin_pitch * x + cos_pitch * z
+    return np.stack([cos_yaw * x_pitch - sin_yaw * y, sin_yaw * x_pitch + cos_yaw * y, z_pitch], axis=-1)
+
+
+def find_tangent(pos, FOV, R, tolerance=TOLERANCE):
+    """Finds the point closest to the WGS84 ellipsoid along lines of sight.
+
+    Arguments:
+        pos (array): Satellite positions in ECI [m] with shape (N,3).
+        FOV (array): Lines of sight in ECI (unit vectors) with shape (N,3).
+        R (array): Rotation matrices from ECI to ITRS with shape (N,3,3).
+        tolerance (float): Tolerance of the tangent point along the line of sight [m].
+
+    Returns:
+        (tuple): Distance from the satellite to the tangent point [m] and geodetic height of the tangent point [m].
+
+    """
+    p = GeoidLib.eci2ecef(pos, R)
+    d = GeoidLib.eci2ecef(FOV, R)
+
+    "Closest approach to the ellipsoid scaled into a sphere"
+    scale = np.array([1, 1, a / b])
+    p_scaled = p * scale
+    d_scaled = d * scale
+    distance = -np.einsum("ti,ti->t", p_scaled, d_scaled) / np.einsum("ti,ti->t", d_scaled, d_scaled)
+
+    "Newton steps on the derivative of the geodetic height along the line of sight"
+    for iteration in range(MAX_ITERATIONS):
+        point = p + distance[:, None] * d
+        lat, lon, height = GeoidLib.ecef2geodetic(point)
+        normal = np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+        slope = np.einsum("ti,ti->t", normal, d)
+        curvature = (1 - slope ** 2) / norm_rows(point)
+        step = slope / curvature
+        distance = distance - step
+        if np.all(np.abs(step) < tolerance):
+            break
+    else:
+        Logger.warning("find_tangent did not converge in %d iterations, largest step: %.3g m",
+                       MAX_ITERATIONS, np.max(np.abs(step)))
+
+    return distance, GeoidLib.ray_height(p, d, distance)
+
+
+def find_pitch(tangent_height, pos, yaw, rotmatrix, R, look_vector=None, tolerance=TOLERANCE):
+    """Finds the pitch which puts the tangent point of the line of sight at a given geodetic height.
+
+    Arguments:
+        tangent_height (array): Wanted geodetic height of the tangent point [m].
+        pos (array): Satellite positions in ECI [m] with shape (N,3).
+        yaw (array): Yaw angles [radians].
+        rotmatrix (array): Rotation matrices from satellite to ECI coordinates with shape (N,3,3).
+        R (array): Rotation matrices from ECI to ITRS with shape (N,3,3).
+        look_vector (array): Instrument look vector in satellite coordinates. Defaults to [1,0,0].
+        tolerance (float): Tolerance of the tangent height [m].
+
+    Returns:
+        (array): Pitch angles [radians].
+
+    """
+    if look_vector is None:
+        look_vector = np.array([1, 0, 0])
+    tangent_height = np.broadcast_to(np.asarray(tangent_height, dtype=float), (len(pos),))
+    yaw = np.broadcast_to(np.asarray(yaw, dtype=float), (len(pos),))
+
+    def height_error(pitch):
+        FOV = np.einsum("tij,tj->ti", rotmatrix, look_direction(look_vector, yaw, pitch))
+        return find_tangent(pos, FOV, R, tolerance)[1] - tangent_height
+
+    "Spherical Earth estimate of the angle below the local horizontal"
+    radius = norm_rows(pos)
+    R_local = a * (1 - f * (pos[:, 2] / radius) ** 2)
+    depression = np.arccos(np.clip((R_local + tangent_height) / radius, -1, 1))
+    pitch_0 = -np.sign(look_vector[0]) * depression
+    pitch_1 = pitch_0 + 1e-3
+
+    error_0 = height_error(pitch_0)
+    error_1 = height_error(pitch_1)
+    for iteration in range(MAX_ITERATIONS):
+        if np.all(np.abs(error_1) < tolerance):
+            break
+        "Converged elements keep their pitch, so avoid 0/0 in their slope"
+        slope = np.divide(error_1 - error_0, pitch_1 - pitch_0, out=np.ones_like(error_1), where=error_1 != error_0)
+        pitch_new = np.where(np.abs(error_1) < tolerance, pitch_1, pitch_1 - error_1 / slope)
+        pitch_0, error_0 = pitch_1, error_1
+        pitch_1 = pitch_new
+        error_1 = height_error(pitch_1)
+
+    if not np.all(np.abs(error_1) < tolerance):
+        Logger.warning("find_pitch did not converge in %d iterations, largest tangent height error: %.3g m",
+                       MAX_ITERATIONS, np.max(np.abs(error_1)))
+
+    return pitch_1
+
+
+def norm_rows(vectors):
+    """Euclidean norm of each row.
+
+    Arguments:
+        vectors (array): Vectors with shape (N,3).
+
+    Returns:
+        (array): Norms with shape (N,).
+
+    """
+    return np.sqrt(np.einsum("ti,ti->t", vectors, vectors))
@@ -3,18 +3,15 @@ import matplotlib.pylab as plt
 from numpy.linalg import norm
 import numpy as  np
 import skyfield.api as sfapi
-from skyfield.api import wgs84
 import skyfield.sgp4lib as sgp4lib
-#from mats_planningtool.OrbitSimulator import Geoidlib
-from scipy.optimize import minimize_scalar
-from skyfield.positionlib import ICRF
-from skyfield.units import Distance
+from mats_planningtool.OrbitSimulator import GeoidLib
 from skyfield.framelib import itrs
 from mats_planningtool.Library import rot_arbit
+from mats_planningtool.OrbitSimulator import Ephemeris, LimbGeometry, Propagator
 import ephem
 
 
-ts = sfapi.load.timescale()
+ts = Ephemeris.timescale()
 
 def rotate (unitvec, yaw, pitch, roll, deg=False):
     """Rotates a unitvector applying yaw, pitch and roll (in that order)
@@ -57,6 +54,26 @@ def xyz2radec(vector, deg=False, positivera=False):
         dec*=180./np.pi
     return [ra,dec]
 
+def findpitch (tangent_height,current_time,pos,yaw,rotmatrix,look_vector=None):
+    """Finds the pitch which puts the tangent point at a given geodetic height for a single time.
+
+    Kept for existing callers, runs *LimbGeometry.find_pitch* for a single time.
+
+    Arguments:
+        tangent_height (float): Wanted geodetic height of the tangent point [m].
+        current_time (:obj:`skyfield.timelib.Time`): The time of the satellite position.
+        pos (:obj:np.array): Satellite position in ECI [m].
+        yaw (float): Yaw angle [radians].
+        rotmatrix (:obj:np.array): Rotation matrix from satellite to ECI coordinates.
+        look_vector (:obj:np.array): Instrument look vector in satellite coordinates. Defaults to [1,0,0].
+
+    Returns:
+        (float): Pitch angle [radians]
+    """
+    R=GeoidLib.rotation_to_itrs(ts.tt_jd(np.atleast_1d(current_time.tt)))
+    pitch=LimbGeometry.find_pitch(tangent_height,np.asarray(pos)[None],yaw,np.asarray(rotmatrix)[None],R,look_vector)
+    return pitch[0]
+
 # def radec2xyz(ra,dec, deg=True):
 #     if deg:
 #         ra*=np.pi/180.
@@ -90,34 +107,6 @@ def xyz2radec(vector, deg=False, positivera=False):
 #                 ysb.append(st)
 #     return ysb
     
-def funpitch(pitch,current_time,tangent_height,pos,yaw,rotmatrix,look_vector=None):
-    if look_vector is None:
-        look_vector = np.array([1,0,0])
-    FOV=rotate(look_vector,yaw,pitch,0,deg=False)
-    FOV=np.matmul(rotmatrix,FOV)
-    tangent_point_solution=findtangent(current_time,pos,FOV)
-    return ((tangent_point_solution.fun-tangent_height)**2)
-
-def funheight(scaling_factor,current_time,pos,FOV):
-    newp = pos + scaling_factor * FOV
-    newp=ICRF(Distance(m=newp).au,t=current_time,center=399)
-    return wgs84.subpoint(newp).elevation.m 
-
-
-def findtangent(current_time,pos,FOV):
-    #dokument!
-    scaling_factor=minimize_scalar(funheight,args=(current_time,pos,FOV),bracket=(1e5,3e5))
-    return scaling_factor
-
-def findpitch (tangent_height,current_time,pos,yaw,rotmatrix,look_vector=None):
-    if look_vector is None:
-        look_vector = np.array([1,0,0])
-    if look_vector[0]<0:
-        pitch=minimize_scalar(funpitch,args=(current_time,tangent_height,pos,yaw,rotmatrix,look_vector),method="Bounded",bounds=(np.deg2rad(-10),np.deg2rad(30)))
-    else:
-        pitch=minimize_scalar(funpitch,args=(current_time,tangent_height,pos,yaw,rotmatrix,look_vector),method="Bounded",bounds=(np.deg2rad(-30),np.deg2rad(10)))
-    return pitch.x
-
 
 def Satellite_Simulator(
     Satellite_skyfield,
@@ -129,7 +118,7 @@ def Satellite_Simulator(
 ):
     """Simulates a single point in time for a Satellite using Skyfield and also the pointing of the satellite.
 
-    This is Donals implementation
+    This is Donals implementation. Runs *Satellite_Simulator_batch* for a single time.
 
     Arguments:
         Satellite_skyfield (:obj:`skyfield.sgp4lib.EarthSatellite`): A Skyfield object representing an EarthSatellite defined by a TLE.
@@ -144,121 +133,274 @@ def Satellite_Simulator(
 
     """
 
-    if type(SimulationTime) is DT.datetime:
-        current_time_datetime = SimulationTime
-    else:
-        current_time_datetime = ephem.Date(SimulationTime).datetime()
-    
-    year = current_time_datetime.year
-    month = current_time_datetime.month
-    day = current_time_datetime.day
-    hour = current_time_datetime.hour
-    minute = current_time_datetime.minute
-    second = current_time_datetime.second + current_time_datetime.microsecond / 1000000
-
-    current_time_skyfield = ts.utc(
-        year, month, day, hour, minute, second
+    Satellite_dict = Satellite_Simulator_batch(
+        Satellite_skyfield,
+        [SimulationTime],
+        Timeline_settings,
+        pointing_altitude,
+        LogFlag,
+        Logger,
+    )
+
+    return {key: value[0] for key, value in Satellite_dict.items()}
+
+
+def skyfield_times(SimulationTimes):
+    """Converts a sequence of dates into a single (vector) skyfield Time object.
+
+    The times are expressed as second offsets from the first date, so that only one
+    call to the timescale is needed regardless of the number of dates.
+
+    Arguments:
+        SimulationTimes (list of :obj:`ephem.Date` or 'datetime'): The dates to convert. Naive datetimes are assumed to be in UTC.
+
+    Returns:
+        (:obj:`skyfield.timelib.Time`): Time object with one element per input date.
+
+    """
+
+    current_times_datetime = []
+    for SimulationTime in SimulationTimes:
+        if isinstance(SimulationTime, DT.datetime):
+            current_time_datetime = SimulationTime
+        else:
+            current_time_datetime = ephem.Date(SimulationTime).datetime()
+        if current_time_datetime.tzinfo is not None:
+            current_time_datetime = current_time_datetime.astimezone(sfapi.utc).replace(tzinfo=None)
+        current_times_datetime.append(current_time_datetime)
+
+    first = current_times_datetime[0]
+    seconds = np.array([(date - first).total_seconds() for date in current_times_datetime])
+
+    return ts.utc(
+        first.year,
+        first.month,
+        first.day,
+        first.hour,
+        first.minute,
+        first.second + first.microsecond / 1000000 + seconds,
     )
 
+
+def xyz2radec_array(vectors, deg=False, positivera=False):
+    """Vectorized version of *xyz2radec* for an (N,3) array of vectors.
+
+    Returns:
+        (tuple): Arrays of right ascension and declination.
+    """
+    ra = np.arctan2(vectors[:, 1], vectors[:, 0])
+    if positivera:
+        ra = np.where(ra < 0, ra + 2 * np.pi, ra)
+    dec = np.arcsin(vectors[:, 2] / norm(vectors, axis=1))
+    if deg:
+        ra = np.rad2deg(ra)
+        dec = np.rad2deg(dec)
+    return ra, dec
+
+
+def Satellite_Simulator_batch(
+    Satellite_skyfield,
+    SimulationTimes,
+    Timeline_settings,
+    pointing_altitude,
+    LogFlag=False,
+    Logger=None,
+):
+    """Simulates a whole array of points in time for a Satellite using Skyfield and also the pointing of the satellite.
+
+    Batch version of *Satellite_Simulator*. The orbit is propagated with one vectorized call over all
+    times (see *Propagator.propagate*) and the result is returned column-wise, with the same keys as *Satellite_Simulator* but
+    with one row per simulated time.
+
+    Arguments:
+        Satellite_skyfield (:obj:`skyfield.sgp4lib.EarthSatellite`): A Skyfield object representing an EarthSatellite defined by a TLE.
+        SimulationTimes (list of :obj:`ephem.Date` or 'datetime'): The times of the simulation.
+        Timeline_settings (dict): A dictionary containing relevant settings to the simulation.
+        pointing_altitude (float or array): Contains the pointing altitude of the simulation [km]. Either one value or one value per time.
+        LogFlag (bool or array of bool): If data from the simulation shall be logged. Either one value or one value per time.
+        Logger (:obj:`logging.Logger`): Logger used to log the result from the simulation if LogFlag == True.
+
+    Returns:
+        (dict): Dictionary containing simulated data as arrays, with time along the first axis.
+
+    """
+
+    current_time_skyfield = skyfield_times(SimulationTimes)
+
     #Get satellite position and orbital period
-    Satellite_geo = Satellite_skyfield.at(current_time_skyfield)
-    orbital_period= 2*np.pi/Satellite_skyfield.model.nm 
-    ECI_pos=Satellite_geo.position.m
-    ECI_vel=Satellite_geo.velocity.m_per_s
+    ECI_pos, ECI_vel = Propagator.position_velocity(Satellite_skyfield, current_time_skyfield)
+    orbital_period = 2*np.pi/Propagator.satrec(Satellite_skyfield).nm
 
-    "############# Calculations of orbital and pointing vectors ############"
-    "Vector normal to the orbital plane of Satellite"
+    R_itrs = GeoidLib.rotation_to_itrs(current_time_skyfield)
+    sun_m = Ephemeris.position("Sun", current_time_skyfield, apparent=True).reshape(-1, 3)*1e3
+    Satellite_dict = satellite_geometry(ECI_pos*1e3, ECI_vel*1e3, orbital_period, R_itrs, sun_m, Timeline_settings, pointing_altitude)
+
+    log_satellite_dict(Satellite_dict, SimulationTimes, LogFlag, Logger)
+
+    return Satellite_dict
 
-    "Calculate intersection between the orbital plane and the equator"
-    celestial_pole = [0, 0, 1]
-    vunit=np.array(ECI_vel)/norm(ECI_vel)
-    mrunit=-np.array(ECI_pos)/norm(ECI_pos)
-    normal_orbit=np.cross(mrunit,vunit)
+
+def log_satellite_dict(Satellite_dict, SimulationTimes, LogFlag, Logger):
+    """Logs the result of *Satellite_Simulator_batch* at the times where LogFlag is set.
+
+    Arguments:
+        Satellite_dict (dict): Dictionary as returned by *Satellite_Simulator_batch*.
+        SimulationTimes (list of :obj:`ephem.Date` or 'datetime'): The simulated times.
+        LogFlag (bool or array of bool): If data shall be logged. Either one value or one value per time.
+        Logger (:obj:`logging.Logger`): Logger used to log the data. Nothing is logged if None.
+
+    """
+    if Logger is None:
+        return
+    LogFlag = np.broadcast_to(np.asarray(LogFlag, dtype=bool), (len(SimulationTimes),))
+    for t in np.nonzero(LogFlag)[0]:
+        Logger.debug("")
+
+        Logger.debug("SimulationTime time: " + str(SimulationTimes[t]))
+        Logger.debug("Orbital Period in s: " + str(Satellite_dict["OrbitalPeriod [s]"][t]))
+        Logger.debug("Vector to Satellite [km]: " + str(Satellite_dict["Position [km]"][t]))
+        Logger.debug("Latitude in degrees: " + str(Satellite_dict["Latitude [degrees]"][t]))
+        Logger.debug("Longitude in degrees: " + str(Satellite_dict["Longitude [degrees]"][t]))
+        Logger.debug("Altitude in km: " + str(Satellite_dict["Altitude [km]"][t]))
+
+        Logger.debug("Pitch [degrees]: " + str(Satellite_dict["Pitch [degrees]"][t]))
+        Logger.debug("Yaw [degrees]: " + str(Satellite_dict["Yaw [degrees]"][t]))
+        Logger.debug("ArgOfLat [degrees]: " + str(Satellite_dict["ArgOfLat [degrees]"][t]))
+        Logger.debug("Latitude of LP: " + str(Satellite_dict["EstimatedLatitude_LP [degrees]"][t]))
+        Logger.debug("Longitude of LP: " + str(Satellite_dict["EstimatedLongitude_LP [degrees]"][t]))
+
+        Logger.debug("Optical Axis: " + str(Satellite_dict["OpticalAxis"][t]))
+        Logger.debug("Orthogonal direction to the orbital plane: " + str(-Satellite_dict["OrbitNormal"][t]))
+
+
+def Ensemble_Simulator_batch(
+    Satellites,
+    SimulationTimes,
+    Timeline_settings,
+    pointing_altitude,
+    members=None,
+):
+    """Simulates an ensemble of satellites, for example MATS described by several TLEs, at the same points in time.
+
+    Same as *Satellite_Simulator_batch*, but all satellites are propagated together (see *Propagator.propagate*) and share
+    the rotations into ITRS and the position of the Sun, which are calculated once per time.
+
+    Arguments:
+        Satellites (list): The satellites, each given as accepted by *Propagator.satrec*.
+        SimulationTimes (list of :obj:`ephem.Date` or 'datetime'): The times of the simulation.
+        Timeline_settings (dict): A dictionary containing relevant settings to the simulation.
+        pointing_altitude (float): Contains the pointing altitude of the simulation [km].
+        members (array of int): Index of the satellite simulated at each time. All satellites are simulated at all times if None.
+
+    Returns:
+        (dict): Dictionary with the same keys as returned by *Satellite_Simulator_batch*. The arrays have the satellites along the first axis and
+        time along the second axis, or time along the first axis if *members* is given.
+
+    """
+
+    current_time_skyfield = skyfield_times(SimulationTimes)
+    ntimes = len(current_time_skyfield)
+
+    ECI_pos, ECI_vel = Propagator.propagate(Satellites, current_time_skyfield, members)
+    orbital_period = np.array([2*np.pi/Propagator.satrec(satellite).nm for satellite in Satellites])
+
+    R_itrs = GeoidLib.rotation_to_itrs(current_time_skyfield)
+    sun_m = Ephemeris.position("Sun", current_time_skyfield, apparent=True).reshape(-1, 3)*1e3
+
+    if members is not None:
+        return satellite_geometry(ECI_pos*1e3, ECI_vel*1e3, orbital_period[np.asarray(members)], R_itrs, sun_m,
+                                  Timeline_settings, pointing_altitude)
+
+    "The satellites are simulated one after the other along the first axis of the arrays"
+    nsatellites = len(Satellites)
+    Satellite_dict = satellite_geometry(
+        ECI_pos.reshape(-1, 3)*1e3, ECI_vel.reshape(-1, 3)*1e3, np.repeat(orbital_period, ntimes), np.tile(R_itrs, (nsatellites, 1, 1)),
+        np.tile(sun_m, (nsatellites, 1)), Timeline_settings, pointing_altitude)
+    return {name: column.reshape((nsatellites, ntimes) + column.shape[1:]) for name, column in Satellite_dict.items()}
+
+
+def satellite_geometry(ECI_pos, ECI_vel, orbital_period, R_itrs, sun_m, Timeline_settings, pointing_altitude):
+    """Calculates the pointing of the satellite and the geometry at the limb from its positions and velocities.
+
+    Used by *Satellite_Simulator_batch* and *Ensemble_Simulator_batch*.
+
+    Arguments:
+        ECI_pos (array): Positions of the satellite in ECI (GCRS) [m] with shape (N,3).
+        ECI_vel (array): Velocities of the satellite in ECI (GCRS) [m/s] with shape (N,3).
+        orbital_period (float or array): Orbital period [min]. Either one value or one value per row.
+        R_itrs (array): Rotation matrices from ECI to ECEF with shape (N,3,3), see *GeoidLib.rotation_to_itrs*.
+        sun_m (array): Apparent positions of the Sun in ECI [m] with shape (N,3).
+        Timeline_settings (dict): A dictionary containing relevant settings to the simulation.
+        pointing_altitude (float or array): Contains the pointing altitude of the simulation [km]. Either one value or one value per row.
+
+    Returns:
+        (dict): Dictionary with the same keys as returned by *Satellite_Simulator_batch*.
+
+    """
+    ntimes = len(ECI_pos)
+    pointing_altitude = np.broadcast_to(np.asarray(pointing_altitude, dtype=float), (ntimes,))
+
+    "############# Calculations of orbital and pointing vectors ############"
+    celestial_pole = np.array([0, 0, 1])
+    vunit = ECI_vel/norm(ECI_vel, axis=1)[:, None]
+    mrunit = -ECI_pos/norm(ECI_pos, axis=1)[:, None]
+    normal_orbit = np.cross(mrunit, vunit)
     ascending_node = np.cross(celestial_pole, -normal_orbit)
 
     "Argument of latitude"
     arg_of_lat = (
         np.arccos(
-            np.dot(ascending_node, -mrunit) / norm(mrunit) / norm(ascending_node)
+            np.einsum('ij,ij->i', ascending_node, -mrunit) / norm(mrunit, axis=1) / norm(ascending_node, axis=1)
         )
         / np.pi
         * 180
-        * np.sign(-mrunit[2])
-    ) #argument of latitude in degrees
-
-    rotmatrix=np.array([vunit,normal_orbit,mrunit]).T 
-    sublat_c,sublon_c = wgs84.latlon_of(Satellite_geo)
-    sublat_c = sublat_c.degrees
-    sublon_c = sublon_c.degrees
-    alt_Satellite = wgs84.height_of(Satellite_geo).m
-    
-    instrument_look_vector = np.array([Timeline_settings["intrument_look_vector"]['x'],Timeline_settings["intrument_look_vector"]['y'],Timeline_settings["intrument_look_vector"]['z']])
+        * np.sign(-mrunit[:, 2])
+    )
 
-    pitch=findpitch(pointing_altitude*1e3,current_time_skyfield, ECI_pos, 0, rotmatrix, instrument_look_vector)
-    #calculate yaw offset angle
-    yaw_correction = Timeline_settings["yaw_correction"]
-    if yaw_correction == True:
-        #check consistency here
-        yaw_offset_angle=Timeline_settings["yaw_amplitude"]*np.cos(np.deg2rad(arg_of_lat)-pitch-np.deg2rad(Timeline_settings["yaw_phase"])) #check if this is optimal
+    rotmatrix = np.stack([vunit, normal_orbit, mrunit], axis=2)
+    sublat_c, sublon_c, alt_Satellite = GeoidLib.ecef2geodetic(GeoidLib.eci2ecef(ECI_pos, R_itrs), deg=True)
 
-    elif yaw_correction == False:
-        yaw_offset_angle = 0
-    
-    pitch=findpitch(pointing_altitude*1e3,current_time_skyfield, ECI_pos, np.deg2rad(yaw_offset_angle), rotmatrix, instrument_look_vector)
+    instrument_look_vector = np.array([Timeline_settings["intrument_look_vector"]['x'],Timeline_settings["intrument_look_vector"]['y'],Timeline_settings["intrument_look_vector"]['z']])
+
+    yaw_offset_angle = np.zeros(ntimes)
+    pitch = LimbGeometry.find_pitch(pointing_altitude*1e3, ECI_pos, 0, rotmatrix, R_itrs, instrument_look_vector)
+    if Timeline_settings["yaw_correction"] == True:
+        yaw_offset_angle = Timeline_settings["yaw_amplitude"]*np.cos(np.deg2rad(arg_of_lat)-pitch-np.deg2rad(Timeline_settings["yaw_phase"]))
+        pitch = LimbGeometry.find_pitch(pointing_altitude*1e3, ECI_pos, np.deg2rad(yaw_offset_angle), rotmatrix, R_itrs, instrument_look_vector)
 
     #Get the center of the field of view
-    FOV_satellite=rotate(instrument_look_vector,np.deg2rad(yaw_offset_angle),pitch,0,deg=False) #FoV in satellite coordinates
-    FOV_sky=np.matmul(rotmatrix,FOV_satellite) #FoV in sky (ECI) coordinates
-    [FOV_ra,FOV_dec]=xyz2radec(FOV_sky,deg=True,positivera=True)
-    
+    FOV_satellite = LimbGeometry.look_direction(instrument_look_vector, np.deg2rad(yaw_offset_angle), pitch)
+    FOV_sky = np.einsum('tij,tj->ti', rotmatrix, FOV_satellite)
+    scaling_factor = LimbGeometry.find_tangent(ECI_pos, FOV_sky, R_itrs)[0]
+    FOV_ra, FOV_dec = xyz2radec_array(FOV_sky, deg=True, positivera=True)
+
     #Get tangent point
-    scaling_factor = findtangent(current_time_skyfield,ECI_pos,FOV_sky).x #find distance to the nearest point to the geoid (m)
-    tangent_point = ECI_pos + scaling_factor * FOV_sky #position in ECI units of the tangent point
-    tangent_point = ICRF(Distance(m=tangent_point).au,t=current_time_skyfield,center=399)
-    tangent_point_lat = (wgs84.subpoint(tangent_point).latitude.degrees)
-    tangent_point_lon = (wgs84.subpoint(tangent_point).longitude.degrees)
-
-    planets=sfapi.load('de421.bsp')
-    earth,sun= planets['earth'], planets['sun']
-    sundir=(earth+wgs84.subpoint(tangent_point)).at(current_time_skyfield).observe(sun).apparent()
-    obs=sundir.altaz()
-    SolarZenithAngle = (90-obs[0].degrees)
-    SolarScatteringAngle = (np.rad2deg(np.arccos(np.dot(FOV_sky,sundir.position.m/norm(sundir.position.m)))))
-    SolarZenithAngleNadir = 90-(earth+wgs84.subpoint(Satellite_geo)).at(current_time_skyfield).observe(sun).apparent().altaz()[0].degrees
-
-    y_dash =-np.cross(FOV_sky,mrunit)
-    y_dash = y_dash/norm(y_dash)
-    r_dash = np.cross(FOV_sky,y_dash)
-    r_dash = r_dash/norm(r_dash)
+    tangent_point = ECI_pos + scaling_factor[:, None] * FOV_sky
+    tangent_point_lat, tangent_point_lon = GeoidLib.ecef2geodetic(GeoidLib.eci2ecef(tangent_point, R_itrs), deg=True)[:2]
+
+    #Get the Sun as seen from the tangent point and from the satellite, and the angles to the local zenith
+    sundir_m = sun_m - tangent_point
+    sundir_unit = sundir_m/norm(sundir_m, axis=1)[:, None]
+    zenith_TP = GeoidLib.ecef2eci(GeoidLib.zenith(tangent_point_lat, tangent_point_lon, deg=True), R_itrs)
+    SolarZenithAngle = np.rad2deg(np.arccos(np.einsum('ij,ij->i', zenith_TP, sundir_unit)))
+    SolarScatteringAngle = np.rad2deg(np.arccos(np.einsum('ij,ij->i', FOV_sky, sundir_unit)))
+    sundir_nadir = sun_m - ECI_pos
+    zenith_nadir = GeoidLib.ecef2eci(GeoidLib.zenith(sublat_c, sublon_c, deg=True), R_itrs)
+    SolarZenithAngleNadir = np.rad2deg(np.arccos(np.einsum('ij,ij->i', zenith_nadir, sundir_nadir/norm(sundir_nadir, axis=1)[:, None])))
+
+    y_dash = -np.cross(FOV_sky, mrunit)
+    y_dash = y_dash/norm(y_dash, axis=1)[:, None]
+    r_dash = np.cross(FOV_sky, y_dash)
+    r_dash = r_dash/norm(r_dash, axis=1)[:, None]
 
     #get transform from ECI to CCD coordinates
-    invrotmatrix=np.linalg.inv(np.array([FOV_sky,y_dash,r_dash]).T) 
-
-
-    if LogFlag == True and Logger != None:
-        Logger.debug("")
-
-        Logger.debug("SimulationTime time: " + str(SimulationTime))
-        Logger.debug("Orbital Period in s: " + str(orbital_period*60))
-        Logger.debug("Vector to Satellite [km]: " + str(ECI_pos*1e3))
-        Logger.debug("Latitude in degrees: " + str(sublat_c))
-        Logger.debug("Longitude in degrees: " + str(sublon_c))
-        Logger.debug("Altitude in km: " + str(alt_Satellite*1e3))
-
-        Logger.debug("Pitch [degrees]: " + str(np.rad2deg(pitch)))
-        Logger.debug("Yaw [degrees]: " + str(yaw_offset_angle))
-        Logger.debug("ArgOfLat [degrees]: " + str(arg_of_lat))
-        Logger.debug("Latitude of LP: " + str(tangent_point_lat))
-        Logger.debug("Longitude of LP: " + str(tangent_point_lon))
-
-        Logger.debug("Optical Axis: " + str(FOV_sky))
-        Logger.debug("Orthogonal direction to the orbital plane: " + str(normal_orbit))
+    invrotmatrix = np.linalg.inv(np.stack([FOV_sky, y_dash, r_dash], axis=2))
 
     Satellite_dict = {
         "Position [km]": ECI_pos*1e-3,
         "Velocity [km/s]": ECI_vel*1e-3,
         "OrbitNormal": -normal_orbit,
-        "OrbitalPeriod [s]": orbital_period*60,
+        "OrbitalPeriod [s]": np.broadcast_to(orbital_period*60, (ntimes,)).copy(),
         "Latitude [degrees]": sublat_c,
         "Longitude [degrees]": sublon_c,
         "Altitude [km]": alt_Satellite*1e-3,
@@ -274,7 +416,9 @@ def Satellite_Simulator(
         "SolarZenithAngleTP": SolarZenithAngle,
         "SolarScatteringAngleTP": SolarScatteringAngle,
         "SolarZenithAngleNadir": SolarZenithAngleNadir,
-        "InvRotMatrix": invrotmatrix #Rotation matrix from ECI to CCD coordinates
+        "Normal2V_offset": y_dash, #Normal to the plane the vertical offset of a star is measured in
+        "Normal2H_offset": r_dash, #Normal to the plane the horizontal offset of a star is measured in
+        "InvRotMatrix": invrotmatrix #Rotation matrices from ECI to CCD coordinates
     }
 
     return Satellite_dict
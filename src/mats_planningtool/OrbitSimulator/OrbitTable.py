@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""Precomputed table of the orbit and attitude of MATS, shared by *Timeline_gen*, *XML_gen* and *Timeline_Plotter*.
+
+The table contains the output of *Satellite_Simulator_batch* on a regular time grid covering a whole timeline.
+It is identified by a key built from the TLE, the start date, the duration, the timestep, the pointing altitude and the
+yaw settings, and is saved as a .h5 file in the output directory so that later runs on identical inputs can read it instead
+of simulating MATS again. Values at times between the grid points are interpolated with cubic splines.
+
+"""
+
+import datetime as DT
+import hashlib
+import json
+import logging
+import os
+
+import ephem
+import h5py
+import numpy as np
+from numpy.linalg import norm
+from scipy.interpolate import CubicSpline
+from skyfield import api
+
+from mats_planningtool.OrbitSimulator import Propagator
+from mats_planningtool.OrbitSimulator.MatsBana import Satellite_Simulator_batch, log_satellite_dict, xyz2radec_array
+
+Logger = logging.getLogger("OPT_logger")
+
+"Increase if the content of the table changes, to invalidate old files"
+TABLE_VERSION = 2
+
+"Columns which are angles in degrees, interpolated after unwrapping, and the lower end of the range they are wrapped into"
+_ANGLES = {
+    "Longitude [degrees]": -180,
+    "ArgOfLat [degrees]": -180,
+    "EstimatedLongitude_LP [degrees]": -180,
+}
+
+"Columns which are recalculated from the interpolated optical axis and position instead of interpolated"
+_DERIVED = ["Dec_OpticalAxis [degrees]", "RA_OpticalAxis [degrees]", "Normal2V_offset", "Normal2H_offset", "InvRotMatrix"]
+
+"Elements of the SGP4 model which identify the TLE a satellite was created from"
+_TLE_ELEMENTS = ["satnum", "jdsatepoch", "jdsatepochF", "ndot", "nddot", "bstar", "inclo", "nodeo", "ecco", "argpo", "mo", "no_kozai"]
+
+_tables = {}
+
+
+def _to_datetime(SimulationTime):
+    "Returns a naive datetime in UTC"
+    if isinstance(SimulationTime, DT.datetime):
+        if SimulationTime.tzinfo is not None:
+            SimulationTime = SimulationTime.astimezone(api.utc).replace(tzinfo=None)
+        return SimulationTime
+    return ephem.Date(SimulationTime).datetime()
+
+
+def _has_TLE(Satellite_skyfield, TLE):
+    "Checks if a satellite was created from the given TLE"
+    model = Propagator.satrec(Satellite_skyfield)
+    reference = Propagator.satrec(TLE)
+    return all(getattr(model, name) == getattr(reference, name) for name in _TLE_ELEMENTS)
+
+
+def table_key(TLE, start_date, duration, timestep, pointing_altitude, Timeline_settings):
+    """Returns the key identifying an orbit table.
+
+    Arguments:
+        TLE (list of str): The TLE of MATS.
+        start_date (str): Start date of the table ('%Y/%m/%d %H:%M:%S').
+        duration (int): Duration of the table [s].
+        timestep (float): Timestep of the table [s].
+        pointing_altitude (float): Pointing altitude [km].
+        Timeline_settings (dict): Settings of the timeline, the yaw settings and the instrument look vector are used.
+
+    Returns:
+        (str): The key.
+
+    """
+    inputs = [
+        TABLE_VERSION,
+        list(TLE),
+        start_date,
+        duration,
+        timestep,
+        pointing_altitude,
+        Timeline_settings["yaw_correction"],
+        Timeline_settings["yaw_amplitude"],
+        Timeline_settings["yaw_phase"],
+        Timeline_settings["intrument_look_vector"],
+    ]
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+class OrbitTable:
+    """Orbit and attitude of MATS on a regular time grid.
+
+    Attributes:
+        key (str): Key identifying the table, see *table_key*.
+        start (:obj:`datetime.datetime`): Time of the first row (UTC).
+        timestep (float): Time between rows [s].
+        pointing_altitude (float): Pointing altitude of the table [km].
+        data (dict): Columns as returned by *Satellite_Simulator_batch*.
+
+    """
+
+    def __init__(self, key, start, timestep, pointing_altitude, data):
+        self.key = key
+        self.start = start
+        self.timestep = timestep
+        self.pointing_altitude = pointing_altitude
+        self.data = data
+        self.seconds = np.arange(len(data["Latitude [degrees]"])) * timestep
+        self._splines = {}
+
+    @classmethod
+    def simulate(cls, TLE, start_date, duration, timestep, pointing_altitude, Timeline_settings):
+        """Simulates MATS and creates a table.
+
+        Arguments:
+            See *table_key*.
+
+        Returns:
+            (:obj:`OrbitTable`): The table, with rows covering the start date to the end of the duration.
+
+        """
+        start = DT.datetime.strptime(start_date, "%Y/%m/%d %H:%M:%S")
+        rows = int(np.ceil(duration / timestep)) + 1
+        SimulationTimes = [start + DT.timedelta(seconds=timestep * row) for row in range(rows)]
+
+        Logger.info("Simulating orbit table with " + str(rows) + " rows")
+        MATS_skyfield = api.EarthSatellite(TLE[0], TLE[1])
+        data = Satellite_Simulator_batch(MATS_skyfield, SimulationTimes, Timeline_settings, pointing_altitude)
+
+        key = table_key(TLE, start_date, duration, timestep, pointing_altitude, Timeline_settings)
+        return cls(key, start, timestep, pointing_altitude, data)
+
+    def save(self, path):
+        """Saves the table as a .h5 file."""
+        with h5py.File(path, "w") as h5file:
+            h5file.attrs["key"] = self.key
+            h5file.attrs["start"] = self.start.strftime("%Y/%m/%d %H:%M:%S.%f")
+            h5file.attrs["timestep"] = self.timestep
+            h5file.attrs["pointing_altitude"] = self.pointing_altitude
+            for name, column in self.data.items():
+                h5file.create_dataset(name.replace("/", "_"), data=column)
+            h5file.attrs["columns"] = json.dumps(list(self.data.keys()))
+
+    @classmethod
+    def load(cls, path):
+        """Loads a table saved with *save*."""
+        with h5py.File(path, "r") as h5file:
+            columns = json.loads(h5file.attrs["columns"])
+            data = {name: h5file[name.replace("/", "_")][()] for name in columns}
+            return cls(
+                h5file.attrs["key"],
+                DT.datetime.strptime(h5file.attrs["start"], "%Y/%m/%d %H:%M:%S.%f"),
+                float(h5file.attrs["timestep"]),
+                float(h5file.attrs["pointing_altitude"]),
+                data,
+            )
+
+    def _seconds_since_start(self, SimulationTimes):
+        return np.array([(_to_datetime(SimulationTime) - self.start).total_seconds() for SimulationTime in SimulationTimes])
+
+    def covers(self, SimulationTimes):
+        """Checks if all the given times are inside of the table."""
+        seconds = self._seconds_since_start(SimulationTimes)
+        return bool(np.all((seconds >= 0) & (seconds <= self.seconds[-1])))
+
+    def _spline(self, name):
+        if name not in self._splines:
+            column = self.data[name]
+            if name in _ANGLES:
+                column = np.rad2deg(np.unwrap(np.deg2rad(column)))
+            self._splines[name] = CubicSpline(self.seconds, column, axis=0)
+        return self._splines[name]
+
+    def column(self, name, seconds):
+        """Returns one column interpolated between the rows of the table.
+
+        Arguments:
+            name (str): Name of the column, as returned by *Satellite_Simulator_batch*. Not one of the recalculated columns.
+            seconds (array): The times as seconds since the start of the table. Must be inside of the table.
+
+        Returns:
+            (array): The values, with time along the first axis.
+
+        """
+        values = self._spline(name)(seconds)
+        if name in _ANGLES:
+            values = (values - _ANGLES[name]) % 360 + _ANGLES[name]
+        return values
+
+    def at(self, SimulationTimes):
+        """Returns the simulated data at the given times, interpolated between the rows of the table.
+
+        Arguments:
+            SimulationTimes (list of :obj:`ephem.Date` or 'datetime'): The times. Must be inside of the table.
+
+        Returns:
+            (dict): Dictionary with the same keys as returned by *Satellite_Simulator_batch*.
+
+        """
+        seconds = self._seconds_since_start(SimulationTimes)
+
+        Satellite_dict = {}
+        for name in self.data.keys():
+            if name in _DERIVED:
+                continue
+            Satellite_dict[name] = self.column(name, seconds)
+
+        FOV_sky = Satellite_dict["OpticalAxis"]
+        FOV_ra, FOV_dec = xyz2radec_array(FOV_sky, deg=True, positivera=True)
+        Satellite_dict["Dec_OpticalAxis [degrees]"] = FOV_dec
+        Satellite_dict["RA_OpticalAxis [degrees]"] = FOV_ra
+
+        mrunit = -Satellite_dict["Position [km]"] / norm(Satellite_dict["Position [km]"], axis=1)[:, None]
+        y_dash = -np.cross(FOV_sky, mrunit)
+        y_dash = y_dash / norm(y_dash, axis=1)[:, None]
+        r_dash = np.cross(FOV_sky, y_dash)
+        r_dash = r_dash / norm(r_dash, axis=1)[:, None]
+        Satellite_dict["Normal2V_offset"] = y_dash
+        Satellite_dict["Normal2H_offset"] = r_dash
+        Satellite_dict["InvRotMatrix"] = np.linalg.inv(np.stack([FOV_sky, y_dash, r_dash], axis=2))
+
+        return Satellite_dict
+
+
+def get_orbit_table(configFile, Timeline_settings, pointing_altitude=None, timestep=None):
+    """Returns the orbit table of a timeline, loading it from the output directory or simulating it if needed.
+
+    Arguments:
+        configFile (obj): The config file, gives the TLE and the output directory.
+        Timeline_settings (dict): Settings of the timeline, gives the start date, duration and yaw settings.
+        pointing_altitude (float): Pointing altitude [km]. Defaults to *StandardPointingAltitude*.
+        timestep (float): Timestep of the table [s]. Defaults to the timestep of the *Operational Science Modes*.
+
+    Returns:
+        (:obj:`OrbitTable`): The table.
+
+    """
+    if pointing_altitude is None:
+        pointing_altitude = Timeline_settings["StandardPointingAltitude"] / 1000
+    if timestep is None:
+        timestep = configFile.Operational_Science_Mode_settings()["timestep"]
+
+    TLE = configFile.getTLE()
+    start_date = Timeline_settings["start_date"]
+    duration = Timeline_settings["duration"]["duration"]
+    key = table_key(TLE, start_date, duration, timestep, pointing_altitude, Timeline_settings)
+
+    if key in _tables:
+        return _tables[key]
+
+    path = os.path.join(configFile.output_dir, "OrbitTable_" + key + ".h5")
+    if os.path.isfile(path):
+        Logger.info("Orbit table read from: " + path)
+        table = OrbitTable.load(path)
+    else:
+        table = OrbitTable.simulate(TLE, start_date, duration, timestep, pointing_altitude, Timeline_settings)
+        try:
+            os.makedirs(configFile.output_dir, exist_ok=True)
+            table.save(path)
+            Logger.info("Orbit table saved to: " + path)
+        except OSError:
+            Logger.warning("Orbit table could not be saved to: " + path)
+
+    _tables[key] = table
+    return table
+
+
+def Satellite_Simulator_table(
+    configFile,
+    Timeline_settings,
+    Satellite_skyfield,
+    SimulationTimes,
+    pointing_altitude,
+    LogFlag=False,
+    Logger=None,
+):
+    """Same as *Satellite_Simulator_batch* but reads from the orbit table of the timeline when possible.
+
+    The orbit table is used when the satellite was created from the TLE of the config file, the pointing altitude is
+    *StandardPointingAltitude* and all times are inside of the timeline. Otherwise the satellite is simulated with
+    *Satellite_Simulator_batch*, for example for the perturbed TLEs of an ensemble.
+
+    Arguments:
+        configFile (obj): The config file.
+        Timeline_settings (dict): Settings of the timeline.
+        Satellite_skyfield, SimulationTimes, pointing_altitude, LogFlag, Logger: See *Satellite_Simulator_batch*.
+
+    Returns:
+        (dict): Dictionary containing simulated data as arrays, with time along the first axis.
+
+    """
+    if np.all(np.asarray(pointing_altitude) == Timeline_settings["StandardPointingAltitude"] / 1000) and _has_TLE(
+        Satellite_skyfield, configFile.getTLE()
+    ):
+        table = get_orbit_table(configFile, Timeline_settings)
+        if table.covers(SimulationTimes):
+            Satellite_dict = table.at(SimulationTimes)
+            log_satellite_dict(Satellite_dict, SimulationTimes, LogFlag, Logger)
+            return Satellite_dict
+
+    return Satellite_Simulator_batch(
+        Satellite_skyfield, SimulationTimes, Timeline_settings, pointing_altitude, LogFlag, Logger
+    )
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Propagation of one or several TLEs over arrays of times with SGP4.
+
+All satellites and times are propagated in one call to the array interface of the sgp4 library (*SatrecArray*), which runs
+in compiled code. The positions and velocities are then rotated from TEME into GCRS for all times at once, in the same way as
+*skyfield.sgp4lib.EarthSatellite.at*, without creating a Skyfield position per satellite.
+
+Most of the time of a propagation over many times is spent on the nutation angles of the Earth (IAU 2000A), which the rotation into GCRS
+and into ITRS (see *GeoidLib.rotation_to_itrs*) need for every time. They change slowly, so *nutation_angles* calculates them on a grid
+with a step of *NUTATION_STEP* and interpolates them, which changes the positions by less than a millimetre. The rotations are built from
+these angles with the public functions of Skyfield in the same way as *skyfield.timelib.Time.M* and *Time.gast* (see *equinox_of_date*),
+so the Time objects of the caller are left untouched.
+
+The simulators of OPT (see *MatsBana.Satellite_Simulator_batch*) propagate MATS with *propagate*.
+
+"""
+
+import logging
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+from sgp4.api import SGP4_ERRORS, Satrec, SatrecArray
+from skyfield.constants import ASEC2RAD, DAY_S, tau
+from skyfield.earthlib import sidereal_time
+from skyfield.framelib import ICRS_to_J2000
+from skyfield.functions import mxm, mxmxm, rot_z
+from skyfield.nutationlib import build_nutation_matrix, equation_of_the_equinoxes_complimentary_terms, iau2000a_radians, mean_obliquity
+from skyfield.precessionlib import compute_precession
+from skyfield.sgp4lib import theta_GMST1982
+from skyfield.timelib import julian_day
+
+Logger = logging.getLogger("OPT_logger")
+
+"Step of the grid the nutation angles are interpolated on [days]"
+NUTATION_STEP = 1 / 24
+
+
+def satrec(satellite):
+    """Returns the SGP4 model of a satellite.
+
+    Arguments:
+        satellite (:obj:`skyfield.sgp4lib.EarthSatellite` or :obj:`sgp4.api.Satrec` or list of str): The satellite, or the two rows of its TLE.
+
+    Returns:
+        (:obj:`sgp4.api.Satrec`): The model.
+
+    """
+    if isinstance(satellite, Satrec):
+        return satellite
+    if hasattr(satellite, "model"):
+        return satellite.model
+    return Satrec.twoline2rv(satellite[0], satellite[1])
+
+
+def nutation_angles(current_time_skyfield):
+    """Returns the nutation angles (IAU 2000A), interpolated on a grid with a step of *NUTATION_STEP* if there are more times than grid points.
+
+    Arguments:
+        current_time_skyfield (:obj:`skyfield.timelib.Time`): One or several times.
+
+    Returns:
+        (tuple): Nutation in longitude and in obliquity [radians].
+
+    """
+    tt = current_time_skyfield.tt
+    if np.ndim(tt) == 0:
+        return iau2000a_radians(current_time_skyfield)
+
+    start = np.floor(tt.min() / NUTATION_STEP) * NUTATION_STEP - NUTATION_STEP
+    grid = np.arange(start, tt.max() + 2 * NUTATION_STEP, NUTATION_STEP)
+    if len(grid) >= tt.size:
+        return iau2000a_radians(current_time_skyfield)
+
+    d_psi, d_eps = iau2000a_radians(current_time_skyfield.ts.tt_jd(grid))
+    spline = CubicSpline(grid - start, np.stack([d_psi, d_eps], axis=-1))
+    d_psi, d_eps = np.moveaxis(spline(tt - start), -1, 0)
+    return d_psi, d_eps
+
+
+def equinox_of_date(current_time_skyfield):
+    """Returns the rotation from GCRS to the true equator and equinox of date and the Greenwich apparent sidereal time.
+
+    Same as *skyfield.timelib.Time.M* and *Time.gast*, but with the nutation angles of *nutation_angles*.
+
+    Arguments:
+        current_time_skyfield (:obj:`skyfield.timelib.Time`): One or several times.
+
+    Returns:
+        (tuple): Rotation matrices with shape (3,3) or (3,3,times), and the sidereal time [hours].
+
+    """
+    d_psi, d_eps = nutation_angles(current_time_skyfield)
+    obliquity = mean_obliquity(current_time_skyfield.tdb) * ASEC2RAD
+    N = build_nutation_matrix(obliquity, obliquity + d_eps, d_psi)
+    M = mxmxm(N, compute_precession(current_time_skyfield.tdb), ICRS_to_J2000)
+
+    equation_of_the_equinoxes = d_psi * np.cos(obliquity) + equation_of_the_equinoxes_complimentary_terms(current_time_skyfield.tt)
+    gast = (sidereal_time(current_time_skyfield) + equation_of_the_equinoxes / tau * 24) % 24
+    return M, gast
+
+
+def rotation_to_teme(current_time_skyfield):
+    """Rotation matrices from GCRS into TEME, the same as *skyfield.sgp4lib.TEME.rotation_at*.
+
+    Arguments:
+        current_time_skyfield (:obj:`skyfield.timelib.Time`): One or several times.
+
+    Returns:
+        (array): Rotation matrices with shape (3,3) or (3,3,times).
+
+    """
+    M, gast = equinox_of_date(current_time_skyfield)
+    theta = theta_GMST1982(current_time_skyfield.whole, current_time_skyfield.ut1_fraction)[0]
+    return mxm(rot_z(theta - gast / 24 * tau), M)
+
+
+def propagate(satellites, current_time_skyfield, members=None):
+    """Propagates satellites to all given times and returns their positions and velocities in GCRS.
+
+    Arguments:
+        satellites (list): The satellites, each given as accepted by *satrec*.
+        current_time_skyfield (:obj:`skyfield.timelib.Time`): One or several times.
+        members (array of int): Index of the satellite propagated to each time. All satellites are propagated to all times if None.
+
+    Returns:
+        (tuple): Positions [km] and velocities [km/s], each with shape (satellites,times,3), or (times,3) if *members* is given.
+        Times where SGP4 fails are NaN.
+
+    """
+    "The epochs of TLEs are in UTC, so the times are given to SGP4 as Julian dates in UTC, as Skyfield does"
+    year, month, day, hour, minute, second = current_time_skyfield.utc
+    jd = np.atleast_1d(julian_day(year, month, day) - 0.5).astype(float)
+    fraction = np.atleast_1d((hour * 3600 + minute * 60 + second) / DAY_S).astype(float)
+    jd, fraction = np.broadcast_arrays(jd, fraction)
+
+    models = [satrec(satellite) for satellite in satellites]
+    if members is None:
+        errors, position_TEME, velocity_TEME = SatrecArray(models).sgp4(np.ascontiguousarray(jd), np.ascontiguousarray(fraction))
+    else:
+        "Each satellite is only propagated to its own times"
+        members = np.broadcast_to(members, jd.shape)
+        errors = np.zeros((1,) + jd.shape, dtype=np.uint8)
+        position_TEME, velocity_TEME = np.zeros((1,) + jd.shape + (3,)), np.zeros((1,) + jd.shape + (3,))
+        for member in np.unique(members):
+            times = members == member
+            errors[0, times], position_TEME[0, times], velocity_TEME[0, times] = models[member].sgp4_array(jd[times], fraction[times])
+
+    if np.any(errors):
+        for error in np.unique(errors[errors != 0]):
+            Logger.warning("SGP4 failed at " + str(np.count_nonzero(errors == error)) + " times: " + SGP4_ERRORS[error])
+
+    "Rotation matrices from GCRS into TEME with shape (3,3) or (3,3,times)"
+    R = rotation_to_teme(current_time_skyfield)
+    if R.ndim == 2:
+        R = R[:, :, None]
+    R = np.broadcast_to(R, (3, 3, len(jd)))
+
+    position = np.einsum("jit,stj->sti", R, position_TEME)
+    velocity = np.einsum("jit,stj->sti", R, velocity_TEME)
+    if members is not None:
+        return position[0], velocity[0]
+    return position, velocity
+
+
+def position_velocity(satellite, current_time_skyfield):
+    """Propagates one satellite, see *propagate*.
+
+    Returns:
+        (tuple): Positions [km] and velocities [km/s], each with shape (times,3).
+
+    """
+    position, velocity = propagate([satellite], current_time_skyfield)
+    return position[0], velocity[0]
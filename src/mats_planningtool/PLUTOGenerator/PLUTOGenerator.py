@@ -1,33 +1,63 @@
 # -*- coding: utf-8 -*-
 """This module contains the core function of the *PLUTO_gen* program and the first subfunction of *PLUTO_gen*.
+
+The *XML-Timeline* is read one command at a time with an incremental parser and the PLUTO script is written
+through a single open file, so that the memory used and the number of file operations do not grow with the length of the timeline.
 """
 
-import xmltodict
+from lxml import etree
+
+from mats_planningtool.XMLGenerator.Modes_and_Tests.Macros_Commands.CommandBuffer import Command
 
+_templates = {}
 
-def read_xml(filename):
-    """Reads in the XML to be converted
 
-    Reads a *XML-Timeline*  file. And returns a dictionary
+def read_commands(filename):
+    """Reads the commands of an *XML-Timeline* one at a time.
+
+    Procedures are skipped. Each command element is removed from the parsed tree once it has been read.
 
     Arguments:
         filename (str): A string containing the path to the Timeline-XML file.
-    Returns:
-        doc (dictionary)     
+    Yields:
+        command (:obj:`Command`)
     """
 
-    with open(filename) as fd:
-        doc = xmltodict.parse(fd.read())
-    return doc
+    for event, element in etree.iterparse(filename, events=("end",), tag=("command", "procedure")):
+        if element.tag == "command":
+            yield Command.from_element(element)
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
 
 
 def check_payload_command(pafCommand):
-    return pafCommand["@mnemonic"][0:6] == "TC_paf"
+    return pafCommand.mnemonic[0:6] == "TC_paf"
+
+
+def command_template(mnemonic, names):
+    """Returns the PLUTO template of a command, created once for each mnemonic and list of argument names.
+
+    Arguments:
+        mnemonic (str): Mnemonic of the command.
+        names (tuple of str): Names of the arguments, in order.
+    Returns:
+        template (str): To be filled in with the values of the arguments using *str.format*.
+    """
 
+    key = (mnemonic, names)
+    if key not in _templates:
+        _templates[key] = (
+            "\t\t\tlog to string (current time());\n"
+            + "\t\t\tinitiate " + mnemonic + " with arguments\n"
+            + ",\n".join("\t\t\t\t" + name + ":={}" for name in names)
+            + "\n\t\t\tend with;\n\n"
+        )
+    return _templates[key]
 
-def write_header(plutopath="tmp.plp"):
+
+def write_header(f):
     # Writes header with instrument restart. Designed to take 45s to match the procedure that will run on the satellite
-    f = open(plutopath, "w")
     f.write("procedure\n")
     f.write("\tinitiate and confirm step myStep\n")
     f.write("\t\tmain\n")
@@ -63,68 +93,41 @@ def write_header(plutopath="tmp.plp"):
     f.write("\n")
     f.write("\t\t\twait for 5s;\n")
     f.write("\n")
-    f.close()
 
 
-def write_footer(plutopath="tmp.plp"):
-    f = open(plutopath, "a+")
+def write_footer(f):
     f.write("\t\tend main\n")
     f.write("\tend step;\n")
     f.write("end procedure\n")
-    f.close()
 
 
-def write_tcArgument(pafCommand, plutopath="tmp.plp"):
+def write_tcArgument(f, pafCommand):
     if not check_payload_command(pafCommand):
         raise ValueError(
             "Invalid Command "
-            + pafCommand["@mnemonic"]
+            + pafCommand.mnemonic
             + " PLUTO generator only supports Platform commands"
         )
-    elif pafCommand["@mnemonic"] == "TC_pafPWRTOGGLE":
+    elif pafCommand.mnemonic == "TC_pafPWRTOGGLE":
         raise ValueError(
             "Redundant Command "
-            + pafCommand["@mnemonic"]
+            + pafCommand.mnemonic
             + " PLUTO generator will remove powertoggles"
         )
     else:
-        f = open(plutopath, "a+")
-        if pafCommand["comment"] is not None:
-            f.write('\t\t\tlog "' + pafCommand["comment"].split(",")[0] + '"' + ";\n")
-        f.write("\t\t\tlog to string (current time());\n")
-        f.write("\t\t\tinitiate " + str(pafCommand["@mnemonic"]) + " with arguments\n")
-        if isinstance(pafCommand["tcArguments"]["tcArgument"], list):
-            for i in range(len(pafCommand["tcArguments"]["tcArgument"])):
-                # print(str(pafCommand["tcArguments"]["tcArgument"][i]))
-                f.write(
-                    "\t\t\t\t"
-                    + str(pafCommand["tcArguments"]["tcArgument"][i]["@mnemonic"])
-                    + ":="
-                    + str(pafCommand["tcArguments"]["tcArgument"][i]["#text"])
-                )
-                if i < len(pafCommand["tcArguments"]["tcArgument"]) - 1:
-                    f.write(",\n")
-                else:
-                    f.write("\n")
-        else:
-            # print(str(pafCommand["tcArguments"]["tcArgument"]))
-            f.write(
-                "\t\t\t\t"
-                + str(pafCommand["tcArguments"]["tcArgument"]["@mnemonic"])
-                + ":="
-                + str(pafCommand["tcArguments"]["tcArgument"]["#text"])
+        if pafCommand.comment is not None and pafCommand.comment.strip():
+            f.write('\t\t\tlog "' + pafCommand.comment.strip().split(",")[0] + '"' + ";\n")
+        names = tuple(name for name, value in pafCommand.arguments)
+        f.write(
+            command_template(pafCommand.mnemonic, names).format(
+                *(value for name, value in pafCommand.arguments)
             )
-            f.write("\n")
-
-        f.write("\t\t\tend with;\n\n")
-    f.close()
+        )
 
 
-def write_wait(wait_time, plutopath="tmp.plp"):
+def write_wait(f, wait_time):
     if wait_time > 0:
-        f = open(plutopath, "a+")
         f.write("\t\t\twait for " + str(wait_time) + "s;\n\n")
-        f.close()
 
 
 def PLUTO_generator(
@@ -141,43 +144,51 @@ def PLUTO_generator(
     Arguments:
         SCIMXML_Path (str): A string containing the path to the Timeline-XML file.
         PLUTO_Path (str): A string containing the path where outputfile should be written (default "pluto_script.plp")
-        wait_platform (Bool): Whether to wait for payload commands or not (default = False) 
+        wait_platform (Bool): Whether to wait for payload commands or not (default = False)
     Returns:
-        None     
+        None
     """
 
-    timeline_xml = read_xml(XML_Path)
-    write_header(PLUTO_Path)
-    for i in range(len(timeline_xml["InnoSatTimeline"]["listOfCommands"]["command"])):
-        if i < len(timeline_xml["InnoSatTimeline"]["listOfCommands"]["command"]) - 1:
-            wait_time = int(
-                timeline_xml["InnoSatTimeline"]["listOfCommands"]["command"][i + 1][
-                    "relativeTime"
-                ]
-            ) - int(
-                timeline_xml["InnoSatTimeline"]["listOfCommands"]["command"][i][
-                    "relativeTime"
-                ]
-            )
-        else:
-            wait_time = 0
-        try:
-            write_tcArgument(
-                timeline_xml["InnoSatTimeline"]["listOfCommands"]["command"][i],
-                PLUTO_Path,
-            )
-            if max_wait_time == None:
-                write_wait(wait_time, PLUTO_Path)
-            else:
-                write_wait(min(wait_time, max_wait_time), PLUTO_Path)
+    with open(PLUTO_Path, "w") as f:
+        write_header(f)
 
-        except ValueError as e:
-            print(e)
-            if wait_platform:
-                write_wait(wait_time, PLUTO_Path)
-            else:
-                print("Wait time ignored")
+        "The wait after a command is the time until the next command, so each command is written when the next is read"
+        previous_command = None
+        for command in read_commands(XML_Path):
+            if previous_command is not None:
+                write_command(f, previous_command, command.relativeTime - previous_command.relativeTime, wait_platform, max_wait_time)
+            previous_command = command
+        if previous_command is not None:
+            write_command(f, previous_command, 0, wait_platform, max_wait_time)
 
-    write_footer(PLUTO_Path)
+        write_footer(f)
 
     return
+
+
+def write_command(f, command, wait_time, wait_platform=False, max_wait_time=None):
+    """Writes a command followed by the wait until the next command.
+
+    Arguments:
+        f (file): The PLUTO script.
+        command (:obj:`Command`): The command.
+        wait_time (int): Time until the next command [s].
+        wait_platform (Bool): Whether to wait after commands which are not payload commands.
+        max_wait_time (int): Longest wait written after a payload command [s]. No limit if None.
+    Returns:
+        None
+    """
+
+    try:
+        write_tcArgument(f, command)
+        if max_wait_time == None:
+            write_wait(f, wait_time)
+        else:
+            write_wait(f, min(wait_time, max_wait_time))
+
+    except ValueError as e:
+        print(e)
+        if wait_platform:
+            write_wait(f, wait_time)
+        else:
+            print("Wait time ignored")
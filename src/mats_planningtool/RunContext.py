@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""State of a single run of *Timeline_gen* or *XML_gen*, kept apart from the loaded *Configuration File*.
+
+While a program runs it keeps track of for example the relativeTime of the latest CMD and the current pointing altitude.
+That state is held by a *RunContext* which is entered when the program starts. The attributes of *configFile* with
+the same names (*latestRelativeTime*, *current_pointing*, *LargestSetTEXPMS*, *Mode120Iteration* and *Mode124Iteration*)
+read and write the state of the current run, so several runs can use the same *configFile* at the same time in different
+threads without interfering with each other.
+
+Each run also has its own logger. Records logged to the shared logger of OPT during a run are passed on to the handlers
+set up for that run only (see *Library.SetupLogger*), so the logs of concurrent runs are not mixed.
+
+"""
+
+import contextvars
+import itertools
+import logging
+
+_current_run = contextvars.ContextVar("OPT_run", default=None)
+_run_ids = itertools.count(1)
+
+
+def current_run():
+    """Returns the *RunContext* entered in the current thread, or None if there is none."""
+    return _current_run.get()
+
+
+def outside_of_runs(record):
+    "Logging filter which drops records logged during a run"
+    return _current_run.get() is None
+
+
+class RunHandler(logging.Handler):
+    """Handler of the shared logger which passes records logged during a run on to the logger of that run."""
+
+    def emit(self, record):
+        run = _current_run.get()
+        if run is not None:
+            run.logger.handle(record)
+
+
+class RunContext:
+    """State of a run.
+
+    Used as a context manager, which makes the run the current run of the thread until it exits.
+
+    Attributes:
+        id (int): Number of the run, unique within the process.
+        latestRelativeTime (int): The relativeTime of the latest scheduled CMD [s].
+        current_pointing (float): The current pointing altitude [m], None if unknown.
+        LargestSetTEXPMS (int): The largest exposure time set with the latest CCD macro [ms].
+        Mode120Iteration (int): Number of the next Mode120 scheduled.
+        Mode124Iteration (int): Number of the next Mode124 scheduled.
+        precomputed (dict): Results of date calculators run before the modes are scheduled, see *TimelineGenerator.Speculation*.
+        logger (:obj:`logging.Logger`): Logger of the run. Not registered with the logging module, so it is freed with the run.
+
+    """
+
+    def __init__(self):
+        self.id = next(_run_ids)
+        self.latestRelativeTime = 0
+        self.current_pointing = None
+        self.LargestSetTEXPMS = 0
+        self.Mode120Iteration = 1
+        self.Mode124Iteration = 1
+        self.precomputed = {}
+        self.logger = logging.Logger("OPT_run" + str(self.id), logging.DEBUG)
+        self._tokens = []
+
+    def __getstate__(self):
+        "The logger and the entered contexts stay in the process, so that a *configFile* can be sent to other processes"
+        state = self.__dict__.copy()
+        del state["logger"], state["_tokens"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.logger = logging.Logger("OPT_run" + str(self.id), logging.DEBUG)
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append(_current_run.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current_run.reset(self._tokens.pop())
+        if not self._tokens:
+            self.remove_handlers()
+        return False
+
+    def remove_handlers(self):
+        "Closes and removes the handlers of the logger of the run"
+        for handler in self.logger.handlers[:]:
+            self.logger.removeHandler(handler)
+            handler.close()
+
+    def set_handlers(self, handlers):
+        """Replaces the handlers of the logger of the run.
+
+        Arguments:
+            handlers (list of :obj:`logging.Handler`): The new handlers.
+
+        """
+        self.remove_handlers()
+        for handler in handlers:
+            self.logger.addHandler(handler)
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""Local star catalogue and spatial index over it, used by the star modes (Mode120 and Mode121-123).
+
+The Hipparcos catalogue is kept as a local NumPy file (*STAR_STORE_PATH*, in the data directory of the package, or the
+path in the environment variable *STAR_STORE_ENV* where the package directory is not writable), so that no network
+access is needed. The file contains one row per star with the HIP number, magnitude, position, parallax
+and proper motion, sorted by magnitude. It is memory mapped when loaded and the stars brighter than a given magnitude are
+found with a binary search, so only those rows are read. The file must be built once from *hip_main.dat* with::
+
+    python -m mats_planningtool.StarCatalogue hip_main.dat
+
+Only stars close to the path of the optical axis of MATS, or close to its orbital plane, can ever be seen in the FOV.
+*StarIndex* holds the directions to the stars as unit vectors in a KD-tree, so that those stars can be selected
+without projecting the whole catalogue into the frame of the instrument at every timestep.
+
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.linalg import norm
+from scipy.spatial import cKDTree
+from skyfield import api
+from skyfield.data import hipparcos
+
+Logger = logging.getLogger("OPT_logger")
+
+"Name of the local star catalogue"
+STAR_STORE_FILE = "hipparcos_stars.npy"
+
+"Default path of the local star catalogue, in the data directory of the package so that it does not depend on the current directory"
+STAR_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", STAR_STORE_FILE)
+
+"Environment variable which overrides *STAR_STORE_PATH*"
+STAR_STORE_ENV = "MATS_STAR_STORE"
+
+"Epoch of the positions in the Hipparcos catalogue [year]"
+HIPPARCOS_EPOCH = 1991.25
+
+_COLUMNS = ["hip", "magnitude", "ra_degrees", "dec_degrees", "parallax_mas", "ra_mas_per_year", "dec_mas_per_year"]
+_STORE_DTYPE = np.dtype([(column, "<i4" if column == "hip" else "<f8") for column in _COLUMNS])
+
+_stores = {}
+_store_ids = {}
+
+
+def star_store_path(path=None):
+    """Returns the path of the local star catalogue.
+
+    Arguments:
+        path (str): Path of the NumPy file. If None, the path in the environment variable *STAR_STORE_ENV* or else *STAR_STORE_PATH*.
+
+    Returns:
+        (str): The path.
+
+    """
+    if path is None:
+        path = os.environ.get(STAR_STORE_ENV) or STAR_STORE_PATH
+    return path
+
+
+def build_star_store(hip_main_path=None, path=None):
+    """Builds the local star catalogue from the Hipparcos main catalogue.
+
+    Arguments:
+        hip_main_path (str): Path to *hip_main.dat* (may be gzipped). If None, it is opened with Skyfield, which
+            uses a *hip_main.dat* in the current directory or downloads it.
+        path (str): Path of the NumPy file to create, see *star_store_path*.
+
+    Returns:
+        (array): The catalogue, as a structured array sorted by magnitude.
+
+    """
+    if hip_main_path is None:
+        with api.load.open(hipparcos.URL) as hip_main:
+            df = hipparcos.load_dataframe(hip_main)
+    else:
+        with open(hip_main_path, "rb") as hip_main:
+            df = hipparcos.load_dataframe(hip_main)
+
+    df = df.dropna(subset=["magnitude", "ra_degrees", "dec_degrees"]).reset_index()
+
+    store = np.zeros(len(df), dtype=_STORE_DTYPE)
+    for column in _COLUMNS:
+        store[column] = df[column].to_numpy()
+    store = store[np.argsort(store["magnitude"], kind="stable")]
+
+    path = star_store_path(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.save(path, store)
+    _stores.pop(path, None)
+    _store_ids.pop(path, None)
+    Logger.info("Star catalogue with " + str(len(store)) + " stars saved to: " + path)
+    return store
+
+
+def load_star_store(path=None):
+    """Returns the local star catalogue, memory mapped from the NumPy file.
+
+    Arguments:
+        path (str): Path of the NumPy file, see *star_store_path*.
+
+    Returns:
+        (array): The catalogue, as a structured array sorted by magnitude.
+
+    Raises:
+        FileNotFoundError: If the catalogue has not been built, see *build_star_store*.
+
+    """
+    path = star_store_path(path)
+    if path not in _stores:
+        if not os.path.isfile(path):
+            message = ("Star catalogue " + path + " not found, build it from the Hipparcos main catalogue with: "
+                       "python -m mats_planningtool.StarCatalogue hip_main.dat " + path)
+            Logger.error(message)
+            raise FileNotFoundError(message)
+        _stores[path] = np.load(path, mmap_mode="r")
+
+    return _stores[path]
+
+
+def star_store_id(path=None):
+    """Returns a hash of the content of the local star catalogue, so that results which depend on it can be identified.
+
+    Arguments:
+        path (str): Path of the NumPy file, see *star_store_path*.
+
+    Returns:
+        (str): The hash, or None if the catalogue does not exist.
+
+    """
+    path = star_store_path(path)
+    if not os.path.isfile(path):
+        return None
+    if path not in _store_ids:
+        with open(path, "rb") as store_file:
+            _store_ids[path] = hashlib.sha1(store_file.read()).hexdigest()
+
+    return _store_ids[path]
+
+
+def magnitude_limit(Vmag):
+    """Interprets a magnitude limit.
+
+    Arguments:
+        Vmag (float or str): Largest magnitude (inclusive), or an expression such as '<2' or '<=2'.
+
+    Returns:
+        (tuple): The limit and if it is inclusive.
+
+    """
+    if isinstance(Vmag, str):
+        Vmag = Vmag.strip()
+        if Vmag.startswith("<="):
+            return float(Vmag[2:]), True
+        if Vmag.startswith("<"):
+            return float(Vmag[1:]), False
+        return float(Vmag), True
+    return float(Vmag), True
+
+
+def bright_stars(Vmag, path=None):
+    """Returns the stars brighter than a magnitude limit.
+
+    Arguments:
+        Vmag (float or str): Magnitude limit, see *magnitude_limit*.
+        path (str): Path of the local star catalogue, see *star_store_path*.
+
+    Returns:
+        (array): Rows of the catalogue, sorted by magnitude.
+
+    """
+    store = load_star_store(path)
+    limit, inclusive = magnitude_limit(Vmag)
+    return store[: np.searchsorted(store["magnitude"], limit, side="right" if inclusive else "left")]
+
+
+def stars_dataframe(Vmag, path=None):
+    """Returns the stars brighter than a magnitude limit in the same form as *skyfield.data.hipparcos.load_dataframe*.
+
+    Arguments:
+        Vmag (float or str): Magnitude limit, see *magnitude_limit*.
+        path (str): Path of the local star catalogue, see *star_store_path*.
+
+    Returns:
+        (:obj:`pandas.DataFrame`): The stars, indexed and sorted by HIP number. Can be used with *skyfield.api.Star.from_dataframe*.
+
+    """
+    stars = bright_stars(Vmag, path)
+    df = pd.DataFrame({column: np.asarray(stars[column]) for column in _COLUMNS})
+    df = df.assign(ra_hours=df["ra_degrees"] / 15.0, epoch_year=HIPPARCOS_EPOCH)
+    return df.set_index("hip").sort_index()
+
+
+def _angles_between(vectors_1, vectors_2):
+    "Angles [degrees] between rows of unit vectors"
+    return np.rad2deg(2 * np.arcsin(np.clip(norm(vectors_1 - vectors_2, axis=1) / 2, 0, 1)))
+
+
+class StarIndex:
+    """KD-tree over the directions to stars.
+
+    Attributes:
+        vectors (array): Directions to the stars as unit vectors with shape (N,3).
+        tree (:obj:`scipy.spatial.cKDTree`): KD-tree over *vectors*.
+
+    """
+
+    def __init__(self, vectors):
+        vectors = np.asarray(vectors, dtype=float).reshape(-1, 3)
+        self.vectors = vectors / norm(vectors, axis=1)[:, None]
+        self.tree = cKDTree(self.vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def query_cone(self, direction, radius):
+        """Returns the indices of the stars within a cone.
+
+        Arguments:
+            direction (array): Direction of the axis of the cone.
+            radius (float): Half opening angle of the cone [degrees].
+
+        Returns:
+            (array): Sorted indices of the stars.
+
+        """
+        return self.query_track(np.asarray(direction, dtype=float).reshape(1, 3), radius)
+
+    def query_track(self, directions, radius):
+        """Returns the indices of the stars within an angle from any point of a track, for example the optical axis over time.
+
+        The track is thinned out before the KD-tree is queried, and the radius of each query is widened with half of the
+        angle between the points kept, so that no star within *radius* of the full track is missed.
+
+        Arguments:
+            directions (array): Directions along the track with shape (T,3), in order.
+            radius (float): Maximum angle between a star and the track [degrees].
+
+        Returns:
+            (array): Sorted indices of the stars.
+
+        """
+        directions = np.asarray(directions, dtype=float)
+        directions = directions / norm(directions, axis=1)[:, None]
+
+        if len(directions) > 1:
+            spacing = _angles_between(directions[1:], directions[:-1]).max()
+            step = max(1, int(radius / 2 / spacing)) if spacing > 0 else len(directions)
+            points = directions[::step]
+            if (len(directions) - 1) % step != 0:
+                points = np.vstack([points, directions[-1:]])
+        else:
+            points = directions
+
+        if len(points) > 1:
+            gap = _angles_between(points[1:], points[:-1]).max()
+        else:
+            gap = 0
+
+        chord = 2 * np.sin(np.deg2rad(min(radius + gap / 2, 180)) / 2)
+        neighbours = self.tree.query_ball_point(points, chord)
+        return np.unique(np.concatenate([np.asarray(stars, dtype=int) for stars in neighbours] + [np.zeros(0, dtype=int)]))
+
+    def query_band(self, pole, half_width):
+        """Returns the indices of the stars within a band around a great circle, for example the orbital plane.
+
+        Arguments:
+            pole (array): Normal of the plane of the great circle.
+            half_width (float): Maximum angle between a star and the plane [degrees].
+
+        Returns:
+            (array): Sorted indices of the stars.
+
+        """
+        pole = np.asarray(pole, dtype=float)
+        pole = pole / norm(pole)
+        return np.nonzero(np.abs(self.vectors @ pole) <= np.sin(np.deg2rad(min(half_width, 90))))[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local star catalogue from the Hipparcos main catalogue")
+    parser.add_argument("hip_main", help="path to hip_main.dat")
+    parser.add_argument("output", nargs="?", default=star_store_path(), help="NumPy file to create")
+    arguments = parser.parse_args()
+    build_star_store(arguments.hip_main, arguments.output)
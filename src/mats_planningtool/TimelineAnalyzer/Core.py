@@ -2,37 +2,127 @@
 """
 Searches a *Science Mode Timeline* .json file for a given date and returns the scheduled mode and its settings.
 A part of the Operational Planning Tool.
+
+The Science Mode Timeline is parsed once into a *TimelineIndex*, which splits it into segments during which the scheduled
+mode does not change, so that the modes scheduled at a whole array of dates are found with a single binary search.
 """
 
 import ephem
 import json
 import os
 
+import numpy as np
 
-def get_mode(Mode_Timeline, date):
+"The epoch of ephem.Date (0.0), used to convert numpy.datetime64 into ephem dates"
+_EPHEM_EPOCH = np.datetime64("1899-12-31T12:00:00", "us")
+
+
+def to_ephem_dates(dates):
+    """Converts dates into an array of ephem dates (days since 1899/12/31 12:00 UTC).
+
+    Arguments:
+        dates (list or array): Dates as strings ('2019/09/05 12:09:25'), :obj:`ephem.Date`, floats, datetimes or numpy.datetime64.
+
+    Returns:
+        (array): The dates as floats.
+
+    """
+    array = np.asarray(dates)
+    if np.issubdtype(array.dtype, np.datetime64):
+        return (array - _EPHEM_EPOCH) / np.timedelta64(1, "D")
+    if np.issubdtype(array.dtype, np.number):
+        return array.astype(float)
+    return np.array([float(ephem.Date(date)) for date in array.ravel()]).reshape(array.shape)
+
+
+class TimelineIndex:
+    """The modes of a Science Mode Timeline, in the order of the timeline.
 
-    for x in range(len(Mode_Timeline)):
+    A mode is scheduled from its start date until its end date, or until the start date of the next mode in the timeline if
+    that is later. Where modes overlap, the first one in the timeline is returned, as by the former linear search of *get_mode*.
 
-        "Skip if first element is Timeline_settings"
-        if Mode_Timeline[x][0] == "Timeline_settings":
-            continue
+    Attributes:
+        modes (array of str): Names of the modes.
+        settings (list of dict): Settings of the modes, the same objects as in the Science Mode Timeline.
+        start_dates (array): Start dates of the modes as ephem dates.
+        end_dates (array): End dates of the modes as ephem dates.
+
+    """
 
-        start_date = ephem.Date(Mode_Timeline[x][1])
-        end_date = ephem.Date(Mode_Timeline[x][2])
+    def __init__(self, Mode_Timeline):
+        entries = [entry for entry in Mode_Timeline if entry[0] != "Timeline_settings"]
 
-        "If not the last element, extract the starting date of the next mode"
-        if x != len(Mode_Timeline) - 1:
-            next_start_date = ephem.Date(Mode_Timeline[x + 1][1])
+        self.modes = np.array([entry[0] for entry in entries], dtype=object)
+        self.settings = [entry[3] for entry in entries]
+        self.start_dates = np.array([float(ephem.Date(entry[1])) for entry in entries])
+        self.end_dates = np.array([float(ephem.Date(entry[2])) for entry in entries])
+
+        "Latest date at which each mode is scheduled (exclusive)"
+        stop_dates = self.end_dates.copy()
+        stop_dates[:-1] = np.maximum(self.end_dates[:-1], self.start_dates[1:])
+
+        "Segments between all start and stop dates, given the first mode in the timeline which is scheduled during them"
+        self._boundaries = np.unique(np.concatenate([self.start_dates, stop_dates]))
+        self._segment_modes = np.full(len(self._boundaries), -1)
+        for x in reversed(range(len(entries))):
+            first, last = np.searchsorted(self._boundaries, [self.start_dates[x], stop_dates[x]])
+            self._segment_modes[first:last] = x
+
+    @classmethod
+    def from_file(cls, science_mode_timeline_path):
+        """Reads a Science Mode Timeline .json file and indexes it."""
+        with open(science_mode_timeline_path, "r") as read_file:
+            return cls(json.load(read_file))
 
-        "If the input date is between the starting and end date of a mode or between the starting dates for two different modes"
-        if date >= start_date and (date < end_date or date < next_start_date):
-            Mode = Mode_Timeline[x][0]
-            Settings = Mode_Timeline[x][3]
-            break
-        elif x == len(Mode_Timeline) - 1:
-            raise ValueError("No mode scheduled during that date")
+    def __len__(self):
+        return len(self.modes)
 
-    return Mode, Settings
+    def lookup(self, dates):
+        """Finds the modes scheduled at the given dates.
+
+        Arguments:
+            dates (list or array): The dates, see *to_ephem_dates*.
+
+        Returns:
+            (array of int): Index of the mode scheduled at each date, or -1 if no mode is scheduled.
+
+        """
+        dates = to_ephem_dates(dates)
+        if len(self) == 0:
+            return np.full(dates.shape, -1)
+        segments = np.searchsorted(self._boundaries, dates, side="right") - 1
+        return np.where(segments >= 0, self._segment_modes[np.maximum(segments, 0)], -1)
+
+    def get_modes(self, dates):
+        """Returns the names and settings of the modes scheduled at the given dates.
+
+        Arguments:
+            dates (list or array): The dates, see *to_ephem_dates*.
+
+        Returns:
+            (tuple): tuple containing:
+
+                **Modes** (*array of str*): The mode scheduled at each date, None if no mode is scheduled.
+                **Settings** (*list of dict*): The settings of the mode scheduled at each date, None if no mode is scheduled.
+
+        """
+        indices = self.lookup(dates)
+        scheduled = indices >= 0
+        Modes = np.where(scheduled, self.modes[np.maximum(indices, 0)], None) if len(self) else np.full(indices.shape, None, dtype=object)
+        Settings = [self.settings[index] if index >= 0 else None for index in indices.ravel()]
+        return Modes, Settings
+
+
+def get_mode(Mode_Timeline, date):
+
+    if not isinstance(Mode_Timeline, TimelineIndex):
+        Mode_Timeline = TimelineIndex(Mode_Timeline)
+
+    index = Mode_Timeline.lookup([date])[0]
+    if index < 0:
+        raise ValueError("No mode scheduled during that date")
+
+    return Mode_Timeline.modes[index], Mode_Timeline.settings[index]
 
 
 def Timeline_analyzer(science_mode_timeline_path, date):
@@ -40,7 +130,7 @@ def Timeline_analyzer(science_mode_timeline_path, date):
 
     Arguments:
         science_mode_timeline_path (str): path to the .json file containing the Science Mode Timeline.
-        date (str): A given date and time ('2019/09/05 12:09:25')
+        date (str or list): A given date and time ('2019/09/05 12:09:25'), or a list of them.
 
     Returns:
         (tuple): tuple containing:
@@ -54,29 +144,15 @@ def Timeline_analyzer(science_mode_timeline_path, date):
         raise NameError(science_mode_timeline_path + ", No such file exist...")
     else:
 
-        ################# Read Science Mode Timeline json file ############
-        with open(science_mode_timeline_path, "r") as read_file:
-            Mode_Timeline = json.load(read_file)
-        ################# Read Science Mode Timeline json file ############
+        Mode_Timeline = TimelineIndex.from_file(science_mode_timeline_path)
 
         if isinstance(date, list):
-            Mode = []
-            Settings = []
-            for i in range(len(date)):
-                date_value = ephem.Date(date[i])
-
-                try:
-                    Mode_value, Settings_value = get_mode(
-                        Mode_Timeline, date_value)
-                except ValueError:
-                    Mode_value = []
-                    Settings_value = []
-
-                Mode.append(Mode_value)
-                Settings.append(Settings_value)
+            "Dates without a scheduled mode are given an empty list"
+            Modes, Settings = Mode_Timeline.get_modes(date)
+            Mode = [Mode_value if Mode_value is not None else [] for Mode_value in Modes]
+            Settings = [Settings_value if Settings_value is not None else [] for Settings_value in Settings]
 
         else:
-            date = ephem.Date(date)
             Mode, Settings = get_mode(Mode_Timeline, date)
 
         return Mode, Settings
@@ -17,7 +17,9 @@ import datetime as DT
 
 
 from .Modes import Modes_Header
+from . import Ensemble, Speculation
 from mats_planningtool import Library
+from mats_planningtool.OrbitSimulator.OrbitTable import get_orbit_table
 
 Logger = logging.getLogger("OPT_logger")
 
@@ -61,14 +63,24 @@ def Timeline_generator(configFile,test=False):
         Logger.error('configFile.Timeline_settings["yaw_correction"] is set wrong')
         raise TypeError
 
+    "Simulate MATS for the whole timeline once. The orbit table is saved in the output directory and reused by XML_gen and Timeline_Plotter"
+    get_orbit_table(configFile, Timeline_settings)
+
+    "Report how much the nadir eclipse entries and exits move over the ensemble of TLEs, if one is given"
+    if getattr(configFile, 'ensemble_TLEs', None):
+        Ensemble.save_eclipse_spread(configFile, configFile.ensemble_TLEs)
+
     "Get a List of Modes and CMDs in a prioritized order which are to be scheduled"
     Scheduling_priority = configFile.Scheduling_priority()
     Logger.info('Scheduling priority list: '+str(Scheduling_priority))
 
+    "Run the simulations of the date calculators of the modes concurrently before the modes are scheduled"
+    Speculation.speculate(configFile, Scheduling_priority)
+
     SCIMOD_Timeline_unchronological = []
 
     "Create Occupied_Timeline dictionary with keys equal to keys of Scheduling_priority"
-    Occupied_Timeline = {key: [] for key in Scheduling_priority}
+    Occupied_Timeline = Library.OccupiedTimeline({key: [] for key in Scheduling_priority})
     "Create scheduled_instances dictionary with keys equal to keys of Scheduling_priority. This will keep track of how many times something is scheduled"
     scheduled_instances = {key: 0 for key in Scheduling_priority}
 
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""Spread of the times of the events of a timeline over an ensemble of TLEs of MATS.
+
+A timeline is built from a single TLE, but the times when the stars cross the FOV and when nadir enters and leaves eclipse shift as
+the TLE ages. An ensemble is a set of TLEs of MATS, for example the TLEs of the last weeks or variants of the TLE of the timeline
+(see *perturbed_TLEs*). It is set with *configFile.ensemble_TLEs*, and *Timeline_gen* then:
+
+    - finds when each star spotted by *Mode120_date_calculator* crosses V_offset for each TLE of the ensemble (see *crossing_spread*),
+      and adds the spread of the times to the *SpottedStarList*, to the .csv file of the visible stars and to the comment of Mode120.
+    - finds the nadir eclipse entries and exits of the timeline for each TLE of the ensemble (see *eclipse_spread*), and saves
+      their spread in the output directory.
+
+A Mode120 whose star is spotted with a small spread by all TLEs of the ensemble is robust to the age of the TLE.
+
+All TLEs are simulated together with *MatsBana.Ensemble_Simulator_batch*, which propagates them in one call and shares the star
+catalogue, the ephemeris and the rotations of each time, instead of running the simulations of the timeline once per TLE.
+
+"""
+
+import datetime as DT
+import json
+import logging
+import os
+
+import ephem
+import numpy as np
+from numpy.linalg import norm
+from sgp4.api import WGS72, Satrec
+from sgp4.exporter import export_tle
+from skyfield.api import EarthSatellite, utc
+
+from mats_planningtool.Library import find_crossings, refine_crossings
+from mats_planningtool.OrbitSimulator import Ephemeris, EventCalendar, GeoidLib, Propagator
+from mats_planningtool.OrbitSimulator.MatsBana import Ensemble_Simulator_batch, skyfield_times
+
+Logger = logging.getLogger("OPT_logger")
+
+"Largest shift of an event from its time in the timeline which is searched for in the ensemble [s]"
+CROSSING_WINDOW = 120
+
+"Accuracy of the times of the events of the ensemble [s]"
+TOLERANCE = 0.01
+
+"Name of the file in the output directory where *save_eclipse_spread* saves the spread of the nadir eclipse entries and exits"
+ECLIPSE_FILE = "Ensemble_Nadir_Eclipse_Events.json"
+
+
+def perturbed_TLEs(TLE, time_offsets):
+    """Returns variants of a TLE where MATS is ahead of or behind the TLE along the orbit, which is the largest error of an old TLE.
+
+    Arguments:
+        TLE (list of str): The two rows of the TLE.
+        time_offsets (list of float): How far ahead of the TLE MATS is in each variant [s].
+
+    Returns:
+        (list of list of str): The two rows of the TLE of each variant.
+
+    """
+    model = Satrec.twoline2rv(TLE[0], TLE[1])
+
+    TLEs = []
+    for time_offset in time_offsets:
+        variant = Satrec()
+        "The epoch is given as days since 1949 December 31 00:00 UT"
+        variant.sgp4init(WGS72, "i", model.satnum, model.jdsatepoch + model.jdsatepochF - 2433281.5, model.bstar,
+                         model.ndot, model.nddot, model.ecco, model.argpo, model.inclo,
+                         (model.mo + model.no_kozai * time_offset / 60) % (2 * np.pi), model.no_kozai, model.nodeo)
+        variant.classification = model.classification
+        variant.intldesg = model.intldesg
+        TLEs.append(list(export_tle(variant)))
+
+    return TLEs
+
+
+def spread(offsets):
+    """Returns the number of TLEs which have an event, the mean shift of the event and the spread of its times.
+
+    Arguments:
+        offsets (array): Shift of the event for each TLE of the ensemble [s], NaN where the TLE has no event.
+
+    Returns:
+        (dict): The number of TLEs which have the event, the size of the ensemble, the mean shift [s] and the spread (maximum minus minimum) [s].
+        The shift and the spread are None if no TLE has the event.
+
+    """
+    found = offsets[np.isfinite(offsets)]
+    if len(found) == 0:
+        return {"Ensemble_found": 0, "Ensemble_size": len(offsets), "Date_offset [s]": None, "Date_spread [s]": None}
+    return {"Ensemble_found": len(found), "Ensemble_size": len(offsets),
+            "Date_offset [s]": float(found.mean()), "Date_spread [s]": float(found.max() - found.min())}
+
+
+def crossing_spread(configFile, SpottedStarList, V_offset, pointing_altitude, TLEs):
+    """Finds when the stars spotted by *Mode120_date_calculator* cross V_offset for each TLE of an ensemble.
+
+    The crossings of all stars and TLEs are found together, by bisection within *CROSSING_WINDOW* of the crossing of the timeline.
+    A TLE spots a star if it crosses V_offset within the window and inside of the horizontal filter of Mode120.
+
+    Arguments:
+        configFile (obj): input config file
+        SpottedStarList (list of dict): The spotted stars, see *Mode120_date_calculator*.
+        V_offset (float): Vertical offset of the FOV where the stars are spotted [degrees].
+        pointing_altitude (float): Pointing altitude [km].
+        TLEs (list of list of str): The ensemble.
+
+    Returns:
+        (list of dict): Copies of the spotted stars with the keys added by *spread*, where 'Ensemble_found' is the number of TLEs spotting
+        the star and 'Date_offset [s]' and 'Date_spread [s]' are calculated over those TLEs.
+
+    """
+    from mats_planningtool.StarCatalogue import stars_dataframe
+    from mats_planningtool.TimelineGenerator.Modes.Mode120 import (
+        HORIZONTAL_FILTER, PLANETS, instrument_offsets, star_directions, target_vectors)
+
+    if len(SpottedStarList) == 0:
+        return SpottedStarList
+
+    Logger.info("Find the crossings of " + str(len(SpottedStarList)) + " stars for an ensemble of " + str(len(TLEs)) + " TLEs")
+    Timeline_settings = configFile.Timeline_settings()
+    TLE = configFile.getTLE()
+
+    "Index of each spotted star in the star catalogue, the planets are numbered after the stars as in *Mode120_simulation*"
+    df = stars_dataframe(configFile.Mode120_settings()["Vmag"])
+    rows = {str(name): row for row, name in enumerate(df.index)}
+    rows.update({planet[0]: len(df) + number for number, planet in enumerate(PLANETS)})
+    stars = np.array([rows[str(star["Name"])] for star in SpottedStarList])
+
+    "Directions to the stars and planets at the crossings of the timeline"
+    crosstimes = [DT.datetime.strptime(star["Date"], "%Y-%m-%d %H:%M:%S.%f") for star in SpottedStarList]
+    star_vec = star_directions(df, Ephemeris.timescale().from_datetime(crosstimes[0].replace(tzinfo=utc)))
+    vectors = target_vectors(stars, crosstimes, star_vec, PLANETS, EarthSatellite(TLE[0], TLE[1]))
+
+    "One crossing for each star and TLE"
+    nTLEs = len(TLEs)
+    star, member = np.repeat(np.arange(len(stars)), nTLEs), np.tile(np.arange(nTLEs), len(stars))
+    timestamps = np.array([crosstime.replace(tzinfo=utc).timestamp() for crosstime in crosstimes])[star]
+
+    def offsets(seconds, pairs):
+        datetimes = [DT.datetime.fromtimestamp(second, DT.timezone.utc) for second in seconds]
+        InvRotMatrix = Ensemble_Simulator_batch(TLEs, datetimes, Timeline_settings, pointing_altitude, member[pairs])["InvRotMatrix"]
+        hori_offset, vert_offset = instrument_offsets(InvRotMatrix, vectors[star[pairs]][None])
+        return hori_offset[0], vert_offset[0] + V_offset
+
+    everyone = np.arange(len(star))
+    lower, upper = timestamps - CROSSING_WINDOW, timestamps + CROSSING_WINDOW
+    signs = offsets(lower, everyone)[1] > 0
+    crosses = np.flatnonzero(signs != (offsets(upper, everyone)[1] > 0))
+
+    crossings = np.full(len(star), np.nan)
+    spotted = crosses
+    if len(crosses) > 0:
+        crossings[crosses] = refine_crossings(
+            lambda seconds: offsets(seconds, crosses)[1], lower[crosses], upper[crosses], TOLERANCE, signs[crosses])
+        spotted = crosses[np.abs(offsets(crossings[crosses], crosses)[0]) < HORIZONTAL_FILTER]
+
+    shifts = np.full(len(star), np.nan)
+    shifts[spotted] = crossings[spotted] - timestamps[spotted]
+    shifts = shifts.reshape(len(stars), nTLEs)
+
+    SpottedStarList = [dict(SpottedStar, **spread(shifts[index])) for index, SpottedStar in enumerate(SpottedStarList)]
+    for SpottedStar in SpottedStarList:
+        Logger.debug("Star " + str(SpottedStar["Name"]) + " at " + SpottedStar["Date"] + " spotted with " + str(SpottedStar["Ensemble_found"]) +
+                     " of " + str(nTLEs) + " TLEs, date spread [s]: " + str(SpottedStar["Date_spread [s]"]))
+
+    return SpottedStarList
+
+
+def nadir_solar_zenith_angles(TLEs, current_time_skyfield):
+    """Returns the solar zenith angle below MATS for each TLE of an ensemble, as *SolarZenithAngleNadir* of *Satellite_Simulator_batch*.
+
+    Arguments:
+        TLEs (list of list of str): The ensemble.
+        current_time_skyfield (:obj:`skyfield.timelib.Time`): The times.
+
+    Returns:
+        (array): The angles [degrees] with shape (times,TLEs).
+
+    """
+    ECI_pos = Propagator.propagate(TLEs, current_time_skyfield)[0] * 1e3
+    R_itrs = GeoidLib.rotation_to_itrs(current_time_skyfield)
+    sun_m = Ephemeris.position("Sun", current_time_skyfield, apparent=True).reshape(-1, 3) * 1e3
+
+    "The TLEs along the second axis, sharing the rotations and the Sun of each time"
+    ECI_pos = np.swapaxes(ECI_pos, 0, 1).reshape(-1, 3)
+    R_itrs = np.repeat(R_itrs, len(TLEs), axis=0)
+    sun_m = np.repeat(sun_m, len(TLEs), axis=0)
+
+    sublat, sublon = GeoidLib.ecef2geodetic(GeoidLib.eci2ecef(ECI_pos, R_itrs), deg=True)[:2]
+    sundir = sun_m - ECI_pos
+    zenith = GeoidLib.ecef2eci(GeoidLib.zenith(sublat, sublon, deg=True), R_itrs)
+    angles = np.rad2deg(np.arccos(np.einsum("ij,ij->i", zenith, sundir / norm(sundir, axis=1)[:, None])))
+    return angles.reshape(-1, len(TLEs))
+
+
+def eclipse_spread(configFile, TLEs):
+    """Finds the nadir eclipse entries and exits of the timeline for each TLE of an ensemble.
+
+    Each event of the timeline (see *EventCalendar*) is matched with the event of the same kind of each TLE within *CROSSING_WINDOW*.
+
+    Arguments:
+        configFile (obj): input config file
+        TLEs (list of list of str): The ensemble.
+
+    Returns:
+        (list of dict): For each event of the timeline its name, its date ('%Y-%m-%d %H:%M:%S.%f') and the keys added by *spread*.
+
+    """
+    Timeline_settings = configFile.Timeline_settings()
+    calendar = EventCalendar.get_event_calendar(configFile, Timeline_settings)
+    start = ephem.Date(calendar.start).datetime()
+    duration = Timeline_settings["duration"]["duration"]
+
+    Logger.info("Find the nadir eclipse entries and exits for an ensemble of " + str(len(TLEs)) + " TLEs")
+
+    def values(seconds):
+        times = skyfield_times([start + DT.timedelta(seconds=float(second)) for second in seconds])
+        return nadir_solar_zenith_angles(TLEs, times) - EventCalendar.NADIR_ECLIPSE_ANGLE
+
+    crossings, members = find_crossings(values, 0, duration, EventCalendar.COARSE_STEP, TOLERANCE)
+    "Nadir enters eclipse where the angle becomes larger than *NADIR_ECLIPSE_ANGLE*"
+    entries = values(crossings)[np.arange(len(crossings)), members] > 0 if len(crossings) > 0 else np.zeros(0, dtype=bool)
+
+    events = []
+    for time, name in calendar.events(kinds=["nadir_eclipse_entry", "nadir_eclipse_exit"]):
+        second = (time - calendar.start) / ephem.second
+        found = (entries == (name == "nadir_eclipse_entry")) & (np.abs(crossings - second) <= CROSSING_WINDOW)
+
+        shifts = np.full(len(TLEs), np.nan)
+        for member in range(len(TLEs)):
+            matches = crossings[found & (members == member)] - second
+            if len(matches) > 0:
+                shifts[member] = matches[np.argmin(np.abs(matches))]
+
+        events.append(dict({"Event": name, "Date": ephem.Date(time).datetime().strftime("%Y-%m-%d %H:%M:%S.%f")}, **spread(shifts)))
+
+    return events
+
+
+def save_eclipse_spread(configFile, TLEs):
+    """Saves the result of *eclipse_spread* as *ECLIPSE_FILE* in the output directory.
+
+    Arguments:
+        configFile (obj): input config file
+        TLEs (list of list of str): The ensemble.
+
+    Returns:
+        (str): Path of the file.
+
+    """
+    events = eclipse_spread(configFile, TLEs)
+
+    path = os.path.join(configFile.output_dir, ECLIPSE_FILE)
+    with open(path, "w") as write_file:
+        json.dump(events, write_file, indent=2)
+    Logger.info("Spread of the nadir eclipse events over the ensemble saved to: " + path)
+
+    spreads = [event["Date_spread [s]"] for event in events if event["Ensemble_found"] > 0]
+    if spreads:
+        Logger.info("Largest spread of a nadir eclipse event over the ensemble [s]: " + str(max(spreads)))
+
+    return path
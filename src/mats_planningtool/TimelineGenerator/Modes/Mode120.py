@@ -9,19 +9,39 @@ import logging
 import sys
 import csv
 import os
-from pylab import array, ceil, cos, sin, cross, dot, zeros, norm, pi, arccos, floor
+from pylab import ceil, cos, norm
 from skyfield import api
-from skyfield.data import hipparcos
-from skyfield.api import wgs84, Star,utc
+from skyfield.api import Star,utc
 import numpy as np
 import datetime as DT
 
-from mats_planningtool.Library import deg2HMS
-from mats_planningtool.OrbitSimulator.MatsBana import Satellite_Simulator, xyz2radec
+from mats_planningtool.Library import deg2HMS, refine_crossings, OccupiedTimeline
+from mats_planningtool import DiskCache
+from mats_planningtool.StarCatalogue import StarIndex, star_store_id, stars_dataframe
+from mats_planningtool.OrbitSimulator.MatsBana import xyz2radec
+from mats_planningtool.OrbitSimulator.OrbitTable import Satellite_Simulator_table
+from mats_planningtool.OrbitSimulator import Ephemeris, GeoidLib, Propagator
+from mats_planningtool.TimelineGenerator import Ensemble, Speculation
 from .Mode12X import UserProvidedDateScheduler
 
 Logger = logging.getLogger("OPT_logger")
 
+"Largest number of offsets (stars times timesteps) calculated at a time by *Mode120_simulation*, which limits the memory used"
+OFFSET_WINDOW_SIZE = 2**22
+
+"Accuracy of the times when the stars cross V_offset [s]"
+CROSSING_TOLERANCE = 0.0001
+
+"Planets which are searched for after the stars, with name, magnitude and name in the ephemeris kernel"
+PLANETS = [('jupiter', -2.7, 'JUPITER BARYCENTER'), ('mars', 0.86, 'Mars'), ('moon', -12.60, 'Moon')]
+
+"Stars and planets are spotted when they cross V_offset within this horizontal offset from the optical axis [degrees]"
+HORIZONTAL_FILTER = 3
+
+"Timestep, offsets [degrees] and direction (planets only) of a star or planet close to the FOV"
+CANDIDATE_DTYPE = np.dtype([('star', np.int64), ('timestep', np.int64), ('hori_offset', np.float32),
+                            ('vert_offset', np.float32), ('vector', np.float64, 3)])
+
 
 def Mode120(Occupied_Timeline, configFile):
     """Core function for the scheduling of Mode120.
@@ -58,6 +78,126 @@ def Mode120(Occupied_Timeline, configFile):
 #####################################################################################################
 
 
+def instrument_offsets(InvRotMatrix, vectors):
+    """Subfunction, Calculates the angles of directions in the frame of the instrument.
+
+    Arguments:
+        InvRotMatrix (array): Rotation matrices from ECI to the instrument frame with shape (timesteps,3,3).
+        vectors (array): Directions in ECI, either fixed with shape (N,3) or varying in time with shape (N,timesteps,3).
+
+    Returns:
+        (tuple): Horizontal and vertical offsets from the optical axis [degrees], both with shape (N,timesteps).
+
+    """
+    if vectors.ndim == 2:
+        inst_xyz = np.einsum('tij,nj->int', InvRotMatrix, vectors, optimize=True)
+    else:
+        inst_xyz = np.einsum('tij,ntj->int', InvRotMatrix, vectors, optimize=True)
+
+    hori_offset = np.rad2deg(np.arctan2(inst_xyz[1], inst_xyz[0]))
+    vert_offset = np.rad2deg(np.arcsin(inst_xyz[2]/np.sqrt(np.einsum('int,int->nt', inst_xyz, inst_xyz))))
+    return hori_offset, vert_offset
+
+
+def star_directions(df, time):
+    """Subfunction, Returns the directions to stars as seen from the Earth.
+
+    Arguments:
+        df (:obj:`pandas.DataFrame`): The stars, see *StarCatalogue.stars_dataframe*.
+        time (:obj:`skyfield.timelib.Time`): The time of the observation.
+
+    Returns:
+        (array): The directions as unit vectors with shape (len(df),3).
+
+    """
+    star_vec = Ephemeris.earth().at(time).observe(Star.from_dataframe(df)).position.km.reshape(3, len(df)).T
+    return star_vec/norm(star_vec, axis=1)[:, None]
+
+
+def planet_positions(planets, times, MATS_skyfield):
+    """Subfunction, Returns the positions of the planets as seen from the point on the ground below MATS.
+
+    Arguments:
+        planets (list of tuple): Name, magnitude and name in the ephemeris kernel of each planet.
+        times (:obj:`skyfield.timelib.Time`): The times.
+        MATS_skyfield (:obj:`skyfield.api.EarthSatellite`): MATS.
+
+    Returns:
+        (array): The positions [km] with shape (len(planets),len(times),3).
+
+    """
+    MATS_km = Propagator.position_velocity(MATS_skyfield, times)[0]
+    R = GeoidLib.rotation_to_itrs(times)
+    lat, lon = GeoidLib.ecef2geodetic(GeoidLib.eci2ecef(MATS_km*1e3, R))[:2]
+    subpoint_km = GeoidLib.ecef2eci(GeoidLib.geodetic2ecef(lat, lon), R)/1e3
+    return np.stack([Ephemeris.position(planet[2], times).reshape(-1, 3) - subpoint_km for planet in planets])
+
+
+def target_vectors(stars, datetimes, star_vec, planets, MATS_skyfield):
+    """Subfunction, Returns the directions to stars or planets, each at its own time.
+
+    Arguments:
+        stars (array): Index of each star, with the planets numbered after the stars.
+        datetimes (list of :obj:`datetime.datetime`): The time for each star (UTC).
+        star_vec (array): Directions to all stars with shape (nstars,3).
+        planets (list of tuple): Name, magnitude and name in the ephemeris kernel of each planet.
+        MATS_skyfield (:obj:`skyfield.api.EarthSatellite`): MATS. The planets are observed from below MATS.
+
+    Returns:
+        (array): The directions with shape (len(stars),3).
+
+    """
+    nstars = len(star_vec)
+    vectors = np.zeros((len(stars), 3))
+    is_star = stars < nstars
+    vectors[is_star] = star_vec[stars[is_star]]
+
+    for number, planet in enumerate(planets):
+        is_planet = np.flatnonzero(stars == nstars+number)
+        if len(is_planet) == 0:
+            continue
+        times = Ephemeris.timescale().from_datetimes([datetimes[i].replace(tzinfo=utc) for i in is_planet])
+        vectors[is_planet] = planet_positions([planet], times, MATS_skyfield)[0]
+
+    return vectors
+
+
+def split_tracks(candidates, last_timestep):
+    """Subfunction, Splits candidates into the tracks of stars passing the FOV.
+
+    A track is the candidates of a star with no gap larger than 2 timesteps.
+
+    Arguments:
+        candidates (array): Candidates with dtype *CANDIDATE_DTYPE*.
+        last_timestep (int): Tracks with a candidate at or after this timestep are not finished.
+
+    Returns:
+        (tuple): tuple containing:
+            (list of array): The finished tracks, each sorted by time. \n
+            (array): The candidates of the unfinished tracks.
+
+    """
+    candidates = np.sort(candidates, order=['star', 'timestep'])
+    starts = np.flatnonzero((np.diff(candidates['star']) != 0) | (np.diff(candidates['timestep']) > 2))+1
+    starts = np.concatenate([[0], starts, [len(candidates)]])
+
+    tracks = []
+    unfinished = []
+    for start, end in zip(starts[:-1], starts[1:]):
+        if end == start:
+            continue
+        if candidates['timestep'][end-1] >= last_timestep:
+            unfinished.append(candidates[start:end])
+        else:
+            tracks.append(candidates[start:end])
+
+    return tracks, np.concatenate(unfinished) if unfinished else candidates[:0]
+
+
+#####################################################################################################
+#####################################################################################################
+
+
 def Mode120_date_calculator(configFile):
     """Subfunction, Simulates MATS FOV and the stars.
 
@@ -69,6 +209,9 @@ def Mode120_date_calculator(configFile):
     Saves the date and parameters regarding the spotting of a star.
     Also saves relevant data to an .csv file located in Output/.
 
+    The result of the simulation is cached on disk (see *DiskCache*) and only recalculated when its inputs change.
+    If the simulation was already run ahead of the scheduling (see *Speculation*), that result is used.
+
     Arguments:
         configFile (obj): input config file
 
@@ -77,19 +220,89 @@ def Mode120_date_calculator(configFile):
         
     """
 
+    key, simulation, arguments = Mode120_date_calculation(configFile, configFile.Mode120Iteration)
+    V_offset, pointing_altitude = arguments[6], arguments[7]
+
+    Mode120_result = DiskCache.cached(configFile, key, lambda: Speculation.precomputed(
+        configFile, key, simulation, *arguments))
+
+    SpottedStarList = Mode120_result['SpottedStarList']
+    star_list_excel = Mode120_result['star_list_excel']
+
+    if(star_list_excel is None):
+        Logger.warning('Star not found in time to consider')
+        return SpottedStarList
+
+    "Add the spread of the dates over the ensemble of TLEs, if one is given (see *Ensemble*)"
+    TLEs = getattr(configFile, 'ensemble_TLEs', None)
+    if TLEs:
+        SpottedStarList = Ensemble.crossing_spread(configFile, SpottedStarList, V_offset, pointing_altitude, TLEs)
+        star_list_excel = star_list_excel + [
+            ['Ensemble spotted'] + [str(star['Ensemble_found'])+'/'+str(star['Ensemble_size']) for star in SpottedStarList],
+            ['Date spread [s]'] + [str(star['Date_spread [s]']) for star in SpottedStarList]]
+
+    "Write spotted stars to file"
+    try:
+        os.mkdir('Output')
+    except:
+        pass
+
+    while(True):
+        try:
+            file_directory = os.path.join('Output', sys._getframe(
+                1).f_code.co_name+'_Visible_Stars__'+os.path.split(configFile.config_file_name)[1]+'__V_offset'+str(V_offset)+'.csv')
+            with open(file_directory, 'w', newline='') as write_file:
+                writer = csv.writer(write_file, dialect='excel-tab')
+                writer.writerows(star_list_excel)
+            Logger.info('Available Stars data saved to: '+file_directory)
+            #print('Available Stars data saved to: '+file_directory)
+            break
+        except PermissionError:
+            Logger.error(file_directory+' cannot be overwritten. Please close it')
+            data = input('Enter anything to try again or 1 to exit')
+            if(data == '1'):
+                sys.exit()
+
+    Logger.debug('Visible star list to be filtered:')
+    for x in range(len(SpottedStarList)):
+        Logger.debug(str(SpottedStarList[x]))
+    Logger.debug('')
+
+    Logger.debug('Exit '+str(__name__))
+    Logger.debug('')
+
+    return(SpottedStarList)
+
+
+#####################################################################################################
+#####################################################################################################
+
+
+def Mode120_date_calculation(configFile, Mode120Iteration):
+    """Subfunction, Returns the simulation which *Mode120_date_calculator* needs for a given iteration of Mode120.
+
+    Arguments:
+        configFile (obj): input config file
+        Mode120Iteration (int): Number of the Mode120 to be scheduled, which selects the V_offset and H_offset.
+
+    Returns:
+        (tuple): tuple containing:
+            (str): Key of the result, see *DiskCache.cache_key*. \n
+            (function): *Mode120_simulation*. \n
+            (tuple): The arguments of *Mode120_simulation*.
+
+    """
+
     Timeline_settings = configFile.Timeline_settings()
     Mode120_settings = configFile.Mode120_settings()
 
     ######################################################
-    "Check how many times Mode120 have been scheduled"
-    Mode120Iteration = configFile.Mode120Iteration
     "Make the Offset_Index go from 0 to len(Mode120_settings['V_offset'] for each time Mode120 is scheduled"
     Offset_Index = (Mode120Iteration-1) % (len(Mode120_settings['V_offset']))
 
     "Constants"
     V_offset = Mode120_settings['V_offset'][Offset_Index]
     H_offset = Mode120_settings['H_offset'][Offset_Index]
-    priority = Mode120_settings['Priority']
 
     pointing_altitude = Mode120_settings['pointing_altitude']/1000
     yaw_correction = Timeline_settings['yaw_correction']
@@ -122,36 +335,57 @@ def Mode120_date_calculator(configFile):
     timeline_start = DT.datetime.strptime(Timeline_settings["start_date"],'%Y/%m/%d %H:%M:%S')
     initial_time = timeline_start + DT.timedelta(seconds=Mode120_settings['freeze_start'])
     initial_time = initial_time.replace(tzinfo=utc)
-    current_time = initial_time
     Logger.info('Initial simulation date set to: '+str(initial_time))
 
+    key = DiskCache.cache_key(
+        'Mode120', TLE, Timeline_settings['start_date'], Mode120_settings['freeze_start'], duration, timestep,
+        V_offset, H_offset, Mode120_settings['Vmag'], pointing_altitude, Timeline_settings['StandardPointingAltitude'],
+        yaw_correction, Timeline_settings['yaw_amplitude'], Timeline_settings['yaw_phase'],
+        Timeline_settings['intrument_look_vector'], configFile.Operational_Science_Mode_settings()['timestep'],
+        star_store_id())
+
+    return key, Mode120_simulation, (configFile, TLE, initial_time, duration, timestep, log_timestep, V_offset, pointing_altitude)
+
+
+#####################################################################################################
+#####################################################################################################
+
+
+def Mode120_simulation(configFile, TLE, initial_time, duration, timestep, log_timestep, V_offset, pointing_altitude):
+    """Subfunction, Simulates MATS FOV and the stars for *Mode120_date_calculator*.
+
+    Arguments:
+        configFile (obj): input config file
+        TLE (list of str): TLE of MATS.
+        initial_time (:obj:`datetime.datetime`): Start of the simulation (UTC).
+        duration (int): Length of the simulation [s].
+        timestep (float): Timestep of the simulation [s].
+        log_timestep (float): Timestep of the logging [s].
+        V_offset (float): Vertical offset of the FOV where the stars are spotted [degrees].
+        pointing_altitude (float): Pointing altitude [km].
+
+    Returns:
+        (dict): Dictionary with keys 'SpottedStarList' and 'star_list_excel' (None if no star is close to the FOV).
+
+    """
+
+    Timeline_settings = configFile.Timeline_settings()
+    Mode120_settings = configFile.Mode120_settings()
+
     ##############################################
-    ts = api.load.timescale(builtin=True)
+    ts = Ephemeris.timescale()
     MATS_skyfield = api.EarthSatellite(TLE[0], TLE[1])
 
-    planets = api.load('de421.bsp')
-    earth=planets['Earth']
-    jupiter=planets['JUPITER BARYCENTER']
-    mars=planets['Mars']
-    moon=planets['Moon']
-    
     "Get relevant stars"
-    st_vec=[]
-
-    with api.load.open(hipparcos.URL) as f:
-        df = hipparcos.load_dataframe(f)
-    df=df[df['magnitude']<=Mode120_settings['Vmag']]
-    bright_stars = Star.from_dataframe(df)
-    nstars=len(bright_stars.ra.hours)
+    df = stars_dataframe(Mode120_settings['Vmag'])
+    nstars=len(df)
     ts_initial=ts.utc(initial_time.year,initial_time.month,initial_time.day,initial_time.hour,initial_time.minute,initial_time.second)
-    
-    for st in range(nstars): 
-        st_vec.append(earth.at(ts_initial).observe(bright_stars)[st].position.km)
-    st_vec.append(earth.at(ts_initial).observe(jupiter).position.km)
-    st_vec.append(earth.at(ts_initial).observe(mars).position.km)
-    st_vec.append(earth.at(ts_initial).observe(moon).position.km)
 
- 
+    "Directions to the stars as unit vectors with shape (nstars,3)"
+    star_vec = star_directions(df, ts_initial)
+
+    planets = PLANETS
+
     ##### Prepare the .csv file output #####
     star_list_excel = []
     star_list_excel.append(['Name'])
@@ -166,155 +400,162 @@ def Mode120_date_calculator(configFile):
     star_list_excel.append(['Star Dec (ICRS J2000)'])
     star_list_excel.append(['Star RA (ICRS J2000)'])
     
-    ############# Pre-allocate space ##########
-    lat_MATS = zeros((timesteps, 1))
-    long_MATS = zeros((timesteps, 1))
-    optical_axis = zeros((timesteps, 3))
-    stars_vert_offset = zeros((nstars+3,timesteps))
-    stars_hori_offset = zeros((nstars+3,timesteps))
-    stars_tot_offset = zeros((nstars+3,timesteps))
-    star_counter = 0
     spotted_star_name = []
     spotted_star_timestamp = []
-    spotted_star_timecounter = []
-    skip_star_list = []
-
-    Dec_optical_axis = zeros((timesteps, 1))
-    RA_optical_axis = zeros((timesteps, 1))
-
-    datetimes = []
-    timestamps = zeros((timesteps, 1))
 
     "Prepare the output"
     SpottedStarList = []
+    result = {'SpottedStarList': SpottedStarList, 'star_list_excel': None}
+
+    #Filtering on moon inside horizontal FOV and not too far outside vertical FOV (interpolation is done later)   
+    horisontal_filter=HORIZONTAL_FILTER #look for stars horizontally +- total degrees (Horistontal FOV is 6.06)
+    vert_filter= 10 #look at stars vertically at +- this filter in degrees (Vertical FOV is 1.52)
+
+    "The timesteps are filtered with a box widened by the angle the optical axis turns in a timestep, so that no crossing inside of the filter falls between two timesteps"
+    margin = np.rad2deg(MATS_skyfield.model.no_kozai) / 60 * timestep
+    hori_box, vert_box = horisontal_filter+margin, vert_filter+margin
 
+    "Only the stars which get close enough to the optical axis to pass the filter are simulated in each window"
+    filter_radius = np.rad2deg(np.arccos(cos(np.deg2rad(hori_box))*cos(np.deg2rad(vert_box))))
+    star_index = StarIndex(star_vec)
 
     ######### SIMULATION ################
 
     Logger.info('')
     Logger.info('Start of simulation of MATS for Mode120')
 
-    t = 0
-    while(current_time < initial_time+DT.timedelta(seconds = duration)):
-    
-        if(t*timestep % log_timestep == 0):
-            LogFlag = True
+    step = DT.timedelta(seconds=timestep)
+    timesteps = -(-DT.timedelta(seconds=duration) // step)
+    window = max(3, OFFSET_WINDOW_SIZE // (nstars+len(planets)))
+    Logger.debug('Simulate '+str(timesteps)+' timesteps in windows of '+str(window)+' timesteps')
+
+    "Candidates, which are kept until their track is complete"
+    candidates = np.zeros(0, dtype=CANDIDATE_DTYPE)
+    tracks = []
+
+    for window_start in range(0, timesteps, window):
+        window_end = min(window_start+window, timesteps)
+        datetimes = [initial_time+step*t for t in range(window_start, window_end)]
+        LogFlag = [t*timestep % log_timestep == 0 for t in range(window_start, window_end)]
+
+        Satellite_dict = Satellite_Simulator_table(
+            configFile, Timeline_settings, MATS_skyfield, datetimes, pointing_altitude, LogFlag, Logger)
+
+        close_stars = star_index.query_track(Satellite_dict['OpticalAxis'], filter_radius)
+
+        #### Caluclate planet positions as seen from below MATS at each time #########
+        planet_vec = planet_positions(planets, ts.from_datetimes(datetimes), MATS_skyfield)
+
+        #### Caluclate star positions on CCD, with shape (len(close_stars)+3,window) #########
+        stars_hori_offset, stars_vert_offset = instrument_offsets(Satellite_dict['InvRotMatrix'], star_vec[close_stars])
+        planets_hori_offset, planets_vert_offset = instrument_offsets(Satellite_dict['InvRotMatrix'], planet_vec)
+        stars_hori_offset = np.concatenate([stars_hori_offset, planets_hori_offset]).astype(np.float32)
+        stars_vert_offset = np.concatenate([stars_vert_offset, planets_vert_offset]).astype(np.float32)
+        "Index of each row in the star catalogue, the planets are numbered after the stars"
+        rows = np.concatenate([close_stars, nstars+np.arange(len(planets))])
+
+        "Indices (row, timestep) of candidates. The moon is not searched for"
+        row, t = np.nonzero(
+            (np.abs(stars_hori_offset[:-1]) < hori_box) & (np.abs(stars_vert_offset[:-1]) < vert_box))
+
+        new_candidates = np.zeros(len(row), dtype=CANDIDATE_DTYPE)
+        new_candidates['star'] = rows[row]
+        new_candidates['timestep'] = window_start+t
+        new_candidates['hori_offset'] = stars_hori_offset[row, t]
+        new_candidates['vert_offset'] = stars_vert_offset[row, t]
+        planet_rows = rows[row] >= nstars
+        new_candidates['vector'][planet_rows] = planet_vec[rows[row[planet_rows]]-nstars, t[planet_rows]]
+
+        "A track may continue in the next window if its latest candidate is at most 2 timesteps before it"
+        finished, candidates = split_tracks(
+            np.concatenate([candidates, new_candidates]), window_end-2 if window_end < timesteps else timesteps)
+        tracks.extend(finished)
+
+    "Sort the tracks by star and then by time"
+    tracks.sort(key=lambda track: (track['star'][0], track['timestep'][0]))
+
+    if(len(tracks) == 0):
+        return result
+
+    "Estimate the crossings by interpolating between the timesteps of the tracks"
+    stars = np.array([track['star'][0] for track in tracks])
+    crosstimes = np.zeros(len(tracks))
+    brackets = []
+    for i, track in enumerate(tracks):
+        timestamps = np.array([(initial_time+step*int(t)).timestamp() for t in track['timestep']])
+        crosstimes[i] = np.interp(-V_offset,track['vert_offset'][::-1],timestamps[::-1])
+
+        "The timesteps between which the star passes V_offset, if it does during the track"
+        above = track['vert_offset'] + V_offset > 0
+        changes = np.flatnonzero(above[1:] != above[:-1])
+        if len(changes) > 0:
+            brackets.append((i, timestamps[changes[0]], timestamps[changes[0]+1], above[changes[0]]))
+
+    "Find the crossings on the simulated geometry between the timesteps"
+    if len(brackets) > 0:
+        refined, lower, upper, signs = (np.array(column) for column in zip(*brackets))
+
+        def vert_offsets(timestamps):
+            datetimes = [DT.datetime.fromtimestamp(timestamp, DT.timezone.utc).replace(tzinfo=None) for timestamp in timestamps]
+            InvRotMatrix = Satellite_Simulator_table(
+                configFile, Timeline_settings, MATS_skyfield, datetimes, pointing_altitude, False, Logger)['InvRotMatrix']
+            vectors = target_vectors(stars[refined], datetimes, star_vec, planets, MATS_skyfield)
+            return instrument_offsets(InvRotMatrix, vectors[None])[1][0] + V_offset
+
+        crosstimes[refined] = refine_crossings(vert_offsets, lower, upper, CROSSING_TOLERANCE, signs)
+    crosstimes = [DT.datetime.fromtimestamp(crosstime, DT.timezone.utc).replace(tzinfo=None) for crosstime in crosstimes]
+
+    "Simulate MATS at all the times the stars cross the FOV"
+    Satellite_dict_at_freezepoint = Satellite_Simulator_table(
+        configFile, Timeline_settings, MATS_skyfield, crosstimes, pointing_altitude, False, Logger)
+    xvalues = instrument_offsets(Satellite_dict_at_freezepoint['InvRotMatrix'],
+                                 target_vectors(stars, crosstimes, star_vec, planets, MATS_skyfield)[None])[0][0]
+
+    crossings = []
+    for i, (track, crosstime, xvalue) in enumerate(zip(tracks, crosstimes, xvalues)):
+        if abs(xvalue) >= horisontal_filter:
+            continue
+        posstar = track['star'][0]
+        if posstar < nstars:
+            star = df.iloc[posstar]
+            star_name, star_magnitude, star_dec, star_ra = str(star.name), star.magnitude, star.dec_degrees, star.ra_degrees
         else:
-            LogFlag = False
-
-        Satellite_dict = Satellite_Simulator(
-            MATS_skyfield, current_time, Timeline_settings, pointing_altitude, LogFlag, Logger)
+            star_name, star_magnitude = planets[posstar-nstars][:2]
+            star_ra, star_dec = xyz2radec(track['vector'][0], positivera=True, deg=True)
 
-        optical_axis[t] = Satellite_dict['OpticalAxis']
-        yaw_offset_angle = Satellite_dict['Yaw [degrees]'] #Only needed to look outside of orbit plane
+        crossings.append((i, crosstime, np.array([xvalue]), star_name, star_magnitude, star_dec, star_ra))
 
-        ############# End of Calculations of orbital and pointing vectors #####
+    for i, crosstime, xvalue, star_name, star_magnitude, star_dec, star_ra in crossings:
 
-        current_time_datetime = current_time
+        lat_MATS = Satellite_dict_at_freezepoint['Latitude [degrees]'][i]
+        long_MATS = Satellite_dict_at_freezepoint['Longitude [degrees]'][i]
 
-        #### Caluclate star positions on CCD #########
-        st_vec.pop(-1) #remove moon
-        st_vec.pop(-1) #remove mars
-        st_vec.pop(-1) #remove jupiter
+        Dec_optical_axis = Satellite_dict_at_freezepoint['Dec_OpticalAxis [degrees]'][i]
+        RA_optical_axis = Satellite_dict_at_freezepoint['RA_OpticalAxis [degrees]'][i]
 
-        st_vec.append((earth+wgs84.subpoint(MATS_skyfield.at(ts.from_datetime(current_time_datetime)))).at(ts.from_datetime(current_time_datetime)).observe(jupiter).position.km) #add mars at new time
-        st_vec.append((earth+wgs84.subpoint(MATS_skyfield.at(ts.from_datetime(current_time_datetime)))).at(ts.from_datetime(current_time_datetime)).observe(mars).position.km) #add mars at new time
-        st_vec.append((earth+wgs84.subpoint(MATS_skyfield.at(ts.from_datetime(current_time_datetime)))).at(ts.from_datetime(current_time_datetime)).observe(moon).position.km) #add moon at new time
+        "Add the spotted star to the exception list and timestamp it"
+        spotted_star_name.append(star_name)
+        spotted_star_timestamp.append(crosstime)
 
-        for nstar in range(nstars+3): 
-            inst_xyz=np.matmul(Satellite_dict['InvRotMatrix'],st_vec[nstar])
-            [xang,yang]=xyz2radec(inst_xyz,positivera=False,deg=True)
-            stars_hori_offset[nstar,t] = xang
-            stars_vert_offset[nstar,t] = yang
-            stars_tot_offset[nstar,t]=np.rad2deg(np.arccos(np.dot(optical_axis[t],st_vec[nstar]/norm(st_vec[nstar]))))
-        
-        datetimes.append(current_time_datetime)
-        timestamps[t]= current_time_datetime.timestamp()
-
-        current_time = current_time+DT.timedelta(seconds=timestep)
-        t = t + 1
-
-    #Filtering on moon inside horizontal FOV and not too far outside vertical FOV (interpolation is done later)   
-    horisontal_filter=3 #look for stars horizontally +- total degrees (Horistontal FOV is 6.06)
-    vert_filter= 10 #look at stars vertically at +- this filter in degrees (Vertical FOV is 1.52)
-
-    possibles=np.array([(istar,itime) for istar in range(nstars+2) for itime in range(len(timestamps))  
-                    if ((abs(stars_hori_offset[istar,itime])< horisontal_filter) and (abs(stars_vert_offset[istar,itime])<vert_filter))])
+        "Append all relevent data for the star"
+        star_list_excel[0].append(star_name)
+        star_list_excel[1].append(crosstime.strftime("%Y-%m-%d %H:%M:%S"))
+        star_list_excel[2].append(str(float(long_MATS)))
+        star_list_excel[3].append(str(float(lat_MATS)))
+        star_list_excel[4].append(str(star_magnitude))
+        star_list_excel[5].append(str(xvalue[0]))
+        star_list_excel[6].append(str(V_offset))
+        star_list_excel[7].append(str(Dec_optical_axis))
+        star_list_excel[8].append(str(RA_optical_axis))
+        star_list_excel[9].append(str(star_dec))
+        star_list_excel[10].append(str(star_ra))
 
-    if(len(possibles) == 0):
-        Logger.warning('Star not found in time to consider')
-        return SpottedStarList
-
-    for posstar in np.unique(possibles[:,0]):
-        possible=np.array([possible for possible in possibles if possible[0]==posstar ])
-        star_found = np.where(np.diff(possible[:,1])>2)[0]+1 #check if there is a gap in the indeces larger than 2
-        star_found = np.insert(star_found,0,0)
-        star_found = np.append(star_found,len(possible))
-        xvalue = np.zeros((len(star_found)-1,1)) #array to hold horizontal offset in degreess
-        
-        crosstime = []
-        for i in range(len(star_found)-1):
-            timerange=possible[star_found[i]:star_found[i+1]]
-            crosstime.append(DT.datetime.utcfromtimestamp(np.interp(-V_offset,stars_vert_offset[posstar,timerange[:,1]][::-1],timestamps[timerange[:,1],0][::-1])))
-            xvalue[i]=np.interp(crosstime[i].timestamp(),timestamps[timerange[:,1],0],stars_hori_offset[posstar,timerange[:,1]])
-
-        if posstar == nstar: #last star is moon
-            star.name = 'moon'
-            star.magnitude = -12.60
-            star.dec_degrees = xyz2radec(st_vec[nstar],positivera=False,deg=True)[0]
-            star.ra_degrees = xyz2radec(st_vec[nstar],positivera=False,deg=True)[1]
-
-        elif posstar == nstar-1: #second to last star is mars
-            star.name = 'mars'
-            star.magnitude =  0.86 #mars
-            star.dec_degrees = xyz2radec(st_vec[nstar-1],positivera=False,deg=True)[0]
-            star.ra_degrees = xyz2radec(st_vec[nstar-1],positivera=False,deg=True)[1]
-
-        elif posstar == nstar-2: #third to last star is jupiter
-            star.name = 'jupiter'
-            star.magnitude =  -2.7 #jupiter
-            star.dec_degrees = xyz2radec(st_vec[nstar-2],positivera=False,deg=True)[0]
-            star.ra_degrees = xyz2radec(st_vec[nstar-2],positivera=False,deg=True)[1]
+        "Log data of star relevant to filtering process"
 
-        else:
-            star = df.loc[df.index[posstar]]
-        # print("{:6d} {:7.2f} {:10.3f} {:10.3f}  {:10.5f}  {}".format (posstar, mag,
-        #                                                 Mats(crosstime).FOV_ra,Mats(crosstime).FOV_dec,xvalue, crosstime))  
-        for i in range(len(crosstime)):
-
-            Satellite_dict_at_freezepoint = Satellite_Simulator(
-            MATS_skyfield, crosstime[i], Timeline_settings, pointing_altitude, LogFlag, Logger)
-
-            lat_MATS = Satellite_dict_at_freezepoint['Latitude [degrees]']
-            long_MATS = Satellite_dict_at_freezepoint['Longitude [degrees]']
-
-            optical_axis = Satellite_dict_at_freezepoint['OpticalAxis']
-            Dec_optical_axis = Satellite_dict_at_freezepoint['Dec_OpticalAxis [degrees]']
-            RA_optical_axis = Satellite_dict_at_freezepoint['RA_OpticalAxis [degrees]']
-
-            "Add the spotted star to the exception list and timestamp it"
-            spotted_star_name.append(star.name)
-            spotted_star_timestamp.append(crosstime)
-
-            "Append all relevent data for the star"
-            star_list_excel[0].append(star.name)
-            star_list_excel[1].append(crosstime[i].strftime("%Y-%m-%d %H:%M:%S"))
-            star_list_excel[2].append(str(float(long_MATS)))
-            star_list_excel[3].append(str(float(lat_MATS)))
-            star_list_excel[4].append(str(star.magnitude))
-            star_list_excel[5].append(str(xvalue[i][0]))
-            star_list_excel[6].append(str(V_offset))
-            star_list_excel[7].append(str(Dec_optical_axis))
-            star_list_excel[8].append(str(RA_optical_axis))
-            star_list_excel[9].append(str(star.dec_degrees))
-            star_list_excel[10].append(str(star.ra_degrees))
-
-            "Log data of star relevant to filtering process"
-
-            SpottedStarList.append({'Date': crosstime[i].strftime("%Y-%m-%d %H:%M:%S.%f"), 'V-offset': V_offset, 'H-offset': xvalue[i],
-                                    'long_MATS': float(long_MATS), 'lat_MATS': float(lat_MATS),
-                                    'Dec_optical_axis': Dec_optical_axis, 'RA_optical_axis': RA_optical_axis,
-                                    'Vmag': star.magnitude, 'Name': str(star.name), 'Dec': star.dec_degrees, 'RA': star.ra_degrees})
+        SpottedStarList.append({'Date': crosstime.strftime("%Y-%m-%d %H:%M:%S.%f"), 'V-offset': V_offset, 'H-offset': xvalue,
+                                'long_MATS': float(long_MATS), 'lat_MATS': float(lat_MATS),
+                                'Dec_optical_axis': Dec_optical_axis, 'RA_optical_axis': RA_optical_axis,
+                                'Vmag': star_magnitude, 'Name': star_name, 'Dec': star_dec, 'RA': star_ra})
 
     ########################## END OF SIMULATION ############################
 
@@ -322,37 +563,8 @@ def Mode120_date_calculator(configFile):
     Logger.info('End of simulation for Mode120')
     Logger.info('')
 
-    "Write spotted stars to file"
-    try:
-        os.mkdir('Output')
-    except:
-        pass
-
-    while(True):
-        try:
-            file_directory = os.path.join('Output', sys._getframe(
-                1).f_code.co_name+'_Visible_Stars__'+os.path.split(configFile.config_file_name)[1]+'__V_offset'+str(V_offset)+'.csv')
-            with open(file_directory, 'w', newline='') as write_file:
-                writer = csv.writer(write_file, dialect='excel-tab')
-                writer.writerows(star_list_excel)
-            Logger.info('Available Stars data saved to: '+file_directory)
-            #print('Available Stars data saved to: '+file_directory)
-            break
-        except PermissionError:
-            Logger.error(file_directory+' cannot be overwritten. Please close it')
-            data = input('Enter anything to try again or 1 to exit')
-            if(data == '1'):
-                sys.exit()
-
-    Logger.debug('Visible star list to be filtered:')
-    for x in range(len(SpottedStarList)):
-        Logger.debug(str(SpottedStarList[x]))
-    Logger.debug('')
-
-    Logger.debug('Exit '+str(__name__))
-    Logger.debug('')
-
-    return(SpottedStarList)
+    result['star_list_excel'] = star_list_excel
+    return result
 
 
 #####################################################################################################
@@ -444,6 +656,9 @@ def Mode120_date_select(Occupied_Timeline, SpottedStarList, configFile):
     Logger.debug('star_H_offset_abs: '+str(star_H_offset_abs))
     Logger.debug('star_H_offset_sorted: '+str(star_H_offset_sorted))
 
+    if not isinstance(Occupied_Timeline, OccupiedTimeline):
+        Occupied_Timeline = OccupiedTimeline(Occupied_Timeline)
+
     restart = True
     iterations = 0
     "Selects date based on min H-offset, if occupied, select date for next min H-offset"
@@ -474,28 +689,19 @@ def Mode120_date_select(Occupied_Timeline, SpottedStarList, configFile):
             restart = True
             continue
 
-        "Extract Occupied dates and if they clash, restart loop and select new date"
-        for busy_dates in Occupied_Timeline.values():
-            if restart:
-                break
-
-            if(busy_dates == []):
-                continue
-            else:
-                "Extract the start and end date of each instance of a scheduled mode"
-                for busy_date in busy_dates:
-                    if(busy_date[0] <= StartDate <= busy_date[1] or
-                            busy_date[0] <= endDate <= busy_date[1] or
-                            (StartDate < busy_date[0] and endDate > busy_date[1])):
-
-                        iterations = iterations + 1
-                        restart = True
-                        break
+        "If the date clashes with any scheduled date, restart loop and select new date"
+        if Occupied_Timeline.overlaps(StartDate, endDate):
+            iterations = iterations + 1
+            restart = True
 
     comment = ('Star name:'+star_name[x]+', V-offset: '+str(np.round(star_V_offset[x], 2))+', H-offset: '+str(np.round(star_H_offset[x], 2))+', V-mag: '+str(star_mag[x])+', Number of times date changed: '+str(iterations)
                + ', MATS (long,lat) in degrees = ('+str(np.round(long_MATS[x],2))+', '+str(np.round(lat_MATS[x],2))+'), optical-axis Dec (J2000 ICRS): '+str(np.round(Dec_optical_axis[x],2))+'), optical-axis RA (J2000 ICRS): '+str(np.round(RA_optical_axis[x],2)) +
                '), star Dec (J2000 ICRS): '+str(np.round(SpottedStarList[x]['Dec'],1))+', star RA (J2000 ICRS): '+str(np.round(SpottedStarList[x]['RA'],1)))
 
+    if 'Ensemble_found' in SpottedStarList[x] and SpottedStarList[x]['Ensemble_found'] > 0:
+        comment = (comment+', spotted with '+str(SpottedStarList[x]['Ensemble_found'])+' of '+str(SpottedStarList[x]['Ensemble_size'])
+                   + ' TLEs of the ensemble, date spread [s]: '+str(np.round(SpottedStarList[x]['Date_spread [s]'], 2)))
+
     Occupied_Timeline['Mode120'].append((StartDate, endDate))
 
     return Occupied_Timeline, comment
@@ -11,16 +11,23 @@ import logging
 import importlib
 from pylab import cross, ceil, dot, zeros, sqrt, norm, pi, arccos, arctan
 from skyfield import api
+from skyfield.api import utc
 import datetime as DT
 import numpy as np
 
-from mats_planningtool.Library import scheduler
-from mats_planningtool.OrbitSimulator.MatsBana import Satellite_Simulator,xyz2radec
+from mats_planningtool.Library import scheduler, refine_crossings, OccupiedTimeline
+from mats_planningtool.OrbitSimulator.MatsBana import xyz2radec_array
+from mats_planningtool.OrbitSimulator.OrbitTable import Satellite_Simulator_table
+from mats_planningtool.OrbitSimulator import Ephemeris
+from mats_planningtool.TimelineGenerator import Speculation
 
 from .Mode12X import UserProvidedDateScheduler
 
 Logger = logging.getLogger("OPT_logger")
 
+"Accuracy of the times when the Moon crosses V_offset [s]"
+CROSSING_TOLERANCE = 0.0001
+
 
 def Mode124(Occupied_Timeline, configFile):
     """Core function for the scheduling of Mode124.
@@ -43,7 +50,8 @@ def Mode124(Occupied_Timeline, configFile):
         Occupied_Timeline, comment = UserProvidedDateScheduler(
             Occupied_Timeline, Settings, configFile)
     elif(Settings['automatic'] == True):
-        SpottedMoonList = date_calculator(configFile)
+        SpottedMoonList = Speculation.precomputed(
+            configFile, *date_calculation(configFile, configFile.Mode124Iteration))
 
         Occupied_Timeline, comment = date_select(
             Occupied_Timeline, SpottedMoonList, configFile)
@@ -55,7 +63,42 @@ def Mode124(Occupied_Timeline, configFile):
 ###############################################################################################
 
 
-def date_calculator(configFile):
+def date_calculation(configFile, Mode124Iteration):
+    """Subfunction, Returns the simulation which *date_calculator* runs for a given iteration of Mode124.
+
+    Arguments:
+        configFile (obj): input config file
+        Mode124Iteration (int): Number of the Mode124 to be scheduled, which selects the V_offset and H_offset.
+
+    Returns:
+        (tuple): tuple containing:
+            (tuple): Key of the result. \n
+            (function): *date_calculator*. \n
+            (tuple): The arguments of *date_calculator*.
+
+    """
+
+    return ('Mode124', Mode124Iteration), date_calculator, (configFile, Mode124Iteration)
+
+
+def moon_offsets(InvRotMatrix, datetimes):
+    """Subfunction, Calculates the position of the Moon in the frame of the instrument.
+
+    Arguments:
+        InvRotMatrix (array): Rotation matrices from ECI to the instrument frame with shape (timesteps,3,3).
+        datetimes (list of :obj:`datetime.datetime`): The times (UTC).
+
+    Returns:
+        (tuple): Horizontal and vertical offsets of the Moon from the optical axis [degrees], both with shape (timesteps,).
+
+    """
+    times = Ephemeris.timescale().from_datetimes([current_time.replace(tzinfo=utc) for current_time in datetimes])
+    moonpos_km = Ephemeris.position('Moon', times)
+    inst_xyz = np.einsum('tij,tj->ti', InvRotMatrix, moonpos_km)
+    return xyz2radec_array(inst_xyz, positivera=False, deg=True)
+
+
+def date_calculator(configFile, Mode124Iteration=None):
     """Subfunction, Simulates MATS FOV and the Moon.
 
     Determines when the Moon is in the FOV at an vertical offset-angle equal to *#V-offset* and
@@ -67,6 +110,7 @@ def date_calculator(configFile):
 
     Arguments:
         configFile (obj): input config file
+        Mode124Iteration (int): Number of the Mode124 to be scheduled. Defaults to *configFile.Mode124Iteration*.
 
     Returns:
         SpottedMoonList ((:obj:`list` of :obj:`dict`)) or (str): A list containing dictionaries containing parameters for each time the Moon is spotted. Or just a date depending on 'automatic' in *Mode124_settings*.
@@ -82,7 +126,8 @@ def date_calculator(configFile):
     ##################################################
 
     "Check how many times Mode124 have been scheduled"
-    Mode124Iteration = configFile.Mode124Iteration
+    if Mode124Iteration is None:
+        Mode124Iteration = configFile.Mode124Iteration
     "Make the Offset_Index go from 0 to len(Mode124_settings['V_offset']"
     Offset_Index = (Mode124Iteration-1) % (len(Mode124_settings['V_offset']))
 
@@ -135,13 +180,9 @@ def date_calculator(configFile):
     timestamps = zeros((timesteps, 1))
 
     ###LOAD SKYFIELD###
-    ts = api.load.timescale(builtin=True)
+    ts = Ephemeris.timescale()
     MATS_skyfield = api.EarthSatellite(TLE[0], TLE[1])
 
-    planets = api.load('de421.bsp')
-    Moon = planets['Moon']
-    Earth = planets['Earth']
-
 
     current_time = initial_time
 
@@ -149,86 +190,96 @@ def date_calculator(configFile):
     Logger.info('Start of simulation for Mode124')
 
     ######### SIMULATION ################
-    t = 0
     while(current_time < initial_time+DT.timedelta(seconds = duration)):
+        datetimes.append(current_time)
+        current_time = current_time+DT.timedelta(seconds=timestep)
+    timesteps = len(datetimes)
 
-        if(t*timestep % log_timestep == 0):
-            LogFlag = True
-        else:
-            LogFlag = False
-
-        Satellite_dict = Satellite_Simulator(
-            MATS_skyfield, current_time, Timeline_settings, pointing_altitude, LogFlag, Logger)
-
-        optical_axis[t] = Satellite_dict['OpticalAxis']
-        yaw_offset_angle = Satellite_dict['Yaw [degrees]'] #Only needed to look outside of orbit plane
-
-        ############# End of Calculations of orbital and pointing vectors #####
-
-        current_time_datetime = current_time
-        year = current_time_datetime.year
-        month = current_time_datetime.month
-        day = current_time_datetime.day
-        hour = current_time_datetime.hour
-        minute = current_time_datetime.minute
-        second = current_time_datetime.second + current_time_datetime.microsecond/1000000
+    LogFlag = [t*timestep % log_timestep == 0 for t in range(timesteps)]
 
-        current_time_skyfield = ts.utc(year, month, day, hour, minute, second)
+    Satellite_dict = Satellite_Simulator_table(
+        configFile, Timeline_settings, MATS_skyfield, datetimes, pointing_altitude, LogFlag, Logger)
 
-        #### Caluclate moon position on CCD #########
+    optical_axis = Satellite_dict['OpticalAxis']
+    timestamps = np.array([[current_time_datetime.timestamp()] for current_time_datetime in datetimes])
 
-        moonpos=Earth.at(current_time_skyfield).observe(Moon)
-        moonpos_km = moonpos.position.km
-        moonpos_ra_dec = moonpos.radec()
-        inst_xyz=np.matmul(Satellite_dict['InvRotMatrix'],moonpos_km)
-        [xang,yang]=xyz2radec(inst_xyz,positivera=False,deg=True) #degrees
-        Moon_hori_offset[t] = xang #degrees
-        Moon_vert_offset[t] = yang #degrees
-        Moon_tot_offset[t]=np.rad2deg(np.arccos(np.dot(optical_axis[t],moonpos_km/norm(moonpos_km))))
-        
-        datetimes.append(current_time_datetime)
-        timestamps[t]= current_time_datetime.timestamp()
+    #### Caluclate moon position on CCD #########
+    current_time_skyfield = ts.utc(
+        [current_time_datetime.year for current_time_datetime in datetimes],
+        [current_time_datetime.month for current_time_datetime in datetimes],
+        [current_time_datetime.day for current_time_datetime in datetimes],
+        [current_time_datetime.hour for current_time_datetime in datetimes],
+        [current_time_datetime.minute for current_time_datetime in datetimes],
+        [current_time_datetime.second + current_time_datetime.microsecond/1000000 for current_time_datetime in datetimes])
 
-        current_time = current_time+DT.timedelta(seconds=timestep)
-        t = t + 1
+    moonpos_km = Ephemeris.position('Moon', current_time_skyfield)
+    moonpos_ra_dec = xyz2radec_array(moonpos_km[-1:], positivera=True, deg=True)
+    inst_xyz=np.einsum('tij,tj->ti', Satellite_dict['InvRotMatrix'], moonpos_km)
+    [xang,yang]=xyz2radec_array(inst_xyz,positivera=False,deg=True) #degrees
+    Moon_hori_offset[:, 0] = xang #degrees
+    Moon_vert_offset[:, 0] = yang #degrees
+    Moon_tot_offset[:, 0]=np.rad2deg(np.arccos(np.einsum('ti,ti->t', optical_axis, moonpos_km/norm(moonpos_km, axis=1)[:, None])))
 
     #Filtering on moon inside horizontal FOV and not too far outside vertical FOV (interpolation is done later)   
     horisontal_filter=3 #look for stars horizontally +- total degrees (Horistontal FOV is 6.06)
     vert_filter= 5 #look at stars vertically at +- this filter in degrees (Vertical FOV is 1.52)
 
+    "The timesteps are filtered with a box widened by the angle the optical axis turns in a timestep, so that no crossing inside of the filter falls between two timesteps"
+    margin = np.rad2deg(MATS_skyfield.model.no_kozai) / 60 * timestep
+
     possibles=np.array([(itime) for itime in range(len(Moon_hori_offset))  
-                    if (((abs(Moon_hori_offset[itime]))< horisontal_filter) and (abs(Moon_vert_offset[itime])< vert_filter))])
+                    if (((abs(Moon_hori_offset[itime]))< horisontal_filter+margin) and (abs(Moon_vert_offset[itime])< vert_filter+margin))])
 
     if(len(possibles) == 0):
         Logger.warning('Moon not found in time to consider')
         return SpottedMoonList
 
 
-    moon_found = np.where(np.diff(possibles)>2)[0] #check if there is a gap in the indeces larger than 2
+    moon_found = np.where(np.diff(possibles)>2)[0]+1 #check if there is a gap in the indeces larger than 2
     moon_found = np.insert(moon_found,0,0)
     moon_found = np.append(moon_found,len(possibles))
 
-    xvalue = np.zeros((len(moon_found),1)) #array to hold horizontal offset in degreess
-
     crosstime = []
+    brackets = []
     for i in range(len(moon_found)-1):
         timerange=possibles[moon_found[i]:moon_found[i+1]]
         crosstime.append(DT.datetime.fromtimestamp(np.interp(V_offset,Moon_vert_offset[timerange,0][::-1],timestamps[timerange,0][::-1])))
-        xvalue[i]=np.interp(crosstime[i].timestamp(),timestamps[timerange,0],Moon_hori_offset[timerange,0])
 
-    for i in range(len(crosstime)):
-        Satellite_dict_at_freezepoint = Satellite_Simulator(
-            MATS_skyfield, crosstime[i], Timeline_settings, pointing_altitude, LogFlag, Logger)
+        "The timesteps between which the Moon passes V_offset, if it does"
+        above = Moon_vert_offset[timerange,0] - V_offset > 0
+        changes = np.flatnonzero(above[1:] != above[:-1])
+        if len(changes) > 0:
+            brackets.append((i, timestamps[timerange[changes[0]],0], timestamps[timerange[changes[0]+1],0], above[changes[0]]))
+
+    "Find the crossings on the simulated geometry between the timesteps"
+    if len(brackets) > 0:
+        refined, lower, upper, signs = (np.array(column) for column in zip(*brackets))
+
+        def vert_offsets(crossing_timestamps):
+            datetimes = [DT.datetime.fromtimestamp(timestamp) for timestamp in crossing_timestamps]
+            InvRotMatrix = Satellite_Simulator_table(
+                configFile, Timeline_settings, MATS_skyfield, datetimes, pointing_altitude, False, Logger)['InvRotMatrix']
+            return moon_offsets(InvRotMatrix, datetimes)[1] - V_offset
+
+        for i, crossing_timestamp in zip(refined, refine_crossings(vert_offsets, lower, upper, CROSSING_TOLERANCE, signs)):
+            crosstime[i] = DT.datetime.fromtimestamp(crossing_timestamp)
+
+    Satellite_dict_at_freezepoint = Satellite_Simulator_table(
+        configFile, Timeline_settings, MATS_skyfield, crosstime, pointing_altitude, False, Logger)
+    xvalue = moon_offsets(Satellite_dict_at_freezepoint['InvRotMatrix'], crosstime)[0] #array to hold horizontal offset in degreess
 
-        lat_MATS = Satellite_dict_at_freezepoint['Latitude [degrees]']
-        long_MATS = Satellite_dict_at_freezepoint['Longitude [degrees]']
+    for i in range(len(crosstime)):
+        if abs(xvalue[i]) >= horisontal_filter:
+            continue
+        lat_MATS = Satellite_dict_at_freezepoint['Latitude [degrees]'][i]
+        long_MATS = Satellite_dict_at_freezepoint['Longitude [degrees]'][i]
 
-        optical_axis = Satellite_dict_at_freezepoint['OpticalAxis']
-        Dec_optical_axis = Satellite_dict_at_freezepoint['Dec_OpticalAxis [degrees]']
-        RA_optical_axis = Satellite_dict_at_freezepoint['RA_OpticalAxis [degrees]']
+        optical_axis = Satellite_dict_at_freezepoint['OpticalAxis'][i]
+        Dec_optical_axis = Satellite_dict_at_freezepoint['Dec_OpticalAxis [degrees]'][i]
+        RA_optical_axis = Satellite_dict_at_freezepoint['RA_OpticalAxis [degrees]'][i]
 
         SpottedMoonList.append({'Date': crosstime[i].strftime("%Y-%m-%d %H:%M:%S.%f"), 'V-offset': V_offset, 'H-offset': xvalue[i].item(),
-                                        'long_MATS': float(long_MATS), 'lat_MATS': float(lat_MATS), 'Dec': moonpos_ra_dec[1].degrees, 'RA': moonpos_ra_dec[0]._degrees,
+                                        'long_MATS': float(long_MATS), 'lat_MATS': float(lat_MATS), 'Dec': moonpos_ra_dec[1][0], 'RA': moonpos_ra_dec[0][0],
                                         'Dec FOV': Dec_optical_axis, 'RA FOV': RA_optical_axis, 'FOV': optical_axis})        
 
     return SpottedMoonList
@@ -285,6 +336,9 @@ def date_select(Occupied_Timeline, SpottedMoonList, configFile):
     Moon_H_offset_sorted = [abs(x-H_offset) for x in Moon_H_offset] #sorted array
     Moon_H_offset_sorted.sort()
 
+    if not isinstance(Occupied_Timeline, OccupiedTimeline):
+        Occupied_Timeline = OccupiedTimeline(Occupied_Timeline)
+
     restart = True
     iterations = 0
     "Selects date based on min H-offset, if occupied, select date for next min H-offset"
@@ -318,23 +372,10 @@ def date_select(Occupied_Timeline, SpottedMoonList, configFile):
             restart = True
             continue
 
-        "Extract Occupied dates and if they clash, restart loop and select new date"
-        for busy_dates in Occupied_Timeline.values():
-            if restart:
-                break
-            if(busy_dates == []):
-                continue
-            else:
-                "Extract the start and end date of each instance of a scheduled mode"
-                for busy_date in busy_dates:
-
-                    if(busy_date[0] <= date <= busy_date[1] or
-                            busy_date[0] <= endDate <= busy_date[1] or
-                            (date < busy_date[0] and endDate > busy_date[1])):
-
-                        iterations = iterations + 1
-                        restart = True
-                        break
+        "If the date clashes with any scheduled date, restart loop and select new date"
+        if Occupied_Timeline.overlaps(date, endDate):
+            iterations = iterations + 1
+            restart = True
 
     comment = ('V-offset: '+str(round(Moon_V_offset[x], 2))+', H-offset: '+str(round(Moon_H_offset[x], 2))+', Times date changed: '+str(iterations) +
                ', MATS (long,lat) in degrees = ('+str(round(MATS_long[x], 2))+', '+str(round(MATS_lat[x], 2))+'), Moon Dec (J2000) [degrees]: ' +
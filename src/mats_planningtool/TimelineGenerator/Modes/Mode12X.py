@@ -11,8 +11,9 @@ from pylab import array, ceil, cos, sin, dot, zeros, norm, pi, arccos, floor
 from skyfield import api
 import datetime as DT
 
-from mats_planningtool.Library import deg2HMS, scheduler
+from mats_planningtool.Library import deg2HMS, scheduler, OccupiedTimeline
 from mats_planningtool.OrbitSimulator.MatsBana import Satellite_Simulator
+from mats_planningtool.StarCatalogue import StarIndex, bright_stars
 Logger = logging.getLogger("OPT_logger")
 
 
@@ -121,19 +122,18 @@ def date_calculator(Settings, configFile):
         Logger.info('initial_time set to: '+str(initial_time))
 
         "Get relevant stars"
-        result = Vizier(columns=['all'], row_limit=3000).query_constraints(
-            catalog='I/239/hip_main', Vmag=Settings['Vmag'])
-        star_cat = result[0]
-        ROWS = star_cat[0][:].count()
+        star_cat = bright_stars(Settings['Vmag'])
+        ROWS = len(star_cat)
         stars = []
         stars_dec = zeros((ROWS, 1))
         stars_ra = zeros((ROWS, 1))
 
         "Insert stars into Pyephem"
         for t in range(ROWS):
-            s = "{},f|M|F7,{},{},{},2000/01/01 11:58:55.816"
-            s = s.format(star_cat[t]['HIP'], deg2HMS(ra=star_cat[t]['_RA.icrs']), deg2HMS(
-                dec=star_cat[t]['_DE.icrs']), star_cat[t]['Vmag'])
+            "The epoch of the database format is a year, a full date is misread"
+            s = "{},f|M|F7,{},{},{},2000"
+            s = s.format(star_cat[t]['hip'], deg2HMS(ra=star_cat[t]['ra_degrees']), deg2HMS(
+                dec=star_cat[t]['dec_degrees']), star_cat[t]['magnitude'])
             stars.append(ephem.readdb(s))
             stars[t].compute(epoch='2000/01/01 11:58:55.816')
             stars_dec[t] = stars[t].dec
@@ -150,6 +150,20 @@ def date_calculator(Settings, configFile):
         stars_r = array([stars_x, stars_y, stars_z])
         stars_r = stars_r.transpose()
 
+        "Only keep stars close enough to the orbital plane of MATS to be seen in the FOV during the simulation, the yaw turns the FOV out of the plane"
+        TLE = configFile.getTLE()
+        MATS_skyfield = api.EarthSatellite(TLE[0], TLE[1])
+        orbital_plane_normal = Satellite_Simulator(
+            MATS_skyfield, initial_time, Timeline_settings, Settings['pointing_altitude']/1000, False, Logger)['OrbitNormal']
+        band_half_width = Settings['H_FOV']/2+(duration*2)/(365*24*3600)*360
+        if(Timeline_settings['yaw_correction'] == True):
+            band_half_width = band_half_width + abs(Timeline_settings['yaw_amplitude'])
+        close_stars = StarIndex(stars_r[0]).query_band(orbital_plane_normal, band_half_width)
+        Logger.debug(str(len(close_stars))+' of '+str(ROWS)+' stars are close to the orbital plane')
+        stars = [stars[x] for x in close_stars]
+        stars_r = stars_r[:, close_stars]
+        ROWS = len(close_stars)
+
         "Prepare the output"
         "Array containing date in first column and brightest magnitude visible in the second. Contains current Dec and RA in 3rd and 4th column"
         date_magnitude_array = zeros((timesteps, 4))
@@ -185,11 +199,8 @@ def date_calculator(Settings, configFile):
         Logger.debug('V_FOV set to [degrees]: '+str(V_FOV))
         Logger.debug('yaw_correction set to: '+str(yaw_correction))
 
-        TLE = configFile.getTLE()
         Logger.debug('TLE used: '+TLE[0]+TLE[1])
 
-        MATS_skyfield = api.EarthSatellite(TLE[0], TLE[1])
-
         "Loop counter"
         t = 0
 
@@ -228,8 +239,8 @@ def date_calculator(Settings, configFile):
             "Add current date to date_magnitude_array"
             date_magnitude_array[t, 0] = current_time
             "Add optical axis Dec and RA to date_magnitude_array"
-            date_magnitude_array[t, 2] = Dec_optical_axis[t]
-            date_magnitude_array[t, 3] = RA_optical_axis[t]
+            date_magnitude_array[t, 2] = Dec_optical_axis[t, 0]
+            date_magnitude_array[t, 3] = RA_optical_axis[t, 0]
 
             ###################### Star-mapper ####################################
 
@@ -341,6 +352,9 @@ def date_select(Occupied_Timeline, date_magnitude_array, Settings, configFile):
 
     arbitraryLowNumber = -100
 
+    if not isinstance(Occupied_Timeline, OccupiedTimeline):
+        Occupied_Timeline = OccupiedTimeline(Occupied_Timeline)
+
     restart = True
 
     loop_counter = 0
@@ -366,26 +380,12 @@ def date_select(Occupied_Timeline, date_magnitude_array, Settings, configFile):
         date = ephem.Date(date_max_mag).datetime() -  DT.timedelta(seconds=Settings['freeze_start'])
         endDate = date+DT.timedelta(seconds= Settings['freeze_start'] + Settings['freeze_duration'] + Timeline_settings['mode_separation'])
 
-        "Extract the start and end date of each scheduled mode"
-        for busy_dates in Occupied_Timeline.values():
-            if restart:
-                break
-            if(busy_dates == []):
-                continue
-            else:
-                "Extract the start and end date of each instance of a scheduled mode"
-                for busy_date in busy_dates:
-
-                    "If the planned date collides with any already scheduled ones -> post-pone and restart loop"
-                    if(busy_date[0] <= date < busy_date[1] or
-                            busy_date[0] < endDate <= busy_date[1] or
-                            (date < busy_date[0] and endDate > busy_date[1])):
-
-                        restart = True
-                        "Set the current maximum magnitude arbitrary small to allow a new maximum magnitude date to be chosen in next loop"
-                        date_magnitude_array[index_max_mag, 1] = arbitraryLowNumber
-                        loop_counter = loop_counter + 1
-                        break
+        "If the planned date collides with any already scheduled ones (touching is allowed) -> post-pone and restart loop"
+        if Occupied_Timeline.overlaps(date, endDate, touching=False):
+            restart = True
+            "Set the current maximum magnitude arbitrary small to allow a new maximum magnitude date to be chosen in next loop"
+            date_magnitude_array[index_max_mag, 1] = arbitraryLowNumber
+            loop_counter = loop_counter + 1
 
     comment = 'Number of times date changed: ' + str(loop_counter)+', faintest magnitude visible (100 equals no stars visible): '+str(
         value_max_mag)+', Dec (J2000): '+str(dec_max_mag)+', RA (J2000): '+str(RA_max_mag)
@@ -9,6 +9,8 @@ import logging
 import importlib
 import datetime as DT
 
+from mats_planningtool.Library import OccupiedTimeline
+
 Logger = logging.getLogger("OPT_logger")
 
 
@@ -34,72 +36,19 @@ def Mode1_2_5(Occupied_Timeline, configFile):
     "Earliest possible date an Operational Science Mode is scheduled"
     initial_date = DT.datetime.strptime(Timeline_settings['start_date'],'%Y/%m/%d %H:%M:%S')
 
-    Occupied_Timeline_values = []
-
-    "Extract all scheduled modes with their scheduled dates and sort them in chronological order. Skip the ones which are empty or entirely scheduled before initial_date"
-    for Occupied_value in Occupied_Timeline.values():
-        if(Occupied_value == []):
-            continue
-
-        for date in Occupied_value:
-
-            if(date[0] < initial_date and date[1] < initial_date):
-                continue
+    timeline_end = initial_date + DT.timedelta(seconds=Timeline_settings['duration']['duration'])
 
-            else:
-                Occupied_Timeline_values.append(date)
-
-    Occupied_Timeline_values.sort()
-
-    dates = []
+    if not isinstance(Occupied_Timeline, OccupiedTimeline):
+        Occupied_Timeline = OccupiedTimeline(Occupied_Timeline)
 
     "The least amount of time that needs to be available for mode1/2 to be scheduled"
     minDuration = DT.timedelta(seconds=Timeline_settings['Mode1_2_5_minDuration'])
-    iterations = 0
-
-    """To fill in modes inbetween already schedueled modes. The amount of iterations is equal to 
-    the number of modes scheduled plus 1 as there is a possibility for the modes to be scheduled 
-    at the start and end of the timeline."""
-    for x in range(len(Occupied_Timeline_values)+1):
-
-        # If Occupied_Timeline_values is empty then just schedule until the end of the timeline
-        if(len(Occupied_Timeline_values) == 0):
-            timeline_end = DT.datetime.strptime(Timeline_settings['start_date'],'%Y/%m/%d %H:%M:%S')+ DT.timedelta(seconds=Timeline_settings['duration']['duration'])
-            date = initial_date
-            endDate = timeline_end - DT.timedelta(seconds=Timeline_settings['mode_separation'])
-            dates.append((date, endDate))
-
-            iterations = iterations + 1
-
-        # For first iteration; Check if there is spacing between initial_date and the the first mode running
-        elif(x == 0 and Occupied_Timeline_values[0][0] != initial_date):
-            time_between_modes = Occupied_Timeline_values[0][0] - initial_date
-            if(time_between_modes > minDuration):
-                date = initial_date
-
-                endDate = Occupied_Timeline_values[x][0] - DT.timedelta(seconds=Timeline_settings['mode_separation'])
-                dates.append((date, endDate))
-                iterations = iterations + 1
-
-        # For last iteration; Check if there is spacing in between end of the last mode and the end of the timeline
-        elif(x == len(Occupied_Timeline_values)):
-            timeline_end = DT.datetime.strptime(Timeline_settings['start_date'],'%Y/%m/%d %H:%M:%S')+DT.timedelta(seconds=Timeline_settings['duration']['duration'])
-            time_between_modes = timeline_end - Occupied_Timeline_values[-1][1]
-            if(time_between_modes > minDuration):
-                date = Occupied_Timeline_values[-1][1]
-                endDate = timeline_end - DT.timedelta(seconds=Timeline_settings['mode_separation'])
-                dates.append((date, endDate))
-                iterations = iterations + 1
-
-        # For all other iterations; Start scheduling Mode1,2,5 inbetween already schedueled modes and CMDs
-        elif(x != 0 and x != len(Occupied_Timeline_values)):
-            time_between_modes = Occupied_Timeline_values[x][0] - \
-                Occupied_Timeline_values[x-1][1]
-            if(time_between_modes > minDuration):
-                date = Occupied_Timeline_values[x-1][1]
-                endDate = Occupied_Timeline_values[x][0] - DT.timedelta(seconds=Timeline_settings['mode_separation'])
-                dates.append((date, endDate))
-                iterations = iterations + 1
+    mode_separation = DT.timedelta(seconds=Timeline_settings['mode_separation'])
+
+    """Fill in modes in all the free time inbetween already scheduled modes and CMDs, and at the start and end of the timeline.
+    Overlapping scheduled dates are merged and each mode ends mode_separation before the next scheduled date."""
+    dates = list(Occupied_Timeline.free_windows(initial_date, timeline_end, minDuration, mode_separation))
+    iterations = len(dates)
 
     if('Mode1' in Occupied_Timeline):
         Occupied_Timeline['Mode1'] = dates
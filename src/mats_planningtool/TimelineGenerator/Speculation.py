@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Runs the simulations of the date calculators of the modes in *Scheduling_priority* concurrently, before the modes are scheduled.
+
+The date calculators of Mode120 and Mode124 simulate MATS and the stars or the Moon over the timeline, which takes most of the runtime of
+*Timeline_gen*. Their results do not depend on the *Occupied_Timeline*, only on the settings and on how many times the mode has already
+been scheduled (which selects the V_offset). Only the selection of a date (*date_select*) depends on the modes scheduled before.
+
+*speculate* therefore starts the simulations for every V_offset which may be used in a pool of processes before the modes are scheduled,
+and saves their results in the current run. When a mode is then scheduled in the order of *Scheduling_priority*, its date calculator gets
+the result with *precomputed* instead of simulating. Results which are never asked for are discarded with the run.
+
+"""
+
+import concurrent.futures
+import logging
+import os
+
+from mats_planningtool import DiskCache
+from mats_planningtool.OrbitSimulator import Ephemeris
+
+Logger = logging.getLogger("OPT_logger")
+
+
+def date_calculations(configFile, Scheduling_priority):
+    """Returns the simulations which the date calculators of the modes in *Scheduling_priority* may need.
+
+    A mode which appears *n* times in *Scheduling_priority* may be scheduled with any of the first *n* V_offsets.
+
+    Arguments:
+        configFile (obj): input config file
+        Scheduling_priority (list of str): The modes to be scheduled.
+
+    Returns:
+        (list of tuple): The simulations as (key, function, arguments) with unique keys, see for example *Mode120.Mode120_date_calculation*.
+
+    """
+    from mats_planningtool.TimelineGenerator.Modes import Mode120, Mode124
+
+    calculators = [('Mode120', Mode120.Mode120_date_calculation), ('Mode124', Mode124.date_calculation)]
+
+    calculations = {}
+    for name, date_calculation in calculators:
+        if name not in Scheduling_priority or not hasattr(configFile, name+'_settings'):
+            continue
+        Settings = getattr(configFile, name+'_settings')()
+        if Settings['automatic'] != True:
+            continue
+        for Iteration in range(1, min(Scheduling_priority.count(name), len(Settings['V_offset'])) + 1):
+            key, function, arguments = date_calculation(configFile, Iteration)
+            calculations.setdefault(key, (key, function, arguments))
+
+    return list(calculations.values())
+
+
+def speculate(configFile, Scheduling_priority):
+    """Runs the simulations of the date calculators in a pool of processes and saves the results in the current run.
+
+    Simulations with a result in the disk cache (see *DiskCache*) are skipped. Nothing is done if fewer than two simulations
+    remain or if *configFile.processes* is 1, as they are then run when the modes are scheduled.
+
+    Arguments:
+        configFile (obj): input config file
+        Scheduling_priority (list of str): The modes to be scheduled.
+
+    Returns:
+        None
+
+    """
+    calculations = date_calculations(configFile, Scheduling_priority)
+
+    if getattr(configFile, 'use_cache', True):
+        cache = DiskCache.DiskCache(os.path.join(configFile.output_dir, DiskCache.CACHE_DIR))
+        calculations = [calculation for calculation in calculations
+                        if not isinstance(calculation[0], str) or calculation[0] not in cache]
+
+    processes = min(len(calculations), configFile.processes or os.cpu_count() or 1)
+    if len(calculations) < 2 or processes < 2:
+        return
+
+    Logger.info('Run '+str(len(calculations))+' date calculations in '+str(processes)+' processes')
+
+    precomputed = configFile.run().precomputed
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=Ephemeris.prewarm) as executor:
+        futures = [(key, executor.submit(function, *arguments)) for key, function, arguments in calculations]
+        for key, future in futures:
+            try:
+                precomputed[key] = future.result()
+            except Exception:
+                Logger.warning('Date calculation '+str(key)+' failed, it is run again when the mode is scheduled', exc_info=True)
+
+
+def precomputed(configFile, key, function, *arguments):
+    """Returns the result of a simulation run by *speculate*, or runs it if there is none.
+
+    Arguments:
+        configFile (obj): input config file
+        key: Key of the simulation.
+        function (function): The simulation.
+        *arguments: The arguments of *function*.
+
+    Returns:
+        The result of the simulation.
+
+    """
+    precomputed = configFile.run().precomputed
+    if key in precomputed:
+        Logger.info('Result of date calculation '+str(key)+' was calculated in advance')
+        return precomputed[key]
+
+    return function(*arguments)
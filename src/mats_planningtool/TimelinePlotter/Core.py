@@ -43,8 +43,10 @@ import astropy.time
 import sys
 import ntpath
 
-from mats_planningtool import Library, MATS_coordinates
-from mats_planningtool.OrbitSimulator.MatsBana import Satellite_Simulator
+from mats_planningtool import Library
+from mats_planningtool.OrbitSimulator.MatsBana import Satellite_Simulator, Satellite_Simulator_batch, skyfield_times, xyz2radec_array
+from mats_planningtool.OrbitSimulator import GeoidLib, LimbGeometry
+from mats_planningtool.OrbitSimulator.OrbitTable import Satellite_Simulator_table
 
 Logger = logging.getLogger("OPT_logger")
 rcParams["figure.max_open_warning"] = 30
@@ -245,6 +247,7 @@ def Timeline_Plotter(
             Data_LP=Data_LP,
             Time=Time,
             OHB_StartTime=OHB_StartTime,
+            configFile=configFile,
         )
 
     Logger.info("End of Simulation")
@@ -313,6 +316,7 @@ def Simulator(
     Data_LP,
     Time,
     OHB_StartTime,
+    configFile=None,
 ):
     """Subfunction, Simulates the position and attitude of MATS depending on the Mode given in *ScienceMode*.
 
@@ -328,6 +332,7 @@ def Simulator(
         Data_LP (dict of lists): Dictionary containing lists of simulated data of LP.
         Time (list): List containing timestamps (utc) of the simulated data in Data_MATS and Data_LP.
         OHB_StartTime (:obj:`ephem.Date`): Date and time of the first OHB data to be plotted. Used here to synchronize timestamps between Timeline Simulation datapoints and OHB datapoints.
+        configFile (obj): *Optional*. The config file. If given, and the TLE is the same, data is read from the orbit table of the timeline when possible.
 
     Returns:
         (tuple): Tuple containing:
@@ -395,7 +400,6 @@ def Simulator(
         freeze_start = Settings["freeze_start"]
         freeze_duration = Settings["freeze_duration"]
         pointing_altitude = Settings["pointing_altitude"]
-        freeze_flag = 0
 
         if ModeName == "Mode120":
             Color = (0, 1, 0)
@@ -516,11 +520,12 @@ def Simulator(
     MATS_skyfield = EarthSatellite(TLE[0], TLE[1])
 
     ###################################################################################
-    "Start of Simulation"
+    "Determine the times and pointing altitudes of the simulation"
+    pointing_altitudes = zeros(timesteps)
+    SimulationTimes = []
+    LogFlags = []
     for t in range(timesteps):
 
-        t = t
-
         if Simulator_Select == "Mode100":
             "Increment the pointing altitude as defined by Mode100"
             if (
@@ -564,200 +569,106 @@ def Simulator(
             "Looking at pointing_altitude"
             pass
 
+        pointing_altitudes[t] = pointing_altitude
+
         "Increment Time"
-        current_time = ephem.Date(Mode_start_date + ephem.second * (Timestep * t))
-        current_time_datetime = ephem.Date(current_time).datetime()
+        SimulationTimes.append(ephem.Date(Mode_start_date + ephem.second * (Timestep * t)))
 
         "Only log data at certain intervals depending on log_timestep"
-        if t * Timestep % log_timestep == 0:
-            LogFlag = True
-        else:
-            LogFlag = False
+        LogFlags.append(t * Timestep % log_timestep == 0)
 
-        "Run the satellite simulation for the current time"
-        Satellite_dict = Satellite_Simulator(
-            MATS_skyfield,
-            current_time,
+    "Run the satellite simulation for all times at once"
+    if configFile is not None and list(TLE) == configFile.getTLE():
+        Satellite_dict = Satellite_Simulator_table(
+            configFile,
             Timeline_settings,
-            pointing_altitude / 1000,
-            LogFlag,
+            MATS_skyfield,
+            SimulationTimes,
+            pointing_altitudes / 1000,
+            LogFlags,
             Logger,
         )
-
-        "Save results"
-        r_MATS[t] = Satellite_dict["Position [km]"]
-        v_MATS[t] = Satellite_dict["Velocity [km/s]"]
-        normal_orbit[t] = Satellite_dict["OrbitNormal"]
-        r_V_offset_normal[t] = Satellite_dict["Normal2V_offset"]
-        r_H_offset_normal[t] = Satellite_dict["Normal2H_offset"]
-        MATS_P[t] = Satellite_dict["OrbitalPeriod [s]"]
-        alt_MATS[t] = Satellite_dict["Altitude [km]"]
-        lat_MATS[t] = Satellite_dict["Latitude [degrees]"]
-        long_MATS[t] = Satellite_dict["Longitude [degrees]"]
-        optical_axis[t] = Satellite_dict["OpticalAxis"]
-        Dec_optical_axis[t] = Satellite_dict["Dec_OpticalAxis [degrees]"]
-        RA_optical_axis[t] = Satellite_dict["RA_OpticalAxis [degrees]"]
-        pitch_MATS[t] = Satellite_dict["Pitch [degrees]"]
-        lat_LP_estimated[t] = Satellite_dict["EstimatedLatitude_LP [degrees]"]
-        Yaw_function[t] = Satellite_dict["Yaw [degrees]"]
-
-        v_MATS_unit_vector[t, 0:3] = v_MATS[t, 0:3] / norm(v_MATS[t, 0:3])
-        r_MATS_unit_vector[t, 0:3] = r_MATS[t, 0:3] / norm(r_MATS[t, 0:3])
-
-        "Coordinate transformations and calculations"
-        (
-            r_MATS_ECEF[t, 0],
-            r_MATS_ECEF[t, 1],
-            r_MATS_ECEF[t, 2],
-        ) = MATS_coordinates.eci2ecef(
-            r_MATS[t, 0] * 1000,
-            r_MATS[t, 1] * 1000,
-            r_MATS[t, 2] * 1000,
-            current_time_datetime,
-        )
-
-        (
-            optical_axis_ECEF[t, 0],
-            optical_axis_ECEF[t, 1],
-            optical_axis_ECEF[t, 2],
-        ) = MATS_coordinates.eci2ecef(
-            optical_axis[t, 0],
-            optical_axis[t, 1],
-            optical_axis[t, 2],
-            current_time_datetime,
-        )
-
-        (
-            r_LP_ECEF[t, 0],
-            r_LP_ECEF[t, 1],
-            r_LP_ECEF[t, 2],
-        ) = MATS_coordinates.ecef2tanpoint(
-            r_MATS_ECEF[t][0],
-            r_MATS_ECEF[t][1],
-            r_MATS_ECEF[t][2],
-            optical_axis_ECEF[t, 0],
-            optical_axis_ECEF[t, 1],
-            optical_axis_ECEF[t, 2],
-        )
-
-        lat_LP[t], long_LP[t], alt_LP[t] = MATS_coordinates.ECEF2lla(
-            r_LP_ECEF[t, 0], r_LP_ECEF[t, 1], r_LP_ECEF[t, 2]
-        )
-
-        r_LP[t, 0], r_LP[t, 1], r_LP[t, 2] = MATS_coordinates.ecef2eci(
-            r_LP_ECEF[t, 0], r_LP_ECEF[t, 1], r_LP_ECEF[t, 2], current_time_datetime
-        )
-
-        (
-            v_MATS_ECEF[t, 0],
-            v_MATS_ECEF[t, 1],
-            v_MATS_ECEF[t, 2],
-        ) = MATS_coordinates.eci2ecef(
-            v_MATS[t, 0], v_MATS[t, 1], v_MATS[t, 2], current_time_datetime
-        )
-
-        (
-            normal_orbit_ECEF[t, 0],
-            normal_orbit_ECEF[t, 1],
-            normal_orbit_ECEF[t, 2],
-        ) = MATS_coordinates.eci2ecef(
-            normal_orbit[t, 0],
-            normal_orbit[t, 1],
-            normal_orbit[t, 2],
-            current_time_datetime,
+    else:
+        Satellite_dict = Satellite_Simulator_batch(
+            MATS_skyfield,
+            SimulationTimes,
+            Timeline_settings,
+            pointing_altitudes / 1000,
+            LogFlags,
+            Logger,
         )
 
-        # orbangle_between_LP_MATS_array_dotproduct[t] = arccos( dot(r_MATS_unit_vector[t], r_LP[t]) / norm(r_LP[t]) ) / pi*180
-
-        "Freezing the attitude"
-        # if( Simulator_Select == 'Mode12X' and t*Timestep+Timestep > freeze_start and t*Timestep <= freeze_duration+freeze_start):
-        if (
-            Simulator_Select == "Mode12X"
-            and t * Timestep + StartingTimeRelative2StartOfMode > freeze_start
+    "Save results"
+    r_MATS[:] = Satellite_dict["Position [km]"]
+    v_MATS[:] = Satellite_dict["Velocity [km/s]"]
+    normal_orbit[:] = Satellite_dict["OrbitNormal"]
+    r_V_offset_normal[:] = Satellite_dict["Normal2V_offset"]
+    r_H_offset_normal[:] = Satellite_dict["Normal2H_offset"]
+    MATS_P[:, 0] = Satellite_dict["OrbitalPeriod [s]"]
+    alt_MATS[:, 0] = Satellite_dict["Altitude [km]"]
+    lat_MATS[:, 0] = Satellite_dict["Latitude [degrees]"]
+    long_MATS[:, 0] = Satellite_dict["Longitude [degrees]"]
+    optical_axis[:] = Satellite_dict["OpticalAxis"]
+    Dec_optical_axis[:, 0] = Satellite_dict["Dec_OpticalAxis [degrees]"]
+    RA_optical_axis[:, 0] = Satellite_dict["RA_OpticalAxis [degrees]"]
+    pitch_MATS[:, 0] = Satellite_dict["Pitch [degrees]"]
+    lat_LP_estimated[:, 0] = Satellite_dict["EstimatedLatitude_LP [degrees]"]
+    Yaw_function[:, 0] = Satellite_dict["Yaw [degrees]"]
+
+    "Freezing the attitude"
+    if Simulator_Select == "Mode12X":
+        frozen = [
+            t
+            for t in range(timesteps)
+            if t * Timestep + StartingTimeRelative2StartOfMode > freeze_start
             and t * Timestep + StartingTimeRelative2StartOfMode
             <= freeze_duration + freeze_start
-        ):
-            "Save the pointing for the exact time when attitude freeze is initiated"
-            if freeze_flag == 0:
-
-                "Exact timing of Attitude freeze"
-                current_time_freeze = ephem.Date(
-                    ephem.Date(ScienceMode[1]) + ephem.second * (freeze_start)
-                )
-
-                "Run the satellite simulation for the freeze time"
-                Satellite_dict = Satellite_Simulator(
-                    MATS_skyfield,
-                    current_time_freeze,
-                    Timeline_settings,
-                    pointing_altitude / 1000,
-                    LogFlag,
-                    Logger,
-                )
-
-                "Save results"
-                r_V_offset_normal_Freeze = Satellite_dict["Normal2V_offset"]
-                r_H_offset_normal_Freeze = Satellite_dict["Normal2H_offset"]
-                optical_axis_Freeze = Satellite_dict["OpticalAxis"]
+        ]
+        if len(frozen) > 0:
+            "Exact timing of Attitude freeze"
+            current_time_freeze = ephem.Date(
+                ephem.Date(ScienceMode[1]) + ephem.second * (freeze_start)
+            )
 
-            freeze_flag = 1
+            "Run the satellite simulation for the freeze time"
+            Satellite_dict = Satellite_Simulator(
+                MATS_skyfield,
+                current_time_freeze,
+                Timeline_settings,
+                pointing_altitudes[frozen[0]] / 1000,
+                LogFlags[frozen[0]],
+                Logger,
+            )
 
             "Maintain the same optical axis as the simulation progresses during the freeze"
-            optical_axis[t, :] = optical_axis_Freeze
-            (
-                optical_axis_ECEF[t, 0],
-                optical_axis_ECEF[t, 1],
-                optical_axis_ECEF[t, 2],
-            ) = MATS_coordinates.eci2ecef(
-                optical_axis[t, 0],
-                optical_axis[t, 1],
-                optical_axis[t, 2],
-                current_time_datetime,
+            optical_axis[frozen, :] = Satellite_dict["OpticalAxis"]
+            r_V_offset_normal[frozen, :] = Satellite_dict["Normal2V_offset"]
+            r_H_offset_normal[frozen, :] = Satellite_dict["Normal2H_offset"]
+            RA_optical_axis[frozen, 0], Dec_optical_axis[frozen, 0] = xyz2radec_array(
+                optical_axis[frozen, :], deg=True, positivera=True
             )
 
-            r_V_offset_normal[t, :] = r_V_offset_normal_Freeze
-            r_H_offset_normal[t, :] = r_H_offset_normal_Freeze
-
-            (
-                r_LP_ECEF[t, 0],
-                r_LP_ECEF[t, 1],
-                r_LP_ECEF[t, 2],
-            ) = MATS_coordinates.ecef2tanpoint(
-                r_MATS_ECEF[t][0],
-                r_MATS_ECEF[t][1],
-                r_MATS_ECEF[t][2],
-                optical_axis_ECEF[t, 0],
-                optical_axis_ECEF[t, 1],
-                optical_axis_ECEF[t, 2],
-            )
+    "Coordinate transformations and calculations, for all times at once"
+    R_ECEF = GeoidLib.rotation_to_itrs(skyfield_times(SimulationTimes))
+    r_MATS_ECEF[:] = GeoidLib.eci2ecef(r_MATS * 1000, R_ECEF)
+    optical_axis_ECEF[:] = GeoidLib.eci2ecef(optical_axis, R_ECEF)
+    v_MATS_ECEF[:] = GeoidLib.eci2ecef(v_MATS, R_ECEF)
+    normal_orbit_ECEF[:] = GeoidLib.eci2ecef(normal_orbit, R_ECEF)
 
-            lat_LP[t], long_LP[t], alt_LP[t] = MATS_coordinates.ECEF2lla(
-                r_LP_ECEF[t, 0], r_LP_ECEF[t, 1], r_LP_ECEF[t, 2]
-            )
+    "The LP is the tangent point of the optical axis"
+    distance_LP = LimbGeometry.find_tangent(r_MATS * 1000, optical_axis, R_ECEF)[0]
+    r_LP_ECEF[:] = r_MATS_ECEF + distance_LP[:, None] * optical_axis_ECEF
+    lat_LP[:, 0], long_LP[:, 0], alt_LP[:, 0] = GeoidLib.ecef2geodetic(r_LP_ECEF, deg=True)
+    r_LP[:] = GeoidLib.ecef2eci(r_LP_ECEF, R_ECEF)
 
-            r_LP[t, 0], r_LP[t, 1], r_LP[t, 2] = MATS_coordinates.ecef2eci(
-                r_LP_ECEF[t, 0], r_LP_ECEF[t, 1], r_LP_ECEF[t, 2], current_time_datetime
-            )
+    "Start of Simulation"
+    for t in range(timesteps):
 
-            Dec_optical_axis[t] = (
-                arctan(
-                    optical_axis[t, 2]
-                    / sqrt(optical_axis[t, 0] ** 2 + optical_axis[t, 1] ** 2)
-                )
-                / pi
-                * 180
-            )
-            RA_optical_axis[t] = (
-                arccos(
-                    dot([1, 0, 0], [optical_axis[t, 0], optical_axis[t, 1], 0])
-                    / norm([optical_axis[t, 0], optical_axis[t, 1], 0])
-                )
-                / pi
-                * 180
-            )
+        current_time = SimulationTimes[t]
+        current_time_datetime = ephem.Date(current_time).datetime()
 
-            if optical_axis[t, 1] < 0:
-                RA_optical_axis[t] = 360 - RA_optical_axis[t]
+        v_MATS_unit_vector[t, 0:3] = v_MATS[t, 0:3] / norm(v_MATS[t, 0:3])
+        r_MATS_unit_vector[t, 0:3] = r_MATS[t, 0:3] / norm(r_MATS[t, 0:3])
 
         "Define SLOF basis and convert ECI coordinates to SLOF"
         z_SLOF = -r_MATS[t, :]
@@ -1149,58 +1060,22 @@ def Plotter(
             "Yaw, Pitch, Roll as Euler Angles"
             Euler_angles_SLOF_OHB[t, :] = MATS_SLOF_OHB.as_euler("ZYZ", degrees=True)
 
-            (
-                optical_axis_OHB_ECEF[t, 0],
-                optical_axis_OHB_ECEF[t, 1],
-                optical_axis_OHB_ECEF[t, 2],
-            ) = MATS_coordinates.eci2ecef(
-                optical_axis_OHB[t, 0],
-                optical_axis_OHB[t, 1],
-                optical_axis_OHB[t, 2],
-                Time_OHB[t],
-            )
-
-            optical_axis_OHB_ECEF[t, :] = optical_axis_OHB_ECEF[t, :] / norm(
-                optical_axis_OHB_ECEF[t, :]
-            )
-
-            (
-                r_MATS_OHB_ECEF[t, 0],
-                r_MATS_OHB_ECEF[t, 1],
-                r_MATS_OHB_ECEF[t, 2],
-            ) = MATS_coordinates.eci2ecef(
-                r_MATS_OHB[t, 0], r_MATS_OHB[t, 1], r_MATS_OHB[t, 2], Time_OHB[t]
-            )
-
-            (
-                lat_MATS_OHB[t],
-                long_MATS_OHB[t],
-                alt_MATS_OHB[t],
-            ) = MATS_coordinates.ECEF2lla(
-                r_MATS_OHB_ECEF[t, 0], r_MATS_OHB_ECEF[t, 1], r_MATS_OHB_ECEF[t, 2]
-            )
-
-            (
-                r_LP_OHB_ECEF[t, 0],
-                r_LP_OHB_ECEF[t, 1],
-                r_LP_OHB_ECEF[t, 2],
-            ) = MATS_coordinates.ecef2tanpoint(
-                r_MATS_OHB_ECEF[t, 0],
-                r_MATS_OHB_ECEF[t, 1],
-                r_MATS_OHB_ECEF[t, 2],
-                optical_axis_OHB_ECEF[t, 0],
-                optical_axis_OHB_ECEF[t, 1],
-                optical_axis_OHB_ECEF[t, 2],
-            )
-
-            lat_LP_OHB[t], long_LP_OHB[t], alt_LP_OHB[t] = MATS_coordinates.ECEF2lla(
-                r_LP_OHB_ECEF[t, 0], r_LP_OHB_ECEF[t, 1], r_LP_OHB_ECEF[t, 2]
-            )
-
             # R_earth_MATS[t][t] = norm(r_MATS_OHB[t,:]*1000)-alt_MATS_OHB[t]
 
             Time_MPL_OHB[t] = date2num(Time_OHB[-1])
 
+        "Coordinate transformations and calculations, for all times at once"
+        R_ECEF_OHB = GeoidLib.rotation_to_itrs(skyfield_times(Time_OHB))
+        optical_axis_OHB_ECEF[:] = GeoidLib.eci2ecef(optical_axis_OHB, R_ECEF_OHB)
+        optical_axis_OHB_ECEF[:] = optical_axis_OHB_ECEF / norm(optical_axis_OHB_ECEF, axis=1)[:, None]
+        r_MATS_OHB_ECEF[:] = GeoidLib.eci2ecef(r_MATS_OHB, R_ECEF_OHB)
+        lat_MATS_OHB[:, 0], long_MATS_OHB[:, 0], alt_MATS_OHB[:, 0] = GeoidLib.ecef2geodetic(r_MATS_OHB_ECEF, deg=True)
+
+        "The LP is the tangent point of the optical axis"
+        distance_LP_OHB = LimbGeometry.find_tangent(r_MATS_OHB, optical_axis_OHB, R_ECEF_OHB)[0]
+        r_LP_OHB_ECEF[:] = r_MATS_OHB_ECEF + distance_LP_OHB[:, None] * optical_axis_OHB_ECEF
+        lat_LP_OHB[:, 0], long_LP_OHB[:, 0], alt_LP_OHB[:, 0] = GeoidLib.ecef2geodetic(r_LP_OHB_ECEF, deg=True)
+
     "######### END OF OHB DATA CALCULATIONS #########################"
     "#####################################################################################"
 
@@ -1258,20 +1133,14 @@ def Plotter(
         total_r_MATS_error_STK = []
         Time_error_STK_MPL = []
 
+        "Coordinate transformations, for all times at once"
+        r_MATS_STK_ECEF[: len(Time_STK)] = GeoidLib.eci2ecef(
+            r_MATS_STK_km[: len(Time_STK)] * 1000, GeoidLib.rotation_to_itrs(skyfield_times(Time_STK))
+        )
+
         "Calculate error between STK DATA and Predicted from Science Mode Timeline data when timestamps are the same"
         for t2 in range(len(Time_STK)):
 
-            (
-                r_MATS_STK_ECEF[t2, 0],
-                r_MATS_STK_ECEF[t2, 1],
-                r_MATS_STK_ECEF[t2, 2],
-            ) = MATS_coordinates.eci2ecef(
-                r_MATS_STK_km[t2, 0] * 1000,
-                r_MATS_STK_km[t2, 1] * 1000,
-                r_MATS_STK_km[t2, 2] * 1000,
-                Time_STK[t2],
-            )
-
             for t in range(len(Time)):
 
                 if Time_MPL_STK[t2] == Time_MPL[t]:
@@ -5,6 +5,7 @@ which creates a minimal Science XML file with fixed Commands with arguments take
 The minimal Science XML file defines the procedure for OHB to upload to the satellite after unscheduled payload shutdown.
 """
 from .Modes_and_Tests.Macros_Commands import Macros, Commands
+from .Modes_and_Tests.Macros_Commands.CommandBuffer import CommandBuffer
 from lxml import etree
 import logging
 import os
@@ -94,6 +95,8 @@ def MinimalScienceXMLGenerator(configFile):
 
     root.append(etree.Element("listOfCommands"))
 
+    root = CommandBuffer(root)
+
     "####################### End of XML-tree basis creator #############################"
 
     "####################### Minimum Science CMDs ######################################"
@@ -139,7 +142,7 @@ def MinimalScienceXMLGenerator(configFile):
     )
 
     "Update duration in the Timeline"
-    root[0][2][1].text = str(relativeTime + Timeline_settings["mode_separation"])
+    root.header[2][1].text = str(relativeTime + Timeline_settings["mode_separation"])
 
     "####################### End of Minimum Science CMDs ################################"
 
@@ -147,7 +150,7 @@ def MinimalScienceXMLGenerator(configFile):
     XML_TIMELINE = os.path.join(configFile.output_dir, "XML_TIMELINE__MinimalScience_.xml")
     Logger.info("Write XML-tree to: " + XML_TIMELINE)
     f = open(XML_TIMELINE, "w")
-    f.write(etree.tostring(root, pretty_print=True, encoding="unicode"))
+    f.write(etree.tostring(root.to_xml(), pretty_print=True, encoding="unicode"))
     f.close()
 
     "Reset temporary Globals"
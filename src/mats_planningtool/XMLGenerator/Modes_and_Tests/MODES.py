@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
 """Contain Mode functions which generates and calculates parameters for each mode, 
-then calls for Macros/Commands functions located in the *Macros_Commands* package, which will in turn write commands to the XML tree object *root*.
+then calls for Macros/Commands functions located in the *Macros_Commands* package, which will in turn add commands to the *CommandBuffer* object *root*.
 
 Functions on the form "X", where X is any Mode:
 
     **Arguments:**
-        **root** (*lxml.etree.Element*):  XML tree structure. Main container object for the ElementTree API. \n
+        **root** (*CommandBuffer*):  Buffer which the CMDs are added to, see the *CommandBuffer* module. \n
         **date** (*ephem.Date*): Starting date of the Mode. On the form of the ephem.Date class. \n
         **duration** (*int*): The duration of the mode [s]. \n
         **relativeTime** (*int*): The starting time of the mode with regard to the start of the timeline [s]. \n
@@ -30,7 +30,8 @@ from mats_planningtool.Library import (
     CCDSELExtracter,
     SyncArgCalculator,
 )
-from mats_planningtool.OrbitSimulator.MatsBana import Satellite_Simulator
+from mats_planningtool.OrbitSimulator.OrbitTable import Satellite_Simulator_table
+from mats_planningtool.OrbitSimulator import EventCalendar
 import ephem
 import logging
 import sys
@@ -64,6 +65,55 @@ def write_comment(current_state,current_time,Mode_settings,lat_LP,sun_angle):
 
     return comment
 
+def simulate_state(MATS_skyfield, times, Timeline_settings, configFile, pointing_altitude):
+    """Simulates the quantities which determine the state of MATS in Mode1 and Mode2, which are written in the comments of the CMDs.
+
+    The data is read from the orbit table of the timeline when possible. The state itself is looked up in the event calendar of the timeline.
+
+    Arguments:
+        MATS_skyfield (:obj:`skyfield.sgp4lib.EarthSatellite`): MATS.
+        times (list of :obj:`ephem.Date`): The times.
+        Timeline_settings (dict): Dictionary containing the settings of the Timeline.
+        configFile (obj): The config file.
+        pointing_altitude (float): Pointing altitude [km].
+
+    Returns:
+        (tuple): Solar zenith angle below MATS [degrees] and latitude of the LP [degrees], with shape (N,1).
+    """
+
+    Satellite_dict = Satellite_Simulator_table(
+        configFile,
+        Timeline_settings,
+        MATS_skyfield,
+        times,
+        pointing_altitude,
+    )
+
+    return (
+        pylab.reshape(Satellite_dict["SolarZenithAngleNadir"], (-1, 1)),
+        pylab.reshape(Satellite_dict["EstimatedLatitude_LP [degrees]"], (-1, 1)),
+    )
+
+
+def skipped_timesteps(calendar, current_time, end_time, timestep, kinds):
+    """Counts the timesteps of Mode1 and Mode2 before the next state change, where the state can not change.
+
+    Arguments:
+        calendar (:obj:`EventCalendar.EventCalendar`): The event calendar of the timeline.
+        current_time (:obj:`ephem.Date`): The current timestep.
+        end_time (:obj:`ephem.Date`): The end of the mode.
+        timestep (float): The length of the timesteps [s].
+        kinds (list of str): Names of the events which change the state.
+
+    Returns:
+        (int): The number of timesteps before the first timestep at or after the next event, or at or after *end_time*.
+    """
+
+    event = calendar.next_event(current_time, kinds)
+    until = end_time if event is None else min(event[0], end_time)
+    return max(int(pylab.ceil((until - current_time) / (ephem.second * timestep))) - 1, 0)
+
+
 def check_lat(lat_position,lat_limit):
 
     if lat_limit == -999:
@@ -193,10 +243,6 @@ def Mode1(root, date, duration, relativeTime, Timeline_settings, configFile, Mod
 
     """
 
-    zeros = pylab.zeros
-    pi = pylab.pi
-    arccos = pylab.arccos
-
     CCD_settings = copy.deepcopy(configFile.CCD_macro_settings("HighResUV"))
     PM_settings = configFile.PM_settings()
     Mode_settings_ConfigFile = configFile.Operational_Science_Mode_settings()
@@ -213,27 +259,11 @@ def Mode1(root, date, duration, relativeTime, Timeline_settings, configFile, Mod
 
     TLE = configFile.getTLE()
 
-    "Pre-allocate space"
-    lat_MATS = zeros((duration, 1))
-    r_MATS = zeros((duration, 3))
-    optical_axis = zeros((duration, 3))
-    lat_LP = zeros((duration, 1))
-    MATS_P = zeros((duration, 1))
-
-    sun_angle = zeros((duration, 1))
-    lat_LP = zeros((duration, 1))
-
-    R_mean = 6371000  # Radius of Earth in m
     pointing_altitude = Timeline_settings["StandardPointingAltitude"]
     lat = Mode_settings["lat"]
 
-    # Altitude in km where sun is deemed to reflect in atmosphere, determining night and day below satellite"
-    heightAboveSurface = 35000
-
     # Estimation of the angle between the sun and the FOV position when it enters eclipse
-    MATS_nadir_eclipse_angle = (
-        arccos(R_mean / (R_mean + heightAboveSurface)) / pi * 180 + 90
-    )
+    MATS_nadir_eclipse_angle = EventCalendar.NADIR_ECLIPSE_ANGLE
 
     Logger.debug("MATS_nadir_eclipse_angle : " + str(MATS_nadir_eclipse_angle))
     Logger.debug("")
@@ -293,192 +323,179 @@ def Mode1(root, date, duration, relativeTime, Timeline_settings, configFile, Mod
     )
 
     #Simulate satellite and generate mode
-    t = -1
+    t = 0
 
     MATS_skyfield = skyfield.api.EarthSatellite(TLE[0], TLE[1])
 
-    new_relativeTime = relativeTime
     current_time = ephem.Date(date)
+    end_time = ephem.Date(ephem.second * duration + ephem.Date(date))
+
+    "The state is looked up in the event calendar of the timeline"
+    calendar = EventCalendar.get_event_calendar(configFile, Timeline_settings)
+    lat_condition = calendar.latitude_condition(lat)
+    state_changes = calendar.event_names("nadir_eclipse") + calendar.event_names(lat_condition)
 
+    new_relativeTime = relativeTime
     sattelite_state = {"UV_on": True, "Nadir_on": True}
     changetime = []
-    all_states = []
-    # for t in range(int(duration/timestep)):
-    "Simulation begins here"
-    while current_time < ephem.second * duration + ephem.Date(date):
 
-        t += 1
-
-        if t != 0:
-            "Incremented time from scheduling CMDs"
-            CMD_scheduling_delay = new_relativeTime - relativeTime
-            "Increment with timestep each loop and add any added time from CMD scheduling"
-            current_time = ephem.Date(
-                current_time + ephem.second * (timestep + CMD_scheduling_delay)
+    sun_angle, lat_LP = simulate_state(
+        MATS_skyfield, [current_time], Timeline_settings, configFile, pointing_altitude / 1000
+    )
+    Logger.debug("sun_angle [degrees]: " + str(sun_angle[0]))
+    nadir_on = calendar.state("nadir_eclipse", current_time)
+    uv_on = calendar.state(lat_condition, current_time)
+
+    ############# Initial Mode setup ##########################################
+
+    "Check if night or day"
+    if nadir_on:
+
+        if not uv_on:
+            current_state = "Mode1_night_UV_off"
+            comment = write_comment(current_state,current_time,Mode_settings,lat_LP[0],sun_angle[0])
+            # new_relativeTime = Macros.Mode1_macro(root,relativeTime, pointing_altitude=pointing_altitude, UV_on = False, nadir_on = True, Timeline_settings = Timeline_settings, comment = comment)
+            new_relativeTime = Macros.Mode1(
+                root,
+                relativeTime,
+                CCD_settings,
+                TEXPIMS,
+                sattelite_state,
+                UV_on = False, Nadir_on = True,
+                Timeline_settings=Timeline_settings, configFile=configFile,
+                comment=comment,
+            )
+        
+        elif uv_on:
+            current_state = "Mode1_night_UV_on"
+            comment = (
+                current_state
+                + ": "
+                + str(current_time)
+                + ", parameters: "
+                + str(Mode_settings)
+            )
+            # new_relativeTime = Macros.Mode1_macro(root,relativeTime, pointing_altitude=pointing_altitude, UV_on = True, nadir_on = True, Timeline_settings = Timeline_settings, comment = comment)
+            new_relativeTime = Macros.Mode1(
+                root,
+                relativeTime,
+                CCD_settings,
+                TEXPIMS,
+                sattelite_state,
+                UV_on = True, Nadir_on = True,
+                Timeline_settings=Timeline_settings, configFile=configFile,
+                comment=comment,
             )
-            # current_time = ephem.Date( current_time+ephem.second*(new_relativeTime-relativeTime) )
-            relativeTime = new_relativeTime + timestep
 
-        new_relativeTime = relativeTime
+    elif not nadir_on:
+
+        if not uv_on:
+            current_state = "Mode1_day_UV_off"
+            comment = write_comment(current_state,current_time,Mode_settings,lat_LP[0],sun_angle[0])
+
+            # new_relativeTime = Macros.Mode1_macro(root,relativeTime,pointing_altitude, UV_on = False, nadir_on = False, Timeline_settings = Timeline_settings, comment = comment)
+            new_relativeTime = Macros.Mode1(
+                root,
+                relativeTime,
+                CCD_settings,
+                TEXPIMS,
+                sattelite_state,
+                UV_on = False, Nadir_on = False,
+                Timeline_settings=Timeline_settings, configFile=configFile,
+                comment=comment,
+            )
 
-        if t * timestep % log_timestep == 0:
-            LogFlag = True
-        else:
-            LogFlag = False
-
-        Satellite_dict = Satellite_Simulator(
-            MATS_skyfield,
-            current_time,
-            Timeline_settings,
-            pointing_altitude / 1000,
-            LogFlag,
-            Logger,
-        )
+        elif uv_on:
+            current_state = "Mode1_day_UV_on"
+            comment = write_comment(current_state,current_time,Mode_settings,lat_LP[0],sun_angle[0])
+            # new_relativeTime = Macros.Mode1_macro(root,relativeTime,pointing_altitude, UV_on = True, nadir_on = False, Timeline_settings = Timeline_settings, comment = comment)
+            new_relativeTime = Macros.Mode1(
+                root,
+                relativeTime,
+                CCD_settings,
+                TEXPIMS,
+                sattelite_state,
+                UV_on = True, Nadir_on = False,
+                Timeline_settings=Timeline_settings, configFile=configFile,
+                comment=comment,
+            )
 
-        r_MATS[t] = Satellite_dict["Position [km]"]
-        MATS_P[t] = Satellite_dict["OrbitalPeriod [s]"]
-        lat_MATS[t] = Satellite_dict["Latitude [degrees]"]
-        optical_axis[t] = Satellite_dict["OpticalAxis"]
-        lat_LP[t] = Satellite_dict["EstimatedLatitude_LP [degrees]"]
-        sun_angle[t] = Satellite_dict["SolarZenithAngleNadir"]
+    Logger.debug(current_state)
+    Logger.debug("")
 
-        if t * timestep % log_timestep == 0:
-            Logger.debug("sun_angle [degrees]: " + str(sun_angle[t]))
+    ############# End of Initial Mode setup ###################################
 
-        ############# Initial Mode setup ##########################################
+    "Simulation begins here"
+    while current_time < end_time:
 
-        if t == 0:
+        t += 1
 
-            "Check if night or day"
-            if sun_angle[t] > MATS_nadir_eclipse_angle:
+        "Incremented time from scheduling CMDs"
+        CMD_scheduling_delay = new_relativeTime - relativeTime
+        "Increment with timestep each loop and add any added time from CMD scheduling"
+        current_time = ephem.Date(
+            current_time + ephem.second * (timestep + CMD_scheduling_delay)
+        )
+        relativeTime = new_relativeTime + timestep
+        new_relativeTime = relativeTime
 
-                if ~check_lat(lat_LP[t],lat):
-                    current_state = "Mode1_night_UV_off"
-                    comment = write_comment(current_state,current_time,Mode_settings,lat_LP[t],sun_angle[t])
-                    # new_relativeTime = Macros.Mode1_macro(root,relativeTime, pointing_altitude=pointing_altitude, UV_on = False, nadir_on = True, Timeline_settings = Timeline_settings, comment = comment)
-                    new_relativeTime = Macros.Mode1(
-                        root,
-                        relativeTime,
-                        CCD_settings,
-                        TEXPIMS,
-                        sattelite_state,
-                        UV_on = False, Nadir_on = True,
-                        Timeline_settings=Timeline_settings, configFile=configFile,
-                        comment=comment,
-                    )
-                
-                elif check_lat(lat_LP[t],lat):
-                    current_state = "Mode1_night_UV_on"
-                    comment = (
-                        current_state
-                        + ": "
-                        + str(current_time)
-                        + ", parameters: "
-                        + str(Mode_settings)
-                    )
-                    # new_relativeTime = Macros.Mode1_macro(root,relativeTime, pointing_altitude=pointing_altitude, UV_on = True, nadir_on = True, Timeline_settings = Timeline_settings, comment = comment)
-                    new_relativeTime = Macros.Mode1(
-                        root,
-                        relativeTime,
-                        CCD_settings,
-                        TEXPIMS,
-                        sattelite_state,
-                        UV_on = True, Nadir_on = True,
-                        Timeline_settings=Timeline_settings, configFile=configFile,
-                        comment=comment,
-                    )
+        ####################### SCI-mode Operation planner ################
 
-            elif sun_angle[t] < MATS_nadir_eclipse_angle:
+        #Check status
+        nadir_on = calendar.state("nadir_eclipse", current_time)
+        uv_on = calendar.state(lat_condition, current_time)
+        #print('correct state: nadir %s uv %s : current state: nadir %s uv %s' % (nadir_on, uv_on, sattelite_state["Nadir_on"], sattelite_state["UV_on"]))
+        correct_state = (sattelite_state["UV_on"] == uv_on) and (sattelite_state["Nadir_on"] == nadir_on)
+        #print('change state %s ' % (not correct_state))
 
-                if ~check_lat(lat_LP[t],lat):
-                    current_state = "Mode1_day_UV_off"
-                    comment = write_comment(current_state,current_time,Mode_settings,lat_LP[t],sun_angle[t])
+        if (not correct_state) and (relativeTime+mode_change_time) <= Timeline_settings["duration"]["duration"]:
+            print('Changing state')
+            changetime.append(t)
 
-                    # new_relativeTime = Macros.Mode1_macro(root,relativeTime,pointing_altitude, UV_on = False, nadir_on = False, Timeline_settings = Timeline_settings, comment = comment)
-                    new_relativeTime = Macros.Mode1(
-                        root,
-                        relativeTime,
-                        CCD_settings,
-                        TEXPIMS,
-                        sattelite_state,
-                        UV_on = False, Nadir_on = False,
-                        Timeline_settings=Timeline_settings, configFile=configFile,
-                        comment=comment,
-                    )
+            sun_angle, lat_LP = simulate_state(
+                MATS_skyfield, [current_time], Timeline_settings, configFile, pointing_altitude / 1000
+            )
 
-                elif check_lat(lat_LP[t],lat):
-                    current_state = "Mode1_day_UV_on"
-                    comment = write_comment(current_state,current_time,Mode_settings,lat_LP[t],sun_angle[t])
-                    # new_relativeTime = Macros.Mode1_macro(root,relativeTime,pointing_altitude, UV_on = True, nadir_on = False, Timeline_settings = Timeline_settings, comment = comment)
-                    new_relativeTime = Macros.Mode1(
-                        root,
-                        relativeTime,
-                        CCD_settings,
-                        TEXPIMS,
-                        sattelite_state,
-                        UV_on = True, Nadir_on = False,
-                        Timeline_settings=Timeline_settings, configFile=configFile,
-                        comment=comment,
-                    )
+            Logger.debug("")
+            if nadir_on and uv_on:
+                current_state = "Mode1_night_UV_on"
+            elif ~nadir_on and uv_on:
+                current_state = "Mode1_day_UV_on"
+            elif nadir_on and ~uv_on:
+                current_state = "Mode1_night_UV_off"
+            elif ~nadir_on and ~uv_on:
+                current_state = "Mode1_day_UV_off"
+            else:
+                raise Exception
+            comment = write_comment(current_state,current_time,Mode_settings,lat_LP[0],sun_angle[0])
+
+            new_relativeTime = Macros.Mode1(
+                root,
+                relativeTime,
+                CCD_settings,
+                TEXPIMS,
+                sattelite_state,
+                UV_on = uv_on, Nadir_on = nadir_on,
+                Timeline_settings=Timeline_settings, configFile=configFile,
+                comment=comment,
+            )
 
             Logger.debug(current_state)
+            Logger.debug("current_time: " + str(current_time))
+            Logger.debug("lat_LP [degrees]: " + str(lat_LP[0]))
+            Logger.debug("sun_angle [degrees]: " + str(sun_angle[0]))
             Logger.debug("")
 
-            all_states.append(current_state)
-
-        ############# End of Initial Mode setup ###################################
-
-        
-        if t != 0:
-            ####################### SCI-mode Operation planner ################
-
-            #Check status
-            nadir_on = sun_angle[t] > MATS_nadir_eclipse_angle
-            uv_on = check_lat(lat_LP[t],lat)
-            #print('correct state: nadir %s uv %s : current state: nadir %s uv %s' % (nadir_on, uv_on, sattelite_state["Nadir_on"], sattelite_state["UV_on"]))
-            correct_state = (sattelite_state["UV_on"] == uv_on) and (sattelite_state["Nadir_on"] == nadir_on)
-            #print('change state %s ' % (not correct_state))
-
-            if (not correct_state) and (relativeTime+mode_change_time) <= Timeline_settings["duration"]["duration"]:
-                print('Changing state')
-                changetime.append(t)
-
-                Logger.debug("")
-                if nadir_on and uv_on:
-                    current_state = "Mode1_night_UV_on"
-                elif ~nadir_on and uv_on:
-                    current_state = "Mode1_day_UV_on"
-                elif nadir_on and ~uv_on:
-                    current_state = "Mode1_night_UV_off"
-                elif ~nadir_on and ~uv_on:
-                    current_state = "Mode1_day_UV_off"
-                else:
-                    raise Exception
-                comment = write_comment(current_state,current_time,Mode_settings,lat_LP[t],sun_angle[t])
-
-                new_relativeTime = Macros.Mode1(
-                    root,
-                    relativeTime,
-                    CCD_settings,
-                    TEXPIMS,
-                    sattelite_state,
-                    UV_on = uv_on, Nadir_on = nadir_on,
-                    Timeline_settings=Timeline_settings, configFile=configFile,
-                    comment=comment,
-                )
-
-                Logger.debug(current_state)
-                Logger.debug("current_time: " + str(current_time))
-                Logger.debug("lat_MATS [degrees]: " + str(lat_MATS[t]))
-                Logger.debug("lat_LP [degrees]: " + str(lat_LP[t]))
-                Logger.debug("sun_angle [degrees]: " + str(sun_angle[t]))
-                Logger.debug("")
+        else:
+            "The state stays correct (or can not be changed) until the next state change, skip the timesteps before it"
+            steps = skipped_timesteps(calendar, current_time, end_time, timestep, state_changes)
+            t += steps
+            current_time = ephem.Date(current_time + ephem.second * timestep * steps)
+            relativeTime = relativeTime + timestep * steps
+            new_relativeTime = relativeTime
 
-            all_states.append(current_state)
-            ############### End of SCI-mode operation planner #################
+        ############### End of SCI-mode operation planner #################
 
-       
-    
     color_dict = { 'Mode1_night_UV_on':'red', 'Mode1_day_UV_on':'blue', 'Mode1_night_UV_off':'black', 'Mode1_day_UV_off':'green'}    
     print('test')
 
@@ -496,10 +513,6 @@ def Mode2(root, date, duration, relativeTime, Timeline_settings, configFile, Mod
 
     """
 
-    zeros = pylab.zeros
-    pi = pylab.pi
-    arccos = pylab.arccos
-
     CCD_settings = copy.deepcopy(configFile.CCD_macro_settings("HighResUV"))
     PM_settings = configFile.PM_settings()
     Mode_settings_ConfigFile = configFile.Operational_Science_Mode_settings()
@@ -516,27 +529,11 @@ def Mode2(root, date, duration, relativeTime, Timeline_settings, configFile, Mod
 
     TLE = configFile.getTLE()
 
-    "Pre-allocate space"
-    lat_MATS = zeros((duration, 1))
-    r_MATS = zeros((duration, 3))
-    optical_axis = zeros((duration, 3))
-    lat_LP = zeros((duration, 1))
-    MATS_P = zeros((duration, 1))
-
-    sun_angle = zeros((duration, 1))
-    lat_LP = zeros((duration, 1))
-
-    R_mean = 6371000  # Radius of Earth in m
     pointing_altitude = Timeline_settings["StandardPointingAltitude"]
     lat = Mode_settings["lat"]
 
-    # Altitude in km where sun is deemed to reflect in atmosphere, determining night and day below satellite"
-    heightAboveSurface = 35000
-
     # Estimation of the angle between the sun and the FOV position when it enters eclipse
-    MATS_nadir_eclipse_angle = (
-        arccos(R_mean / (R_mean + heightAboveSurface)) / pi * 180 + 90
-    )
+    MATS_nadir_eclipse_angle = EventCalendar.NADIR_ECLIPSE_ANGLE
 
     Logger.debug("MATS_nadir_eclipse_angle : " + str(MATS_nadir_eclipse_angle))
     Logger.debug("")
@@ -596,66 +593,106 @@ def Mode2(root, date, duration, relativeTime, Timeline_settings, configFile, Mod
     )
 
     #Simulate satellite and generate mode
-    t = -1
+    t = 0
 
     MATS_skyfield = skyfield.api.EarthSatellite(TLE[0], TLE[1])
 
-    new_relativeTime = relativeTime
     current_time = ephem.Date(date)
+    end_time = ephem.Date(ephem.second * duration + ephem.Date(date))
+
+    "Dusk and dawn are looked up in the event calendar of the timeline"
+    calendar = EventCalendar.get_event_calendar(configFile, Timeline_settings)
+    state_changes = calendar.event_names("nadir_eclipse")
 
+    new_relativeTime = relativeTime
     sattelite_state = {"UV_on": True, "Nadir_on": True}
 
-    # for t in range(int(duration/timestep)):
+    sun_angle, lat_LP = simulate_state(
+        MATS_skyfield, [current_time], Timeline_settings, configFile, pointing_altitude / 1000
+    )
+    Logger.debug("sun_angle [degrees]: " + str(sun_angle[0]))
+
+    ############# Initial Mode setup ##########################################
+
+    "Check if night or day"
+    if calendar.state("nadir_eclipse", current_time):
+
+        current_state = "Mode2_night"
+        comment = write_comment(current_state,current_time,Mode_settings,lat_LP[0],sun_angle[0])
+        new_relativeTime = Macros.Mode1(
+            root,
+            relativeTime,
+            CCD_settings,
+            TEXPIMS,
+            sattelite_state,
+            UV_on = False, Nadir_on = True,
+            Timeline_settings=Timeline_settings, configFile=configFile,
+            comment=comment,
+        )
+
+    else:
+
+        current_state = "Mode2_day"
+
+        new_relativeTime = Macros.Mode1(
+            root,
+            relativeTime,
+            CCD_settings,
+            TEXPIMS,
+            sattelite_state,
+            UV_on = False, Nadir_on = False,
+            Timeline_settings=Timeline_settings, configFile=configFile,
+            comment=comment,
+        )
+
+    Logger.debug(current_state)
+    Logger.debug("")
+
+    ############# End of Initial Mode setup ###################################
+
     "Simulation begins here"
-    while current_time < ephem.second * duration + ephem.Date(date):
+    while current_time < end_time:
 
         t += 1
 
-        if t != 0:
-            "Incremented time from scheduling CMDs"
-            CMD_scheduling_delay = new_relativeTime - relativeTime
-            "Increment with timestep each loop and add any added time from CMD scheduling"
-            current_time = ephem.Date(
-                current_time + ephem.second * (timestep + CMD_scheduling_delay)
-            )
-            # current_time = ephem.Date( current_time+ephem.second*(new_relativeTime-relativeTime) )
-            relativeTime = new_relativeTime + timestep
-
+        "Incremented time from scheduling CMDs"
+        CMD_scheduling_delay = new_relativeTime - relativeTime
+        previous_time = current_time
+        "Increment with timestep each loop and add any added time from CMD scheduling"
+        current_time = ephem.Date(
+            current_time + ephem.second * (timestep + CMD_scheduling_delay)
+        )
+        relativeTime = new_relativeTime + timestep
         new_relativeTime = relativeTime
 
-        if t * timestep % log_timestep == 0:
-            LogFlag = True
-        else:
-            LogFlag = False
-
-        Satellite_dict = Satellite_Simulator(
-            MATS_skyfield,
-            current_time,
-            Timeline_settings,
-            pointing_altitude / 1000,
-            LogFlag,
-            Logger,
+        "Index 0 is the previous timestep and index 1 the current timestep"
+        nadir_eclipse = calendar.state("nadir_eclipse", [previous_time, current_time])
+        if nadir_eclipse[0] == nadir_eclipse[1]:
+            "No dusk or dawn, skip the timesteps before the next one"
+            steps = skipped_timesteps(calendar, current_time, end_time, timestep, state_changes)
+            t += steps
+            current_time = ephem.Date(current_time + ephem.second * timestep * steps)
+            relativeTime = relativeTime + timestep * steps
+            new_relativeTime = relativeTime
+            continue
+
+        sun_angle, lat_LP = simulate_state(
+            MATS_skyfield, [previous_time, current_time], Timeline_settings, configFile, pointing_altitude / 1000
         )
 
-        r_MATS[t] = Satellite_dict["Position [km]"]
-        MATS_P[t] = Satellite_dict["OrbitalPeriod [s]"]
-        lat_MATS[t] = Satellite_dict["Latitude [degrees]"]
-        optical_axis[t] = Satellite_dict["OpticalAxis"]
-        lat_LP[t] = Satellite_dict["EstimatedLatitude_LP [degrees]"]
-        sun_angle[t] = Satellite_dict["SolarZenithAngleNadir"]
+        ####################### SCI-mode Operation planner ################
 
-        if t * timestep % log_timestep == 0:
-            Logger.debug("sun_angle [degrees]: " + str(sun_angle[t]))
+        # Check dusk
+        if nadir_eclipse[1] and not nadir_eclipse[0]:
 
-        ############# Initial Mode setup ##########################################
+            if (new_relativeTime+mode_change_time) <= Timeline_settings["duration"]["duration"]:
 
-        if t == 0:
+                Logger.debug("")
+                current_state = "Mode2_night"
+                comment = write_comment(current_state,current_time,Mode_settings,lat_LP[1],sun_angle[1])
 
-            "Check if night or day"
-            if sun_angle[t] > MATS_nadir_eclipse_angle:
+                # new_relativeTime = Macros.Mode1_macro(root, relativeTime, pointing_altitude, UV_on = False, nadir_on = True, Timeline_settings = Timeline_settings, comment = comment)
 
-                current_state = "Mode2_night"
-                comment = write_comment(current_state,current_time,Mode_settings,lat_LP[t],sun_angle[t])
                 new_relativeTime = Macros.Mode1(
                     root,
                     relativeTime,
@@ -667,9 +704,22 @@ def Mode2(root, date, duration, relativeTime, Timeline_settings, configFile, Mod
                     comment=comment,
                 )
 
-            elif sun_angle[t] < MATS_nadir_eclipse_angle:
+                Logger.debug(current_state)
+                Logger.debug("current_time: " + str(current_time))
+                Logger.debug("lat_LP [degrees]: " + str(lat_LP[1]))
+                Logger.debug("sun_angle [degrees]: " + str(sun_angle[1]))
+                Logger.debug("")
 
+
+
+        # Check dawn
+        if nadir_eclipse[0] and not nadir_eclipse[1]:
+
+            if (new_relativeTime+mode_change_time) <= Timeline_settings["duration"]["duration"]:
+
+                Logger.debug("")
                 current_state = "Mode2_day"
+                comment = write_comment(current_state,current_time,Mode_settings,lat_LP[1],sun_angle[1])
 
                 new_relativeTime = Macros.Mode1(
                     root,
@@ -682,80 +732,13 @@ def Mode2(root, date, duration, relativeTime, Timeline_settings, configFile, Mod
                     comment=comment,
                 )
 
-            Logger.debug(current_state)
-            Logger.debug("")
-
-        ############# End of Initial Mode setup ###################################
-
-        if t != 0:
-            ####################### SCI-mode Operation planner ################
-
-            # Check dusk
-            if (
-                sun_angle[t] >= MATS_nadir_eclipse_angle
-                and sun_angle[t - 1] < MATS_nadir_eclipse_angle
-            ):
-
-                if (new_relativeTime+mode_change_time) <= Timeline_settings["duration"]["duration"]:
-
-                    Logger.debug("")
-                    current_state = "Mode2_night"
-                    comment = write_comment(current_state,current_time,Mode_settings,lat_LP[t],sun_angle[t])
-
-                    # new_relativeTime = Macros.Mode1_macro(root, relativeTime, pointing_altitude, UV_on = False, nadir_on = True, Timeline_settings = Timeline_settings, comment = comment)
-
-                    new_relativeTime = Macros.Mode1(
-                        root,
-                        relativeTime,
-                        CCD_settings,
-                        TEXPIMS,
-                        sattelite_state,
-                        UV_on = False, Nadir_on = True,
-                        Timeline_settings=Timeline_settings, configFile=configFile,
-                        comment=comment,
-                    )
-
-                    Logger.debug(current_state)
-                    Logger.debug("current_time: " + str(current_time))
-                    Logger.debug("lat_MATS [degrees]: " + str(lat_MATS[t]))
-                    Logger.debug("lat_LP [degrees]: " + str(lat_LP[t]))
-                    Logger.debug("sun_angle [degrees]: " + str(sun_angle[t]))
-                    Logger.debug("")
-
-
-
-            # Check dawn
-            if (
-                sun_angle[t] <= MATS_nadir_eclipse_angle
-                and sun_angle[t - 1] > MATS_nadir_eclipse_angle
-            ):
-
-                if (new_relativeTime+mode_change_time) <= Timeline_settings["duration"]["duration"]:
-
-                    Logger.debug("")
-                    current_state = "Mode2_day"
-                    comment = write_comment(current_state,current_time,Mode_settings,lat_LP[t],sun_angle[t])
-
-                    new_relativeTime = Macros.Mode1(
-                        root,
-                        relativeTime,
-                        CCD_settings,
-                        TEXPIMS,
-                        sattelite_state,
-                        UV_on = False, Nadir_on = False,
-                        Timeline_settings=Timeline_settings, configFile=configFile,
-                        comment=comment,
-                    )
-
-                    Logger.debug(current_state)
-                    Logger.debug("current_time: " + str(current_time))
-                    Logger.debug("lat_MATS [degrees]: " + str(lat_MATS[t]))
-                    Logger.debug("lat_LP [degrees]: " + str(lat_LP[t]))
-                    Logger.debug("sun_angle [degrees]: " + str(sun_angle[t]))
-                    Logger.debug("")
-
+                Logger.debug(current_state)
+                Logger.debug("current_time: " + str(current_time))
+                Logger.debug("lat_LP [degrees]: " + str(lat_LP[1]))
+                Logger.debug("sun_angle [degrees]: " + str(sun_angle[1]))
+                Logger.debug("")
 
-            ############### End of SCI-mode operation planner #################
+        ############### End of SCI-mode operation planner #################
 
 
 ################################################################################################
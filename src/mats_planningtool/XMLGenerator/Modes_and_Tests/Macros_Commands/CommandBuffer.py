@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""Contains the *CommandBuffer*, which collects the CMDs and procedures scheduled by the functions in the *Commands* module.
+
+Each CMD is kept as a small *Command* record (mnemonic, relativeTime, comment and arguments) instead of as an lxml subtree.
+Adding a CMD is then a single append, and the CMDs can be sorted, checked or have duplicates removed without walking an XML tree.
+The CMDs are converted into XML elements (see *Command.to_element*) or dictionaries (see *Command.to_dict*) when they are written.
+
+The buffer also holds the XML tree created by *XML_Initial_Basis_Creator*, of which only the header (*description*) is used.
+"""
+
+import json
+import logging
+
+from lxml import etree
+
+Logger = logging.getLogger("OPT_logger")
+
+
+"XML names of the identifier, argument container and argument of each kind of entry, as in the 'InnoSat Payload Timeline XML Definition' document"
+_XML_NAMES = {
+    "command": ("mnemonic", "tcArguments", "tcArgument", "mnemonic"),
+    "procedure": ("id", "parameters", "parameter", "name"),
+}
+
+
+class Command:
+    """A CMD or procedure in a timeline.
+
+    Attributes:
+        kind (str): 'command' or 'procedure'.
+        mnemonic (str): Mnemonic of the CMD, or id of the procedure.
+        relativeTime (int): The relativeTime of the CMD with regard to the start of the timeline [s].
+        comment (str): A comment regarding the CMD.
+        arguments (tuple): The arguments of the CMD as (name, value) pairs, in order.
+
+    """
+
+    __slots__ = ("kind", "mnemonic", "relativeTime", "comment", "arguments")
+
+    def __init__(self, kind, mnemonic, relativeTime, comment, arguments):
+        self.kind = kind
+        self.mnemonic = mnemonic
+        self.relativeTime = relativeTime
+        self.comment = comment
+        self.arguments = arguments
+
+    def __repr__(self):
+        return "Command(" + self.mnemonic + ", " + str(self.relativeTime) + ", " + str(self.arguments) + ")"
+
+    def __eq__(self, other):
+        if not isinstance(other, Command):
+            return NotImplemented
+        return self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def key(self):
+        "Returns a tuple identifying the CMD"
+        return (self.kind, self.mnemonic, self.relativeTime, self.comment, self.arguments)
+
+    def to_element(self):
+        """Converts the CMD into an XML element.
+
+        Returns:
+            (lxml.etree.Element): A *command* or *procedure* element.
+
+        """
+        identifier, container, argument, argument_identifier = _XML_NAMES[self.kind]
+
+        element = etree.Element(self.kind, {identifier: self.mnemonic})
+        etree.SubElement(element, "relativeTime").text = str(self.relativeTime)
+        etree.SubElement(element, "comment").text = self.comment
+        arguments = etree.SubElement(element, container)
+        for name, value in self.arguments:
+            etree.SubElement(arguments, argument, {argument_identifier: name}).text = str(value)
+
+        return element
+
+    @classmethod
+    def from_element(cls, element):
+        """Creates a CMD from an XML element, the inverse of *to_element*.
+
+        Arguments:
+            element (lxml.etree.Element): A *command* or *procedure* element.
+
+        Returns:
+            (:obj:`Command`): The CMD. The comment is None if the element has an empty comment.
+
+        """
+        identifier, container, argument, argument_identifier = _XML_NAMES[element.tag]
+
+        arguments = element.find(container)
+        return cls(
+            element.tag,
+            element.get(identifier),
+            int(element.findtext("relativeTime")),
+            element.findtext("comment") or None,
+            tuple(
+                (child.get(argument_identifier), child.text)
+                for child in (arguments if arguments is not None else ())
+                if child.tag == argument
+            ),
+        )
+
+    def to_dict(self):
+        """Converts the CMD into a dictionary which can be saved as JSON.
+
+        Returns:
+            (dict): The CMD, with the arguments as a list of [name, value] pairs.
+
+        """
+        return {
+            "kind": self.kind,
+            "mnemonic": self.mnemonic,
+            "relativeTime": self.relativeTime,
+            "comment": self.comment,
+            "arguments": [[name, str(value)] for name, value in self.arguments],
+        }
+
+
+class CommandBuffer:
+    """Ordered list of the CMDs of a timeline.
+
+    Attributes:
+        tree (lxml.etree.Element): XML tree with the header of the timeline, created by *XML_Initial_Basis_Creator*.
+        commands (list of :obj:`Command`): The CMDs added and not yet taken with *take*.
+
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.commands = []
+
+    @property
+    def header(self):
+        "The header (*description*) of the XML tree"
+        return self.tree[0]
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __iter__(self):
+        return iter(self.commands)
+
+    def add(self, mnemonic, relativeTime, comment, arguments=(), kind="command"):
+        """Adds a CMD to the end of the buffer.
+
+        Arguments:
+            mnemonic (str): Mnemonic of the CMD, or id of the procedure.
+            relativeTime (float): The relativeTime of the CMD [s]. Rounded down to an integer.
+            comment (str): A comment regarding the CMD.
+            arguments (list): The arguments of the CMD as (name, value) pairs, in order.
+            kind (str): 'command' or 'procedure'.
+
+        """
+        self.commands.append(Command(kind, mnemonic, int(relativeTime), comment, tuple(arguments)))
+
+    def take(self):
+        """Removes and returns all CMDs in the buffer.
+
+        Returns:
+            (list of :obj:`Command`): The CMDs in the order they were added.
+
+        """
+        commands = self.commands
+        self.commands = []
+        return commands
+
+    def sort(self):
+        "Sorts the CMDs by relativeTime, keeping the order of CMDs with equal relativeTime"
+        self.commands.sort(key=lambda command: command.relativeTime)
+
+    def remove_duplicates(self):
+        """Removes CMDs identical to an earlier CMD.
+
+        Returns:
+            (int): The number of CMDs removed.
+
+        """
+        seen = set()
+        commands = []
+        for command in self.commands:
+            key = command.key()
+            if key not in seen:
+                seen.add(key)
+                commands.append(command)
+
+        removed = len(self.commands) - len(commands)
+        self.commands = commands
+        return removed
+
+    def validate(self, duration=None):
+        """Checks that the relativeTime of the CMDs is non decreasing and inside of the timeline.
+
+        Arguments:
+            duration (int): Duration of the timeline [s]. Not checked if None.
+
+        Raises:
+            ValueError: If a CMD is scheduled before the previous CMD or outside of the timeline.
+
+        """
+        latestRelativeTime = 0
+        for command in self.commands:
+            if command.relativeTime < latestRelativeTime or (duration is not None and command.relativeTime > duration):
+                Logger.error("Invalid relativeTime of CMD: " + repr(command))
+                raise ValueError
+            latestRelativeTime = command.relativeTime
+
+    def to_xml(self):
+        """Adds the CMDs to the *listOfCommands* of the XML tree.
+
+        Returns:
+            (lxml.etree.Element): The XML tree.
+
+        """
+        for command in self.commands:
+            self.tree[1].append(command.to_element())
+        return self.tree
+
+    def to_json(self, **kwargs):
+        """Converts the CMDs into JSON.
+
+        Arguments:
+            **kwargs: Passed on to *json.dumps*.
+
+        Returns:
+            (str): A JSON list of the CMDs, see *Command.to_dict*.
+
+        """
+        return json.dumps([command.to_dict() for command in self.commands], **kwargs)
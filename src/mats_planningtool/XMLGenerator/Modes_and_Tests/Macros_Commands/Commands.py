@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 """Contain command functions. Each command function represent a CMD/Procedure listed in the "InnoSat Payload Timeline XML Definition" document.
 
-Add commands to the XML-tree as specified in "InnoSat Payload Timeline XML Definition" document.
+Add commands to the *CommandBuffer* of the timeline, which are written as specified in "InnoSat Payload Timeline XML Definition" document.
 Also checks if parameters given are valid for the CMDs.
 
 Each Command function has these inputs/outputs in common.
 
     **Arguments:**
-        **root** (*lxml.etree.Element*):  XML tree structure. Main container object for the ElementTree API. \n
+        **root** (*CommandBuffer*):  Buffer holding the CMDs of the timeline and the header of the XML tree. See the *CommandBuffer* module. \n
         **relativeTime** (*float*): The *relativeTime* of the CMD with regard to the start of the timeline [s]. \n
         **CMD specific parameters**: A number of CMD specific parameters as defined in "InnoSat Payload Timeline XML Definition" document for each corresponding command. \n
         **Timeline_settings** (*dict*): Dictionary containing the settings of the Timeline given in either the *Science_Mode_Timeline* or the *Configuration File*. \n
@@ -20,7 +20,6 @@ Each Command function has these inputs/outputs in common.
 
 import logging
 import importlib
-from lxml import etree
 from pylab import sign, ceil
 
 from mats_planningtool.Library import calculate_time_per_row
@@ -47,17 +46,14 @@ def TC_pafMode(root, relativeTime, MODE, Timeline_settings, configFile, comment=
         Logger.error("Invalid argument: MODE")
         raise ValueError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafMODE")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="MODE")
-    root[1][len(root[1]) - 1][2][0].text = str(MODE)
+    root.add(
+        "TC_pafMODE",
+        relativeTime,
+        comment,
+        [
+            ("MODE", MODE),
+        ],
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -108,23 +104,16 @@ def TC_acfLimbPointingAltitudeOffset(
     # if(current_pointing != Final or current_pointing != Initial ):
     #    Logger.debug('Scheduling pointing command')
 
-    etree.SubElement(root[1], "command", mnemonic="TC_acfLimbPointingAltitudeOffset")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="Initial")
-    root[1][len(root[1]) - 1][2][0].text = str(Initial)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="Final")
-    root[1][len(root[1]) - 1][2][1].text = str(Final)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="Rate")
-    root[1][len(root[1]) - 1][2][2].text = str(Rate)
+    root.add(
+        "TC_acfLimbPointingAltitudeOffset",
+        relativeTime,
+        comment,
+        [
+            ("Initial", Initial),
+            ("Final", Final),
+            ("Rate", Rate),
+        ],
+    )
 
     if Rate != 0:
         incremented_time = relativeTime + Timeline_settings["CMD_separation"]
@@ -190,19 +179,15 @@ def TC_acsPayloadAttitudeFreeze(
         Logger.error("Invalid argument: negative FreezeDuration or too long.")
         raise ValueError
 
-    etree.SubElement(root[1], "procedure", id="FCP-ACS-0022_Payload_Attitude_Freeze")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "parameters")
-    etree.SubElement(
-        root[1][len(root[1]) - 1][2], "parameter", name="duration"
+    root.add(
+        "FCP-ACS-0022_Payload_Attitude_Freeze",
+        relativeTime,
+        comment,
+        [
+            ("duration", FreezeDuration),
+        ],
+        kind="procedure",
     )
-    root[1][len(root[1]) - 1][2][0].text = str(FreezeDuration)
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -228,19 +213,14 @@ def TC_acfArgEnableYawComp(
         Logger.error("Invalid argument: EnableYawComp")
         raise ValueError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_acfArgEnableYawComp")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(
-        root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="EnableYawComp"
+    root.add(
+        "TC_acfArgEnableYawComp",
+        relativeTime,
+        comment,
+        [
+            ("EnableYawComp", EnableYawComp),
+        ],
     )
-    root[1][len(root[1]) - 1][2][0].text = str(EnableYawComp)
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -269,17 +249,14 @@ def TC_pafPWRToggle(
         Logger.error("Invalid argument: CONST")
         raise ValueError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafPWRTOGGLE")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="CONST")
-    root[1][len(root[1]) - 1][2][0].text = str(CONST)
+    root.add(
+        "TC_pafPWRTOGGLE",
+        relativeTime,
+        comment,
+        [
+            ("CONST", CONST),
+        ],
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -325,35 +302,20 @@ def TC_pafUpload(
         Logger.error("Invalid argument: WFLASH")
         raise ValueError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafUPLOAD")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="PINDEX")
-    root[1][len(root[1]) - 1][2][0].text = str(PINDEX)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="PTOTAL")
-    root[1][len(root[1]) - 1][2][1].text = str(PTOTAL)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="WFLASH")
-    root[1][len(root[1]) - 1][2][2].text = str(WFLASH)
+    arguments = [
+        ("PINDEX", PINDEX),
+        ("PTOTAL", PTOTAL),
+        ("WFLASH", WFLASH),
+        ("NIMG", NIMG),
+    ]
 
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NIMG")
-    root[1][len(root[1]) - 1][2][3].text = str(NIMG)
-
-    x = 4
     for Image in IMG:
         if not (0 <= Image <= 255 and type(Image) == int):
             Logger.error("Invalid argument: Image")
             raise ValueError
-        etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="IMG")
-        root[1][len(root[1]) - 1][2][x].text = str(Image)
-        x = x + 1
+        arguments.append(("IMG", Image))
+
+    root.add("TC_pafUPLOAD", relativeTime, comment, arguments)
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -407,29 +369,18 @@ def TC_pafHTR(
         Logger.error("Invalid argument: DVALUE")
         raise ValueError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafHTR")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="HTRSEL")
-    root[1][len(root[1]) - 1][2][0].text = str(HTRSEL)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="SET")
-    root[1][len(root[1]) - 1][2][1].text = str(SET)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="PVALUE")
-    root[1][len(root[1]) - 1][2][2].text = str(PVALUE)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="IVALUE")
-    root[1][len(root[1]) - 1][2][3].text = str(IVALUE)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="DVALUE")
-    root[1][len(root[1]) - 1][2][4].text = str(DVALUE)
+    root.add(
+        "TC_pafHTR",
+        relativeTime,
+        comment,
+        [
+            ("HTRSEL", HTRSEL),
+            ("SET", SET),
+            ("PVALUE", PVALUE),
+            ("IVALUE", IVALUE),
+            ("DVALUE", DVALUE),
+        ],
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -552,65 +503,30 @@ def TC_pafCCDMain(
         Logger.error("Invalid argument: TEXPMS or TEXPIMS is not an integer")
         raise TypeError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafCCD")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="CCDSEL")
-    root[1][len(root[1]) - 1][2][0].text = str(CCDSEL)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="PWR")
-    root[1][len(root[1]) - 1][2][1].text = str(PWR)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="WDW")
-    root[1][len(root[1]) - 1][2][2].text = str(WDW)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="JPEGQ")
-    root[1][len(root[1]) - 1][2][3].text = str(JPEGQ)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="SYNC")
-    root[1][len(root[1]) - 1][2][4].text = str(SYNC)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="TEXPIMS")
-    root[1][len(root[1]) - 1][2][5].text = str(TEXPIMS)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="TEXPMS")
-    root[1][len(root[1]) - 1][2][6].text = str(TEXPMS)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="GAIN")
-    root[1][len(root[1]) - 1][2][7].text = str(GAIN)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NFLUSH")
-    root[1][len(root[1]) - 1][2][8].text = str(NFLUSH)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NRSKIP")
-    root[1][len(root[1]) - 1][2][9].text = str(NRSKIP)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NRBIN")
-    root[1][len(root[1]) - 1][2][10].text = str(NRBIN)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NROW")
-    root[1][len(root[1]) - 1][2][11].text = str(NROW)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NCSKIP")
-    root[1][len(root[1]) - 1][2][12].text = str(NCSKIP)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NCBIN")
-    root[1][len(root[1]) - 1][2][13].text = str(NCBIN)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NCOL")
-    root[1][len(root[1]) - 1][2][14].text = str(NCOL)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NCBINFPGA")
-    root[1][len(root[1]) - 1][2][15].text = str(NCBINFPGA)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="SIGMODE")
-    root[1][len(root[1]) - 1][2][16].text = str(SIGMODE)
+    root.add(
+        "TC_pafCCD",
+        relativeTime,
+        comment,
+        [
+            ("CCDSEL", CCDSEL),
+            ("PWR", PWR),
+            ("WDW", WDW),
+            ("JPEGQ", JPEGQ),
+            ("SYNC", SYNC),
+            ("TEXPIMS", TEXPIMS),
+            ("TEXPMS", TEXPMS),
+            ("GAIN", GAIN),
+            ("NFLUSH", NFLUSH),
+            ("NRSKIP", NRSKIP),
+            ("NRBIN", NRBIN),
+            ("NROW", NROW),
+            ("NCSKIP", NCSKIP),
+            ("NCBIN", NCBIN),
+            ("NCOL", NCOL),
+            ("NCBINFPGA", NCBINFPGA),
+            ("SIGMODE", SIGMODE),
+        ],
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -663,23 +579,12 @@ def TC_pafCCDSYNCHRONIZE(
     Logger.debug("NCCD: " + str(NCCD))
     Logger.debug("TEXPIOFS: " + str(TEXPIOFS))
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafCCDSYNCHRONIZE")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="CCDSEL")
-    root[1][len(root[1]) - 1][2][0].text = str(CCDSEL)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NCCD")
-    root[1][len(root[1]) - 1][2][1].text = str(NCCD)
+    arguments = [
+        ("CCDSEL", CCDSEL),
+        ("NCCD", NCCD),
+    ]
 
     Leading_CCD_selected = False
-    x = 2
     for TimeOffset in TEXPIOFS:
 
         if not (
@@ -692,11 +597,7 @@ def TC_pafCCDSYNCHRONIZE(
         if TimeOffset == 0:
             Leading_CCD_selected = True
 
-        etree.SubElement(
-            root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="TEXPIOFS"
-        )
-        root[1][len(root[1]) - 1][2][x].text = str(TimeOffset)
-        x = x + 1
+        arguments.append(("TEXPIOFS", TimeOffset))
 
     if not (Leading_CCD_selected == True):
         Logger.error(
@@ -704,6 +605,8 @@ def TC_pafCCDSYNCHRONIZE(
         )
         raise ValueError
 
+    root.add("TC_pafCCDSYNCHRONIZE", relativeTime, comment, arguments)
+
     incremented_time = (
         relativeTime
         + Timeline_settings["CMD_separation"]
@@ -741,29 +644,18 @@ def TC_pafCCDBadColumn(
         )
         raise ValueError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafCCDBadColumn")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
+    arguments = [
+        ("CCDSEL", CCDSEL),
+        ("NBC", NBC),
+    ]
 
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="CCDSEL")
-    root[1][len(root[1]) - 1][2][0].text = str(CCDSEL)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="NBC")
-    root[1][len(root[1]) - 1][2][1].text = str(NBC)
-
-    x = 2
     for BadColumn in BC:
         if not (4 <= BadColumn <= 2047 and type(BadColumn) == int):
             Logger.error("Invalid argument: BC")
             raise ValueError
-        etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="BC")
-        root[1][len(root[1]) - 1][2][x].text = str(BadColumn)
-        x = x + 1
+        arguments.append(("BC", BadColumn))
+
+    root.add("TC_pafCCDBadColumn", relativeTime, comment, arguments)
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -788,17 +680,14 @@ def TC_pafCCDFlushBadColumns(
         Logger.error("Invalid argument: CCDSEL")
         raise ValueError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafCCDFlushBadColumns")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="CCDSEL")
-    root[1][len(root[1]) - 1][2][0].text = str(CCDSEL)
+    root.add(
+        "TC_pafCCDFlushBadColumns",
+        relativeTime,
+        comment,
+        [
+            ("CCDSEL", CCDSEL),
+        ],
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
 
@@ -845,29 +734,18 @@ def TC_pafCCDBIAS(
         )
         raise ValueError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafCCDBIAS")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="CCDSEL")
-    root[1][len(root[1]) - 1][2][0].text = str(CCDSEL)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="VGATE")
-    root[1][len(root[1]) - 1][2][1].text = str(VGATE)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="VSUBST")
-    root[1][len(root[1]) - 1][2][2].text = str(VSUBST)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="VRD")
-    root[1][len(root[1]) - 1][2][3].text = str(VRD)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="VOD")
-    root[1][len(root[1]) - 1][2][4].text = str(VOD)
+    root.add(
+        "TC_pafCCDBIAS",
+        relativeTime,
+        comment,
+        [
+            ("CCDSEL", CCDSEL),
+            ("VGATE", VGATE),
+            ("VSUBST", VSUBST),
+            ("VRD", VRD),
+            ("VOD", VOD),
+        ],
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -892,17 +770,14 @@ def TC_pafCCDSnapshot(
         Logger.error("Invalid argument: CCDSEL")
         raise ValueError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafCCDSNAPSHOT")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="CCDSEL")
-    root[1][len(root[1]) - 1][2][0].text = str(CCDSEL)
+    root.add(
+        "TC_pafCCDSNAPSHOT",
+        relativeTime,
+        comment,
+        [
+            ("CCDSEL", CCDSEL),
+        ],
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
 
@@ -929,20 +804,15 @@ def TC_pafCCDTRANSPARENTCMD(
         Logger.error("Invalid argument: CHAR")
         raise TypeError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafCCDTRANSPARENTCMD")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="CCDSEL")
-    root[1][len(root[1]) - 1][2][0].text = str(CCDSEL)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="CHAR")
-    root[1][len(root[1]) - 1][2][1].text = CHAR
+    root.add(
+        "TC_pafCCDTRANSPARENTCMD",
+        relativeTime,
+        comment,
+        [
+            ("CCDSEL", CCDSEL),
+            ("CHAR", CHAR),
+        ],
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -965,17 +835,14 @@ def TC_pafDbg(root, relativeTime, CCDSEL, Timeline_settings, configFile, comment
         Logger.error("Invalid argument: CCDSEL")
         raise ValueError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafDbg")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="CCDSEL")
-    root[1][len(root[1]) - 1][2][0].text = str(CCDSEL)
+    root.add(
+        "TC_pafDbg",
+        relativeTime,
+        comment,
+        [
+            ("CCDSEL", CCDSEL),
+        ],
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -1005,20 +872,15 @@ def TC_pafPM(
         Logger.error("Invalid argument: TEXPMS or TEXPIMS is not an integer")
         raise TypeError
 
-    etree.SubElement(root[1], "command", mnemonic="TC_pafPM")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "tcArguments")
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="TEXPMS")
-    root[1][len(root[1]) - 1][2][0].text = str(TEXPMS)
-
-    etree.SubElement(root[1][len(root[1]) - 1][2], "tcArgument", mnemonic="TEXPIMS")
-    root[1][len(root[1]) - 1][2][1].text = str(TEXPIMS)
+    root.add(
+        "TC_pafPM",
+        relativeTime,
+        comment,
+        [
+            ("TEXPMS", TEXPMS),
+            ("TEXPIMS", TEXPIMS),
+        ],
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
@@ -1042,15 +904,12 @@ def Payload_Power_Toggle(root, relativeTime, Timeline_settings, configFile, comm
         )
         raise ValueError
 
-    etree.SubElement(root[1], "procedure", id="FCP-MTS-0035_Payload_Power_Toggle")
-
-    etree.SubElement(root[1][len(root[1]) - 1], "relativeTime")
-    root[1][len(root[1]) - 1][0].text = str(int(relativeTime))
-
-    etree.SubElement(root[1][len(root[1]) - 1], "comment")
-    root[1][len(root[1]) - 1][1].text = comment
-
-    etree.SubElement(root[1][len(root[1]) - 1], "parameters")
+    root.add(
+        "FCP-MTS-0035_Payload_Power_Toggle",
+        relativeTime,
+        comment,
+        kind="procedure",
+    )
 
     incremented_time = relativeTime + Timeline_settings["CMD_separation"]
     configFile.latestRelativeTime = relativeTime
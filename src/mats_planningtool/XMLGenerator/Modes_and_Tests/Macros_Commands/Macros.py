@@ -39,7 +39,7 @@ def Mode1(
     6. Set Payload to operational mode
 
     Arguments:
-        root (lxml.etree._Element):  XML tree structure. Main container object for the ElementTree API.
+        root (CommandBuffer):  Buffer which the CMDs are added to, see the *CommandBuffer* module.
         relativeTime (float): The relative starting time of the macro with regard to the start of the timeline [s]
         CCD_settings (:obj:`dict` of :obj:`dict` of int): Settings for the CCDs. Defined in the *Configuration File*.
         sattelite_state (dict): The current sattelite state.
@@ -160,7 +160,7 @@ def Operational_Limb_Pointing_macro(
     6. Set Payload to operational mode
 
     Arguments:
-        root (lxml.etree._Element):  XML tree structure. Main container object for the ElementTree API.
+        root (CommandBuffer):  Buffer which the CMDs are added to, see the *CommandBuffer* module.
         relativeTime (float): The relative starting time of the macro with regard to the start of the timeline [s]
         CCD_settings (:obj:`dict` of :obj:`dict` of int): Settings for the CCDs. Defined in the *Configuration File*.
         pointing_altitude (int): The altitude of the tangential point [m].
@@ -247,7 +247,7 @@ def FullReadout_Operational_Limb_Pointing_macro(root, relativeTime, CCD_settings
     6. Set Payload to operational mode
         
     Arguments:
-        root (lxml.etree._Element):  XML tree structure. Main container object for the ElementTree API.
+        root (CommandBuffer):  Buffer which the CMDs are added to, see the *CommandBuffer* module.
         relativeTime (float): The relative starting time of the macro with regard to the start of the timeline [s]
         CCD_settings (:obj:`dict` of :obj:`dict` of int): Settings for the CCDs.. Defined in the *Configuration File*.
         pointing_altitude (int): The altitude of the tangential point [m].
@@ -302,7 +302,7 @@ def Operational_Sweep_macro(
     7. Start Sweep of satellite.
 
     Arguments:
-        root (lxml.etree._Element):  XML tree structure. Main container object for the ElementTree API.
+        root (CommandBuffer):  Buffer which the CMDs are added to, see the *CommandBuffer* module.
         relativeTime (float): The relative starting time of the macro with regard to the start of the timeline [s]
         CCD_settings (dict of dict of int): Settings for the CCDs.. Defined in the *Configuration File*.
         pointing_altitude_from (int): The altitude in meters from which to start the sweep 
@@ -415,7 +415,7 @@ def Snapshot_Inertial_macro(
     7. If applicable take images with dark setting on the way back to nominal pointing.  
 
     Arguments:
-        root (lxml.etree._Element):  XML tree structure. Main container object for the ElementTree API.
+        root (CommandBuffer):  Buffer which the CMDs are added to, see the *CommandBuffer* module.
         relativeTime (float): The relative starting time of the macro with regard to the start of the timeline [s]
         CCD_settings (dict of dict of int): Settings for the CCDs. Defined in the *Configuration File*.
         FreezeTime (float): Start time of attitude freeze command in on-board time [s].
@@ -604,7 +604,7 @@ def Snapshot_Limb_Pointing_macro(
     4. Take a Snapshot with each CCD (except Nadir and CCDs with TEXPMS=0) with a spacing of *SnapshotSpacing*.
 
     Arguments:
-        root (lxml.etree._Element):  XML tree structure. Main container object for the ElementTree API.
+        root (CommandBuffer):  Buffer which the CMDs are added to, see the *CommandBuffer* module.
         relativeTime (float): The relative starting time of the macro with regard to the start of the timeline [s]
         CCD_settings (dict of dict of int): Settings for the CCDs.. Defined in the *Configuration File*.
         pointing_altitude (int): The altitude of the tangential point [m].
@@ -675,7 +675,7 @@ def NadirSnapshot_Limb_Pointing_macro(
     4. Take a Snapshot with Nadir.
 
     Arguments:
-        root (lxml.etree._Element):  XML tree structure. Main container object for the ElementTree API.
+        root (CommandBuffer):  Buffer which the CMDs are added to, see the *CommandBuffer* module.
         relativeTime (float): The relative starting time of the macro with regard to the start of the timeline [s]
         CCD_settings (dict of dict of int): Settings for the CCDs.. Defined in the *Configuration File*.
         pointing_altitude (int): The altitude of the tangential point [m].
@@ -750,7 +750,7 @@ def TurnONCCDs_macro(root, relativeTime, Timeline_settings, configFile=configFil
     Switches ON all CCDs.
     
     Arguments:
-        root (lxml.etree._Element):  XML tree structure. Main container object for the ElementTree API.
+        root (CommandBuffer):  Buffer which the CMDs are added to, see the *CommandBuffer* module.
         relativeTime (float): The relative starting time of the macro with regard to the start of the timeline [s]
         Timeline_settings (dict): Dictionary containing the settings of the Timeline given in either the *Science_Mode_Timeline* or the *Configuration File*.
         comment (str): A comment for the macro. Will be printed in the genereated XML-file.
@@ -782,7 +782,7 @@ def SetCCDs_macro(
     TEXPIMS for all the CCDs except nadir is set to the same value to allow Synchronization.
 
     Arguments:
-        root (lxml.etree._Element):  XML tree structure. Main container object for the ElementTree API.
+        root (CommandBuffer):  Buffer which the CMDs are added to, see the *CommandBuffer* module.
         relativeTime (float): The relative starting time of the macro with regard to the start of the timeline [s]
         CCD_settings (:obj:`dict` of int): A dict containing Settings for the CCDs. Defined in the *Configuration File*.
         TEXPIMS (int): ExposureIntervalTime for the CCDs (except nadir) in ms.
@@ -1003,7 +1003,7 @@ def OffCCDs_macro(
     Calls SetCCDs_macro with PWR=0
 
     Arguments:
-        root (lxml.etree._Element):  XML tree structure. Main container object for the ElementTree API.
+        root (CommandBuffer):  Buffer which the CMDs are added to, see the *CommandBuffer* module.
         relativeTime (float): The relative starting time of the macro with regard to the start of the timeline [s]
         CCD_settings (:obj:`dict` of int): A dict containing Settings for the CCDs. Defined in the *Configuration File*.
         Timeline_settings (dict): Dictionary containing the settings of the Timeline given in either the *Science_Mode_Timeline* or the *Configuration File*.
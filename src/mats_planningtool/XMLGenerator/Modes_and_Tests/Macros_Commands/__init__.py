@@ -1,4 +1,6 @@
 """In this package are all the CMDs defined as in the "InnoSat Payload Timeline XML Defintion" document. \n
 
 The *Macros* module contain function which define frequently used combination of CMDs.
+
+The *CommandBuffer* module contain the buffer which the CMDs are added to before they are written to file.
 """
\ No newline at end of file
@@ -13,7 +13,7 @@ TurnONCCDs will always call TC_pafCCDMain with fixed arguments to turn ON all CC
 Functions on the form "X", where X is any CMD:
 
     **Arguments:**
-        **root** (*lxml.etree.Element*):  XML tree structure. Main container object for the ElementTree API. lxml.etree.Element class \n
+        **root** (*CommandBuffer*):  Buffer which the CMDs are added to, see the *CommandBuffer* module. \n
         **date** (*ephem.Date*): Starting date of the CMD. On the form of the ephem.Date class. \n
         **duration** (*int*): The duration of the CMD [s] as an integer class. \n
         **relativeTime** (*int*): The starting time [s] of the CMD with regard to the start of the timeline as an integer class \n
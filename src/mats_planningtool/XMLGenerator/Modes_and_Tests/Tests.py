@@ -8,7 +8,7 @@ then calls for macros, which will generate commands in the XML-file. \n
 Functions on the form "X", where the X is any Test, except for 'All_Tests' which schedules every Test.
     
     **Arguments:**
-        **root** (*lxml.etree.Element*):  XML tree structure. Main container object for the ElementTree API. \n
+        **root** (*CommandBuffer*):  Buffer which the CMDs are added to, see the *CommandBuffer* module. \n
         **date** (*ephem.Date*): Starting date of the Test. On the form of the ephem.Date class. \n
         **duration** (*int*): The duration of the test [s]. \n
         **relativeTime** (*int*): The starting time of the mode with regard to the start of the timeline [s]. \n
@@ -621,7 +621,7 @@ def All_Tests(root, date, duration, relativeTime, Timeline_settings, configFile,
             root, date, duration=duration, relativeTime=relativeTime, Timeline_settings=Timeline_settings, configFile=configFile)
 
     "Update duration in the Timeline"
-    root[0][2][1].text = str(relativeTime + Timeline_settings['mode_separation'])
+    root.header[2][1].text = str(relativeTime + Timeline_settings['mode_separation'])
 
 
 def Limb_functional_test(root, date, duration, relativeTime, Timeline_settings, configFile, Test_settings={'ExpTimes': [1000, 2000, 4000, 8000, 16000]}):
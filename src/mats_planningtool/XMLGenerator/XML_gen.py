@@ -17,6 +17,10 @@ Then they either call directly for a Command function, located in the *Commands*
 
 A Macro is a combination of commonly used CMDs. For more information see the *Macros* module inside the *Macros_Commands* package.
 
+The CMDs are collected in a *CommandBuffer* (see the *CommandBuffer* module inside the *Macros_Commands* package).
+The XML file is written while the timeline is converted. The header is written first and the CMDs of each Mode are written to the file
+(and removed from the buffer) as soon as the Mode is done, see *XML_Stream_Writer*.
+
 **Adding your own Mode:** \n
 
 To add your own Mode to be converted into CMDs using *XML_gen* you need to follow these steps: \n
@@ -34,6 +38,7 @@ These outcommented rows of code calls for Mode and CCD settings from the *Config
 """
 
 from .Modes_and_Tests import MODES, Tests, SeparateCMDsAndProcedures
+from .Modes_and_Tests.Macros_Commands.CommandBuffer import CommandBuffer
 from lxml import etree
 import ephem
 import logging
@@ -43,6 +48,7 @@ import os
 import json
 import importlib
 import datetime
+import contextlib
 
 from mats_planningtool import Library
 #from mats_planningtool_Config_File import Timeline_settings, initialConditions, Logger_name, Version
@@ -115,62 +121,64 @@ def XML_generator(configFile, SCIMOD_Path):
     ########    Call function to create XML-tree basis ##########################
     Logger.info('Call function XML_Initial_Basis_Creator')
     Logger.info('')
-    root = XML_Initial_Basis_Creator(
-        timeline_start, timeline_duration, SCIMOD_Path, configFile,version)
+    root = CommandBuffer(XML_Initial_Basis_Creator(
+        timeline_start, timeline_duration, SCIMOD_Path, configFile,version))
+
+    XML_TIMELINE = get_timeline_name(configFile,Timeline_settings)
+
+    "All_Tests updates the header after its CMDs are added, so the header can then not be written first"
+    streaming = not any(str(entry[0]) == 'All_Tests' for entry in SCIMOD)
+
+    Logger.info('Write XML-tree to: '+XML_TIMELINE)
+    with XML_Stream_Writer(XML_TIMELINE, root, streaming) as writer:
+
+        ######## Loop through SCIMOD TIMELINE lIST, selecting one mode at a time #####
+        Logger.info('Loop through Science Mode Timeline List')
 
-    ######## Loop through SCIMOD TIMELINE lIST, selecting one mode at a time #####
-    Logger.info('Loop through Science Mode Timeline List')
+        for x in range(len(SCIMOD)):
 
-    for x in range(len(SCIMOD)):
+            Entry_Name = str(SCIMOD[x][0])
+            StartDate = str(SCIMOD[x][1])
+            EndDate = str(SCIMOD[x][2])
+            Settings = SCIMOD[x][3]
 
-        Entry_Name = str(SCIMOD[x][0])
-        StartDate = str(SCIMOD[x][1])
-        EndDate = str(SCIMOD[x][2])
-        Settings = SCIMOD[x][3]
+            Logger.info('')
+            Logger.info('Iteration number: '+str(x+1))
+            Logger.info(Entry_Name)
 
-        Logger.info('')
-        Logger.info('Iteration number: '+str(x+1))
-        Logger.info(Entry_Name)
+            "Skip the first entry if it only contains Timeline_settings"
+            if(str(SCIMOD[x][0]) == 'Timeline_settings'):
+                continue
 
-        "Skip the first entry if it only contains Timeline_settings"
-        if(str(SCIMOD[x][0]) == 'Timeline_settings'):
-            continue
+            Logger.debug('Start Date: '+StartDate)
+            Logger.debug('End Date: '+EndDate)
 
-        Logger.debug('Start Date: '+StartDate)
-        Logger.debug('End Date: '+EndDate)
+            mode_duration = round((ephem.Date(EndDate) - ephem.Date(StartDate)) * 24*3600)
+            relativeTime = round((ephem.Date(StartDate)-ephem.Date(timeline_start))*24*3600)
+            Logger.debug('mode_duration: '+str(mode_duration))
+            Logger.debug('relativeTime: '+str(relativeTime))
 
-        mode_duration = round((ephem.Date(EndDate) - ephem.Date(StartDate)) * 24*3600)
-        relativeTime = round((ephem.Date(StartDate)-ephem.Date(timeline_start))*24*3600)
-        Logger.debug('mode_duration: '+str(mode_duration))
-        Logger.debug('relativeTime: '+str(relativeTime))
+            if(relativeTime >= timeline_duration):
+                Logger.warning('relativeTime is exceeding timeline_duration!!!')
+                raise ValueError
 
-        if(relativeTime >= timeline_duration):
-            Logger.warning('relativeTime is exceeding timeline_duration!!!')
-            raise ValueError
+            if(ephem.Date(StartDate) < timeline_start or mode_duration+relativeTime > timeline_duration):
+                Logger.warning(
+                    Entry_Name+', is not scheduled within the boundaries of the timeline!!!')
+                raise ValueError
 
-        if(ephem.Date(StartDate) < timeline_start or mode_duration+relativeTime > timeline_duration):
-            Logger.warning(
-                Entry_Name+', is not scheduled within the boundaries of the timeline!!!')
-            raise ValueError
+            Logger.debug('Call XML_generator_select')
+            XML_generator_select(root=root, duration=mode_duration, relativeTime=relativeTime,
+                                 name=Entry_Name, date=ephem.Date(StartDate), Settings=Settings, Timeline_settings=Timeline_settings, configFile=configFile)
 
-        Logger.debug('Call XML_generator_select')
-        XML_generator_select(root=root, duration=mode_duration, relativeTime=relativeTime,
-                             name=Entry_Name, date=ephem.Date(StartDate), Settings=Settings, Timeline_settings=Timeline_settings, configFile=configFile)
+            "Write the CMDs of the mode to the file"
+            writer.flush()
 
     ### Rewrite path string to allow it to be in the name of the generated XML command file ###
     SCIMOD_Path = SCIMOD_Path.replace('\\', '_')
     SCIMOD_Path = SCIMOD_Path.replace('/', '_')
     SCIMOD_Path = SCIMOD_Path.replace('.json', '')
 
-    ### Write finished XML-tree with all commands to a file #######
-
-    XML_TIMELINE = get_timeline_name(configFile,Timeline_settings) 
-        
-    Logger.info('Write XML-tree to: '+XML_TIMELINE)
-    f = open(XML_TIMELINE, 'w')
-    f.write(etree.tostring(root, pretty_print=True, encoding='unicode'))
-    f.close()
-
     statinfo = os.stat(XML_TIMELINE)
     SizeOfXML = statinfo.st_size
     DataLimitInBytes = 20*10**6
@@ -186,6 +194,80 @@ def XML_generator(configFile, SCIMOD_Path):
     return XML_TIMELINE
 
 
+################### XML writer ################################################
+
+class XML_Stream_Writer:
+    """Writes an XML timeline to file incrementally.
+
+    The header of the XML tree is written when the writer is opened. Each call to *flush* writes the CMDs added to
+    the buffer since the last call and then removes them from the buffer, so that only the CMDs of one mode at a time are kept in memory.
+    The file is identical to the one written with *etree.tostring(root.to_xml(), pretty_print=True)*.
+
+    If *streaming* is False, the whole tree is instead written when the writer is closed.
+
+    Arguments:
+        XML_TIMELINE (str): Path of the XML file to write.
+        root (:obj:`CommandBuffer`): Buffer holding the XML tree created by *XML_Initial_Basis_Creator*.
+        streaming (bool): Write the CMDs incrementally.
+
+    """
+
+    def __init__(self, XML_TIMELINE, root, streaming=True):
+        self.XML_TIMELINE = XML_TIMELINE
+        self.root = root
+        self.streaming = streaming
+        self._stack = contextlib.ExitStack()
+        self._commands = contextlib.ExitStack()
+
+    def __enter__(self):
+        if self.streaming:
+            self._file = self._stack.enter_context(open(self.XML_TIMELINE, 'wb'))
+            xf = self._stack.enter_context(etree.xmlfile(self._file, encoding='utf-8'))
+            tree = self.root.tree
+            self._stack.enter_context(xf.element(tree.tag, tree.attrib))
+            self._xf = xf
+            self._write(tree[0], level=1)
+            xf.write('\n  ')
+            self._commands.enter_context(xf.element(tree[1].tag, tree[1].attrib))
+        return self
+
+    def _write(self, element, level):
+        etree.indent(element, space='  ', level=level)
+        element.tail = None
+        self._xf.write('\n' + '  '*level)
+        self._xf.write(element)
+
+    def flush(self):
+        """Writes the CMDs in the buffer and removes them from the buffer."""
+        if not self.streaming:
+            return
+        for command in self.root.take():
+            self._write(command.to_element(), level=2)
+        self._file.flush()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.streaming:
+            if exc_type is None:
+                with open(self.XML_TIMELINE, 'w') as f:
+                    f.write(etree.tostring(self.root.to_xml(), pretty_print=True, encoding='unicode'))
+            return False
+
+        if exc_type is not None:
+            "Leave no partial timeline behind and keep the original exception"
+            self._file.close()
+            os.remove(self.XML_TIMELINE)
+            return False
+
+        self.flush()
+        self._xf.write('\n  ')
+        self._commands.close()
+        self._xf.write('\n')
+        self._stack.close()
+        with open(self.XML_TIMELINE, 'a') as f:
+            f.write('\n')
+        return False
+
+
 ################### XML-tree basis creator ####################################
 
 def XML_Initial_Basis_Creator(timeline_start, timeline_duration, SCIMOD_Path, configFile,version):
@@ -259,7 +341,7 @@ def XML_generator_select(name, root, date, duration, relativeTime, Settings, Tim
 
     Arguments: 
         name (str): The name of the of the mode or test as a string. The name in the XML_generator_name function in OPT_XML_generator_MODES
-        root (lxml.etree.Element): XML tree structure. Main container object for the ElementTree API.
+        root (:obj:`CommandBuffer`): Buffer which the CMDs are added to.
         date (ephem.Date): Starting date of the Mode. On the form of the ephem.Date class.
         duration (int): The duration of the mode [s] as an integer class.
         relativeTime (int): The starting time of the mode with regard to the start of the timeline [s] as an integer class
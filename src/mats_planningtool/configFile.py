@@ -1,14 +1,29 @@
 from mats_planningtool import Library
+from mats_planningtool.RunContext import RunContext, current_run
 
 import json
 import os
 import datetime as DT
 
 
+def _run_state(name):
+    "Attribute which is kept in the current run, see *configFile.run*"
+    return property(
+        lambda self: getattr(self.run(), name),
+        lambda self, value: setattr(self.run(), name, value),
+    )
+
+
 class configFile:
 
     Library.SetupLogger("configFile")
 
+    current_pointing = _run_state("current_pointing")
+    latestRelativeTime = _run_state("latestRelativeTime")
+    LargestSetTEXPMS = _run_state("LargestSetTEXPMS")
+    Mode120Iteration = _run_state("Mode120Iteration")
+    Mode124Iteration = _run_state("Mode124Iteration")
+
     def __init__(
         self,
         config_file_name,
@@ -19,6 +34,11 @@ class configFile:
 
         self.config_file_name = config_file_name
         self.output_dir = 'Output'
+        self.use_cache = True
+        "Number of processes used to run date calculators concurrently in Timeline_gen, None for the number of cores"
+        self.processes = None
+        "TLEs (list of pairs of rows) of an ensemble over which Timeline_gen reports the spread of the dates of events, see TimelineGenerator.Ensemble. None for no ensemble"
+        self.ensemble_TLEs = None
         # self.TLE1 = None
         # self.TLE2 = None
         # self.date = date
@@ -67,11 +87,24 @@ class configFile:
         #     + self.OPT_Config_File["Mode124_settings"]["TimeToConsider"]["seconds"]
         # )
 
-        self.current_pointing = None
-        self.latestRelativeTime = 0
-        self.LargestSetTEXPMS = 0
-        self.Mode120Iteration = 1
-        self.Mode124Iteration = 1
+        "State used outside of runs"
+        self._run = RunContext()
+
+    def run(self):
+        """Returns the state of the current run of *Timeline_gen* or *XML_gen*.
+
+        The attributes *current_pointing*, *latestRelativeTime*, *LargestSetTEXPMS*, *Mode120Iteration* and *Mode124Iteration*
+        are kept in the current run, so that runs in different threads can share the same *configFile*.
+
+        Returns:
+            (:obj:`RunContext`): The run entered in the current thread, or the state of this *configFile* if there is none.
+
+        """
+
+        run = current_run()
+        if run is None:
+            return self._run
+        return run
 
     def Logger_name(self):
         """Returns the name of the shared logger.
@@ -737,7 +770,8 @@ class configFile:
         """
         from mats_planningtool.TimelineGenerator.Core import Timeline_generator
 
-        Timeline_generator(self,test)
+        with RunContext():
+            Timeline_generator(self,test)
 
     def XML_gen(self, SCIMOD_Path=None,test=False):
         """Invokes the XML generator program part of Operational Planning Tool for MATS.
@@ -755,9 +789,6 @@ class configFile:
 
         from .XMLGenerator.XML_gen import XML_generator
 
-        "Initialize current_pointing to None"
-        self.current_pointing = None
-
         if SCIMOD_Path == None:
             
             SCIMOD_Path = self.get_scimod_name(self)
@@ -766,7 +797,11 @@ class configFile:
             #     self.output_dir,
             #     "Science_Mode_Timeline_" + os.path.split(self.config_file_name)[1],
             # )
-        XML_TIMELINE = XML_generator(self, SCIMOD_Path)
+        with RunContext():
+            "Initialize current_pointing to None"
+            self.current_pointing = None
+
+            XML_TIMELINE = XML_generator(self, SCIMOD_Path)
 
         return XML_TIMELINE
 
@@ -830,7 +865,8 @@ class configFile:
             MinimalScienceXMLGenerator,
         )
 
-        MinimalScienceXMLGenerator(self)
+        with RunContext():
+            MinimalScienceXMLGenerator(self)
 
     def Timeline_analyzer(self, science_mode_timeline_path, date):
         """Invokes the Timeline_analyser program part of Operational Planning Tool.
@@ -1,9 +1,14 @@
 import argparse
 from mats_planningtool import configFile as configFile
+from mats_planningtool.OrbitSimulator import Ephemeris
 
 
 def main(args):
+    "Load the ephemeris and timescale once before any simulation"
+    Ephemeris.prewarm()
+
     configfile_original = configFile.configFile(args.configfile)
+    configfile_original.use_cache = not args.no_cache
 
     # "Check the currently chosen Configuration File and the plausibility of its values. Prints out the currently used start date and TLE"
     configfile_original.CheckConfigFile()
@@ -38,6 +43,8 @@ def parse_arguments(argv=None):
                         help="input timelinefile")
     parser.add_argument("-x", "--xmlfile",
                         help="input xmlfile")
+    parser.add_argument("--no-cache", dest="no_cache",
+                        help="recalculate cached simulation results", action="store_true")
 
     return parser.parse_args(argv)
 
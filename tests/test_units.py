@@ -6,21 +6,49 @@ Unit tests for single functions
 @author: Ole Martin Christensen
 """
 
-from mats_planningtool.Library import utc_to_onboardTime
+from mats_planningtool.Library import utc_to_onboardTime, scheduler, OccupiedTimeline, find_crossings, refine_crossings
 from mats_planningtool.OrbitSimulator.MatsBana import Satellite_Simulator
-from mats_planningtool.OrbitSimulator.MatsBana import findpitch
-from mats_planningtool.XMLGenerator.Modes_and_Tests.MODES import check_lat
+from mats_planningtool.OrbitSimulator.MatsBana import Satellite_Simulator_batch, Ensemble_Simulator_batch
+from mats_planningtool.OrbitSimulator.MatsBana import rotate, findpitch
+from mats_planningtool.OrbitSimulator import LimbGeometry, GeoidLib, Ephemeris, EventCalendar, Propagator
+from mats_planningtool.OrbitSimulator.OrbitTable import Satellite_Simulator_table
+from mats_planningtool.XMLGenerator.Modes_and_Tests.MODES import check_lat, skipped_timesteps
 import ephem
+import datetime as DT
 from skyfield import api
 import skyfield.sgp4lib as sgp4lib
+from skyfield.framelib import itrs
 from mats_planningtool import configFile as configFile
+from mats_planningtool.DiskCache import DiskCache, cache_key
+from mats_planningtool import DiskCache as DiskCache_module
+from mats_planningtool.StarCatalogue import StarIndex, build_star_store, load_star_store, bright_stars, magnitude_limit
+from skyfield.data import hipparcos
+from mats_planningtool.XMLGenerator.Modes_and_Tests.Macros_Commands.CommandBuffer import CommandBuffer
+from mats_planningtool.TimelineAnalyzer.Core import TimelineIndex
+from mats_planningtool.Batch import Job, daily_jobs, run_batch, SUMMARY_FILE
+from mats_planningtool.RunContext import RunContext, current_run
+from mats_planningtool.TimelineGenerator import Speculation
+from mats_planningtool.TimelineGenerator.Speculation import date_calculations
+from mats_planningtool.TimelineGenerator.Ensemble import perturbed_TLEs, crossing_spread, eclipse_spread
+from mats_planningtool import StarCatalogue
+from mats_planningtool.TimelineGenerator.Modes.Mode120 import split_tracks, CANDIDATE_DTYPE
+from mats_planningtool.TimelineGenerator.Modes import Mode12X
+import threading
+import concurrent.futures
+import os
+import pytest
+import logging
+from lxml import etree
+import json
 import numpy as np
+import pandas as pd
 from numpy.linalg import norm
+from scipy.optimize import minimize_scalar
 
 
 ts = api.load.timescale()
 
-def get_test_configfile():
+def get_test_configfile(output_dir='test_data_output'):
 
     configfile = "./test_data/config_file_test.json"
 
@@ -31,7 +59,7 @@ def get_test_configfile():
         TLE2="2 54321  97.7044   6.9210 0014595 313.2372  91.8750 14.93194142000010",
     )
 
-    configfile_test.output_dir = 'test_data_output'
+    configfile_test.output_dir = str(output_dir)
 
     return configfile_test
 
@@ -41,6 +69,33 @@ def test_utc_to_onboardTime():
 
     assert output == 1353860643.1
 
+def funpitch(pitch,current_time,tangent_height,pos,yaw,rotmatrix,look_vector=None):
+    if look_vector is None:
+        look_vector = np.array([1,0,0])
+    FOV=rotate(look_vector,yaw,pitch,0,deg=False)
+    FOV=np.matmul(rotmatrix,FOV)
+    tangent_point_solution=findtangent(current_time,pos,FOV)
+    return ((tangent_point_solution.fun-tangent_height)**2)
+
+def funheight(scaling_factor,R,pos,FOV):
+    return GeoidLib.ray_height(GeoidLib.eci2ecef(pos[None],R),GeoidLib.eci2ecef(FOV[None],R),scaling_factor)[0]
+
+def findtangent(current_time,pos,FOV):
+    """Reference implementation of LimbGeometry.find_tangent for a single time"""
+    R=GeoidLib.rotation_to_itrs(current_time)
+    scaling_factor=minimize_scalar(funheight,args=(R,pos,FOV),bracket=(1e5,3e5))
+    return scaling_factor
+
+def reference_findpitch (tangent_height,current_time,pos,yaw,rotmatrix,look_vector=None):
+    """Reference implementation of LimbGeometry.find_pitch for a single time"""
+    if look_vector is None:
+        look_vector = np.array([1,0,0])
+    if look_vector[0]<0:
+        pitch=minimize_scalar(funpitch,args=(current_time,tangent_height,pos,yaw,rotmatrix,look_vector),method="Bounded",bounds=(np.deg2rad(-10),np.deg2rad(30)))
+    else:
+        pitch=minimize_scalar(funpitch,args=(current_time,tangent_height,pos,yaw,rotmatrix,look_vector),method="Bounded",bounds=(np.deg2rad(-30),np.deg2rad(10)))
+    return pitch.x
+
 def test_findpitch():
     tle=['1 99991U 21321B   22010.41666667  .00000000  00000-0  49154-3 0    13',
           '2 99991  97.3120  64.9140 0002205 122.9132 235.5287 15.01280112    07']
@@ -56,7 +111,92 @@ def test_findpitch():
     ECI_pos = np.array([-2612904.44464064, -4229765.15126377, -4853795.12503612])
     rotmatrix=np.array([vunit,yunit,mrunit]).T 
     pitch=findpitch(92000,t, ECI_pos, 0.01821138006266897, rotmatrix)
-    assert (pitch-0.38048642231615376)<1e-9
+    assert abs(pitch+0.38048642231615376)<1e-5
+
+def test_LimbGeometry():
+    tle=['1 99991U 21321B   22010.41666667  .00000000  00000-0  49154-3 0    13',
+          '2 99991  97.3120  64.9140 0002205 122.9132 235.5287 15.01280112    07']
+    sfodin = sgp4lib.EarthSatellite(tle[0],tle[1])
+
+    t=ts.utc(2022,1,11,11,0,np.arange(0,6000,1000))
+    g=sfodin.at(t)
+    ECI_pos=g.position.m.T
+    ECI_vel=g.velocity.m_per_s.T
+    vunit=ECI_vel/norm(ECI_vel,axis=1)[:,None]
+    mrunit=-ECI_pos/norm(ECI_pos,axis=1)[:,None]
+    yunit=np.cross(mrunit,vunit)
+    rotmatrix=np.stack([vunit,yunit,mrunit],axis=2)
+    R=GeoidLib.rotation_to_itrs(t)
+
+    pitch=LimbGeometry.find_pitch(92000, ECI_pos, 0.018, rotmatrix, R)
+    FOV=np.einsum('tij,tj->ti',rotmatrix,LimbGeometry.look_direction(np.array([1,0,0]),0.018,pitch))
+    distance,height=LimbGeometry.find_tangent(ECI_pos, FOV, R)
+
+    for i in range(len(t)):
+        assert abs(pitch[i]-reference_findpitch(92000, t[i], ECI_pos[i], 0.018, rotmatrix[i]))<1e-5
+        tangent=findtangent(t[i], ECI_pos[i], FOV[i])
+        assert abs(distance[i]-tangent.x)<1
+        assert abs(height[i]-tangent.fun)<LimbGeometry.TOLERANCE
+
+def test_GeoidLib():
+    lat=np.linspace(-90,90,19)
+    lon=np.linspace(-170,180,19)
+    height=np.linspace(-1e3,1e6,19)
+    xyz=GeoidLib.geodetic2ecef(lat,lon,height,deg=True)
+    lat2,lon2,height2=GeoidLib.ecef2geodetic(xyz,deg=True)
+    assert np.allclose(lat2,lat,atol=1e-12)
+    assert np.allclose(lon2[1:-1],lon[1:-1],atol=1e-12)
+    assert np.allclose(height2,height,atol=1e-6)
+
+    "Skyfield agrees within its own accuracy"
+    t=ts.utc(2022,1,11,11,0,np.arange(0,6000,1000))
+    g=sgp4lib.EarthSatellite('1 99991U 21321B   22010.41666667  .00000000  00000-0  49154-3 0    13',
+                             '2 99991  97.3120  64.9140 0002205 122.9132 235.5287 15.01280112    07').at(t)
+    R=GeoidLib.rotation_to_itrs(t)
+    lat3,lon3,height3=GeoidLib.ecef2geodetic(GeoidLib.eci2ecef(g.position.m.T,R),deg=True)
+    assert np.allclose(lat3,api.wgs84.latlon_of(g)[0].degrees,atol=1e-6)
+    assert np.allclose(height3,api.wgs84.height_of(g).m,atol=0.01)
+    assert np.allclose(GeoidLib.ecef2eci(GeoidLib.eci2ecef(g.position.m.T,R),R),g.position.m.T)
+
+
+def test_Ephemeris_position():
+    "The interpolated directions agree with the kernel to better than 0.01 arcseconds, also across the end of a day"
+    t=ts.utc(2022,1,11,11,0,np.arange(0,2*86400,997))
+    for name in ['Sun','Moon','Mars']:
+        for apparent in [False,True]:
+            position=Ephemeris.position(name,t,apparent)
+            observed=Ephemeris.earth().at(t).observe(Ephemeris.body(name))
+            expected=(observed.apparent() if apparent else observed).position.km.T
+            angle=np.linalg.norm(np.cross(position,expected),axis=1)/np.linalg.norm(position,axis=1)/np.linalg.norm(expected,axis=1)
+            assert np.rad2deg(angle.max())*3600<0.01
+    assert Ephemeris.position('Sun',t[0]).shape==(3,)
+
+    "The tables are kept in a bounded cache"
+    assert Ephemeris.table('sun',t[0].whole) is Ephemeris.table('Sun',t[0].whole)
+    assert Ephemeris._table.cache_info().maxsize==Ephemeris.TABLE_CACHE_SIZE
+
+
+def test_Propagator():
+    "Several TLEs propagated at once agree with Skyfield to better than a millimetre"
+    TLEs=[["1 54321U 19100G   20172.75043981 0.00000000  00000-0  75180-4 0  0014",
+           "2 54321  97.7044   6.9210 0014595 313.2372  91.8750 14.93194142000010"],
+          ["1 54321U 19100G   20172.75043981 0.00000000  00000-0  75180-4 0  0014",
+           "2 54321  97.7044 186.9210 0014595 313.2372  91.8750 14.93194142000010"]]
+    t=ts.utc(2020,6,21,0,0,np.arange(0,86400,7))
+    position,velocity=Propagator.propagate(TLEs,t)
+    assert position.shape==velocity.shape==(2,len(t),3)
+    for index,TLE in enumerate(TLEs):
+        expected=sgp4lib.EarthSatellite(TLE[0],TLE[1],ts=ts).at(ts.utc(2020,6,21,0,0,np.arange(0,86400,7)))
+        assert np.abs(position[index]-expected.position.km.T).max()<1e-6
+        assert np.abs(velocity[index]-expected.velocity.km_per_s.T).max()<1e-9
+    assert Propagator.position_velocity(TLEs[0],t[0])[0].shape==(1,3)
+
+    "The rotations are calculated without caching anything on the Time object of the caller"
+    R=GeoidLib.rotation_to_itrs(t)
+    assert '_nutation_angles_radians' not in t.__dict__ and 'M' not in t.__dict__
+    expected=itrs.rotation_at(ts.utc(2020,6,21,0,0,np.arange(0,86400,7)))
+    assert np.abs(R-np.moveaxis(expected,-1,0)).max()<1e-12
+
 
 def test_Satellite_Simulator():
 
@@ -106,6 +246,149 @@ def run_Satellite_Simulator(extratime = 0):
     return Satellite_dict   
 
 
+def test_Satellite_Simulator_batch():
+
+    configFile = get_test_configfile()
+    Settings = configFile.Mode120_settings()
+    Timeline_settings = configFile.Timeline_settings()
+    Timeline_settings["yaw_correction"] = True
+
+    TLE = configFile.getTLE()
+    MATS_skyfield = api.EarthSatellite(TLE[0], TLE[1])
+
+    timeline_start = ephem.Date(Timeline_settings['start_date'])
+    times = [ephem.Date(timeline_start + ephem.second*(Settings['freeze_start'] + 300*x)) for x in range(3)]
+
+    batch_dict = Satellite_Simulator_batch(
+        MATS_skyfield, times, Timeline_settings, 92.5)
+
+    for t, current_time in enumerate(times):
+        Satellite_dict = Satellite_Simulator(
+            MATS_skyfield, current_time, Timeline_settings, 92.5)
+        for key in Satellite_dict.keys():
+            assert np.allclose(batch_dict[key][t], Satellite_dict[key], rtol=1e-6, atol=1e-6)
+
+
+def test_Satellite_Simulator_table(tmp_path, caplog):
+    "Only the satellite of the config file is read from the orbit table, other TLEs are simulated"
+    configFile = get_test_configfile(tmp_path)
+    Timeline_settings = configFile.Timeline_settings()
+    Timeline_settings['duration']['duration'] = 1200
+    pointing_altitude = Timeline_settings['StandardPointingAltitude']/1000
+    TLE = configFile.getTLE()
+    perturbed = perturbed_TLEs(TLE, [10])[0]
+
+    times = [DT.datetime(2020, 9, 25, 16, 50) + DT.timedelta(seconds=60*x+7) for x in range(10)]
+    table_dict = Satellite_Simulator_table(
+        configFile, Timeline_settings, api.EarthSatellite(TLE[0], TLE[1]), times, pointing_altitude)
+    perturbed_dict = Satellite_Simulator_table(
+        configFile, Timeline_settings, api.EarthSatellite(perturbed[0], perturbed[1]), times, pointing_altitude)
+    batch_dict = Satellite_Simulator_batch(
+        api.EarthSatellite(perturbed[0], perturbed[1]), times, Timeline_settings, pointing_altitude)
+    assert np.abs(table_dict['Position [km]'] - perturbed_dict['Position [km]']).max() > 50
+    for key in batch_dict.keys():
+        assert np.allclose(perturbed_dict[key], batch_dict[key])
+
+    caplog.set_level(logging.DEBUG, logger="OPT_logger")
+    Satellite_Simulator_table(
+        configFile, Timeline_settings, api.EarthSatellite(TLE[0], TLE[1]), times[:1], pointing_altitude,
+        True, logging.getLogger("OPT_logger"))
+    assert "Vector to Satellite [km]" in caplog.text
+
+
+def test_Ensemble_Simulator_batch():
+    "A TLE which is 10 s ahead of MATS is where MATS is 10 s later, each TLE of an ensemble is simulated as by Satellite_Simulator_batch"
+    configFile = get_test_configfile()
+    Timeline_settings = configFile.Timeline_settings()
+    TLE = configFile.getTLE()
+    TLEs = [TLE] + perturbed_TLEs(TLE, [10])
+
+    times = [DT.datetime(2020, 9, 25, 17) + DT.timedelta(seconds=60*x) for x in range(20)]
+    later = [time + DT.timedelta(seconds=10) for time in times]
+    ensemble_dict = Ensemble_Simulator_batch(TLEs, times, Timeline_settings, 92.5)
+    batch_dict = Satellite_Simulator_batch(api.EarthSatellite(TLE[0], TLE[1]), later, Timeline_settings, 92.5)
+    assert ensemble_dict['Position [km]'].shape == (2, 20, 3)
+    assert np.abs(ensemble_dict['Position [km]'][1] - batch_dict['Position [km]']).max() < 1
+
+    members_dict = Ensemble_Simulator_batch(TLEs, later, Timeline_settings, 92.5, np.zeros(20, dtype=int))
+    for key in batch_dict.keys():
+        assert np.allclose(members_dict[key], batch_dict[key])
+
+
+def test_crossing_spread(monkeypatch):
+    "A TLE which is ahead of MATS by an offset sees a star cross V_offset earlier by the offset"
+    configfile = get_test_configfile()
+    Timeline_settings = configfile.Timeline_settings()
+    TLE = configfile.getTLE()
+
+    "A star on the optical axis at the crossing of the timeline"
+    crosstime = DT.datetime(2020, 9, 25, 17)
+    Satellite_dict = Satellite_Simulator(api.EarthSatellite(TLE[0], TLE[1]), crosstime, Timeline_settings, 92.5)
+    df = pd.DataFrame({'hip': [1], 'magnitude': [1.0], 'ra_degrees': [Satellite_dict['RA_OpticalAxis [degrees]']],
+                       'dec_degrees': [Satellite_dict['Dec_OpticalAxis [degrees]']], 'parallax_mas': [0.0],
+                       'ra_mas_per_year': [0.0], 'dec_mas_per_year': [0.0]})
+    df = df.assign(ra_hours=df['ra_degrees']/15, epoch_year=1991.25).set_index('hip')
+    monkeypatch.setattr(StarCatalogue, 'stars_dataframe', lambda Vmag: df)
+    SpottedStarList = [{'Name': 1, 'Date': crosstime.strftime('%Y-%m-%d %H:%M:%S.%f')}]
+
+    timeline = crossing_spread(configfile, SpottedStarList, 0, 92.5, [TLE])[0]
+    assert timeline['Ensemble_found'] == 1 and abs(timeline['Date_offset [s]']) < 1
+    for offset in (-5, 10):
+        shifted = crossing_spread(configfile, SpottedStarList, 0, 92.5, perturbed_TLEs(TLE, [offset]))[0]
+        assert abs(shifted['Date_offset [s]'] - timeline['Date_offset [s]'] + offset) < 0.1
+
+
+def test_eclipse_spread(tmp_path):
+    "The nadir eclipse events of TLEs ahead of MATS by offsets are shifted by minus the offsets"
+    configfile = get_test_configfile(tmp_path)
+    configfile.Timeline_settings()['duration']['duration'] = 3*3600
+    offsets = [-5, 0, 5, 30]
+
+    events = eclipse_spread(configfile, perturbed_TLEs(configfile.getTLE(), offsets))
+    assert {event['Event'] for event in events} == {'nadir_eclipse_entry', 'nadir_eclipse_exit'}
+    for event in events:
+        assert event['Ensemble_found'] == event['Ensemble_size'] == 4
+        assert abs(event['Date_offset [s]'] + np.mean(offsets)) < 0.5
+        assert abs(event['Date_spread [s]'] - (max(offsets) - min(offsets))) < 0.5
+
+
+def test_EventCalendar():
+    "Orbits of 6000 s with the ascending nodes at 500 s and 6500 s, the terminator is at 5 degrees latitude"
+    class Table:
+        start = DT.datetime(2022,11,4,18)
+        def column(self, name, seconds):
+            latitude = 80*np.sin(2*np.pi*(seconds-500)/6000)
+            if name == 'SolarZenithAngleNadir':
+                return 95-latitude
+            return latitude
+
+    calendar = EventCalendar.EventCalendar(Table(), 11000)
+    start = calendar.start
+    second = ephem.second
+    assert not calendar.state('northern', start)
+    assert calendar.state('nadir_eclipse', start)
+    assert not calendar.state('nadir_eclipse', start+2000*second)
+
+    nodes = calendar.events(kinds=['ascending_node'])
+    assert len(nodes) == 2 and abs(nodes[0][0]-(start+500*second)) < 0.02*second
+    time, name = calendar.next_event(start+1000*second)
+    assert name == 'dusk' and start+3000*second < time < start+3500*second
+    assert abs(calendar.next_event(start+1000*second, ['descending_node'])[0]-(start+3500*second)) < 0.02*second
+    assert [name for time, name in calendar.events(start+3000*second, start+4000*second)] == ['dusk', 'descending_node', 'nadir_eclipse_entry']
+
+    north = calendar.latitude_condition(45)
+    south = calendar.latitude_condition(-45)
+    assert list(calendar.state(north, start+np.array([100, 2000, 5000])*second)) == [False, True, False]
+    assert list(calendar.state(south, start+np.array([100, 2000, 5000])*second)) == [False, False, True]
+    assert calendar.state(calendar.latitude_condition(-999), start)
+    assert len(calendar.events(kinds=calendar.event_names(north))) == 4
+
+    "Timesteps of 8 s up to the one at or after the ascending node at 500 s, or at or after the end of the mode"
+    assert skipped_timesteps(calendar, start, start+1000*second, 8, ['ascending_node']) == 62
+    assert skipped_timesteps(calendar, start, start+100*second, 8, ['ascending_node']) == 12
+    assert skipped_timesteps(calendar, start+499*second, start+1000*second, 8, ['ascending_node']) == 0
+
+
 def test_check_lat():
     lat_limit = 45
     assert check_lat(-60,lat_limit) == False
@@ -122,6 +405,335 @@ def test_check_lat():
     assert check_lat(60,lat_limit) == False
 
 
+def test_DiskCache(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_size=2500)
+    keys = [cache_key("test", n) for n in range(3)]
+    assert len(set(keys)) == 3
+
+    "Increasing CACHE_VERSION invalidates all keys"
+    monkeypatch.setattr(DiskCache_module, "CACHE_VERSION", DiskCache_module.CACHE_VERSION + 1)
+    assert cache_key("test", 0) != keys[0]
+    monkeypatch.undo()
+
+    cache.put(keys[0], np.zeros(100))
+    cache.put(keys[1], np.ones(100))
+    assert np.all(cache.get(keys[0]) == 0)
+
+    "keys[1] is now the least recently used entry and is evicted first"
+    cache.put(keys[2], np.ones(100))
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+
+
+def test_star_store(tmp_path, monkeypatch):
+    "Stars without a magnitude are dropped and the rest are sorted by magnitude"
+    rows = [(11, 3.5, 10.0, 20.0), (12, 1.25, 30.0, -40.0), (13, None, 50.0, 60.0), (14, 2.0, 70.0, 80.0)]
+    names = hipparcos._COLUMN_NAMES
+    with open(tmp_path / 'hip_main.dat', 'w') as hip_main:
+        for hip, magnitude, ra, dec in rows:
+            fields = [''] * len(names)
+            fields[names.index('HIP')] = str(hip)
+            fields[names.index('Vmag')] = '     ' if magnitude is None else str(magnitude)
+            fields[names.index('RAdeg')] = str(ra)
+            fields[names.index('DEdeg')] = str(dec)
+            fields[names.index('Plx')] = '1.0'
+            fields[names.index('pmRA')] = '2.0'
+            fields[names.index('pmDE')] = '3.0'
+            hip_main.write('|'.join(fields) + '\n')
+
+    path = str(tmp_path / 'data' / 'stars.npy')
+    built = build_star_store(str(tmp_path / 'hip_main.dat'), path)
+    store = load_star_store(path)
+    assert np.array_equal(store, built)
+    assert list(store['hip']) == [12, 14, 11]
+    assert list(store['ra_degrees']) == [30.0, 70.0, 10.0]
+
+    assert magnitude_limit('<=2') == (2.0, True)
+    assert magnitude_limit(' <2') == (2.0, False)
+    assert magnitude_limit(2) == (2.0, True)
+    assert list(bright_stars(2, path)['hip']) == [12, 14]
+    assert list(bright_stars('<2', path)['hip']) == [12]
+    assert list(bright_stars(5, path)['hip']) == [12, 14, 11]
+
+    with pytest.raises(FileNotFoundError):
+        load_star_store(str(tmp_path / 'missing.npy'))
+
+    "The environment variable overrides the default path"
+    monkeypatch.setenv(StarCatalogue.STAR_STORE_ENV, path)
+    assert StarCatalogue.star_store_path() == path
+    assert list(bright_stars(2)['hip']) == [12, 14]
+    monkeypatch.delenv(StarCatalogue.STAR_STORE_ENV)
+    assert StarCatalogue.star_store_path() == StarCatalogue.STAR_STORE_PATH
+
+
+def test_StarIndex():
+    rng = np.random.default_rng(0)
+    stars = rng.normal(size=(5000, 3))
+    stars = stars / norm(stars, axis=1)[:, None]
+    index = StarIndex(stars)
+
+    angle = np.linspace(0, 1, 300)
+    track = np.stack([np.cos(angle), np.sin(angle), np.zeros(len(angle))], axis=1)
+    closest = np.rad2deg(np.arccos(np.clip(stars @ track.T, -1, 1))).min(axis=1)
+
+    "All stars within the radius of the track must be found"
+    assert set(np.nonzero(closest <= 5)[0]) <= set(index.query_track(track, 5))
+    assert np.all(np.abs(stars[index.query_band([0, 0, 1], 5), 2]) <= np.sin(np.deg2rad(5)))
+
+
+def test_scheduler():
+    start = DT.datetime(2022, 11, 4, 18)
+    minutes = [DT.timedelta(minutes=x) for x in range(60)]
+    Occupied_Timeline = OccupiedTimeline({'Mode1': [], 'Mode2': []})
+    Occupied_Timeline['Mode1'].append((start + minutes[10], start + minutes[20]))
+    Occupied_Timeline['Mode2'].append((start + minutes[15], start + minutes[30]))
+    Occupied_Timeline.insert('Mode2', start + minutes[35], start + minutes[40])
+
+    assert scheduler(Occupied_Timeline, start, start + minutes[5]) == (start, start + minutes[5], 0)
+    assert scheduler(Occupied_Timeline, start + minutes[5], start + minutes[15]) == (start + minutes[40], start + minutes[50], 3)
+    assert scheduler(Occupied_Timeline, start + minutes[25], start + minutes[30]) == (start + minutes[30], start + minutes[35], 1)
+    assert Occupied_Timeline.overlaps(start + minutes[30], start + minutes[35])
+    assert not Occupied_Timeline.overlaps(start + minutes[30], start + minutes[35], touching=False)
+    assert Occupied_Timeline.overlaps(start + minutes[21], start + minutes[22], touching=False)
+    assert not Occupied_Timeline.overlaps(start + minutes[41], start + minutes[50])
+    assert list(Occupied_Timeline.gaps(start, start + minutes[50])) == [
+        (start, start + minutes[10]), (start + minutes[30], start + minutes[35]), (start + minutes[40], start + minutes[50])]
+    assert list(Occupied_Timeline.free_windows(start, start + minutes[50], minutes[6], minutes[1])) == [
+        (start, start + minutes[9]), (start + minutes[40], start + minutes[49])]
+
+
+def test_find_crossings():
+    def functions(seconds):
+        return np.stack([np.sin(2 * np.pi * seconds / 5700), seconds - 1000.5], axis=1)
+
+    crossings, columns = find_crossings(functions, 10, 12000, 60, tolerance=0.01)
+    assert list(columns) == [1, 0, 0, 0, 0]
+    assert np.allclose(crossings, [1000.5, 2850, 5700, 8550, 11400], atol=0.01)
+
+
+def test_refine_crossings():
+    roots = np.array([3.3, 47.25])
+    crossings = refine_crossings(lambda seconds: seconds - roots, [0, 40], [10, 50], tolerance=1e-4)
+    assert np.all(crossings >= roots)
+    assert np.allclose(crossings, roots, atol=1e-4)
+
+
+def test_CommandBuffer():
+    tree = etree.Element('InnoSatTimeline')
+    etree.SubElement(tree, 'description')
+    etree.SubElement(tree, 'listOfCommands')
+    root = CommandBuffer(tree)
+
+    root.add('TC_pafPM', 20, 'PM', [('TEXPMS', 1000), ('TEXPIMS', 1500)])
+    root.add('TC_pafMODE', 10.7, '', [('MODE', 2)])
+    root.add('TC_pafMODE', 10, '', [('MODE', 2)])
+    root.add('FCP-MTS-0035_Payload_Power_Toggle', 30, 'toggle', kind='procedure')
+
+    assert root.remove_duplicates() == 1
+    with pytest.raises(ValueError):
+        root.validate()
+    root.sort()
+    root.validate(duration=30)
+
+    assert [command['mnemonic'] for command in json.loads(root.to_json())] == [
+        'TC_pafMODE', 'TC_pafPM', 'FCP-MTS-0035_Payload_Power_Toggle']
+    tree = root.to_xml()
+    assert tree[1][1].attrib['mnemonic'] == 'TC_pafPM'
+    assert [argument.text for argument in tree[1][1][2]] == ['1000', '1500']
+    assert tree[1][2].attrib['id'] == 'FCP-MTS-0035_Payload_Power_Toggle' and tree[1][2][2].tag == 'parameters'
+    assert len(root.take()) == 3 and len(root) == 0
+
+
+def test_TimelineIndex():
+    Mode_Timeline = [
+        ['Timeline_settings', {}],
+        ['Mode1', '2022/11/04 18:00:00', '2022/11/04 18:10:00', {'a': 1}],
+        ['Mode2', '2022/11/04 18:20:00', '2022/11/04 18:30:00', {'b': 2}],
+        ['Mode120', '2022/11/04 18:25:00', '2022/11/04 18:40:00', {'c': 3}],
+    ]
+    index = TimelineIndex(Mode_Timeline)
+
+    dates = ['2022/11/04 17:59:59', '2022/11/04 18:00:00', '2022/11/04 18:15:00',
+             '2022/11/04 18:26:00', '2022/11/04 18:39:59', '2022/11/04 18:40:00']
+    "Mode2 is scheduled until 18:30 and comes first in the timeline, so it is returned where it overlaps Mode120"
+    assert list(index.lookup(dates)) == [-1, 0, 0, 1, 2, -1]
+    Modes, Settings = index.get_modes(np.array(['2022-11-04T18:21', '2022-11-04T19:00'], dtype='datetime64[s]'))
+    assert list(Modes) == ['Mode2', None]
+    assert Settings[0] is Mode_Timeline[2][3] and Settings[1] is None
+
+
+def test_run_batch(tmp_path):
+    jobs = daily_jobs('missing_config_file.json', '2022/11/04 18:00:00', 2, duration=3600)
+    assert [job.name for job in jobs] == ['missing_config_file_20221104-180000', 'missing_config_file_20221105-180000']
+
+    results = run_batch(jobs, str(tmp_path), processes=2)
+    assert [result['succeeded'] for result in results] == [False, False]
+    assert 'FileNotFoundError' in results[0]['error']
+    with open(tmp_path / SUMMARY_FILE) as summary_file:
+        assert json.load(summary_file) == results
+    assert (tmp_path / jobs[1].name / 'job.log').exists()
+
+
+class StubConfigFile:
+    "Writes empty timelines instead of generating them"
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def CheckConfigFile(self):
+        pass
+
+    def Timeline_gen(self):
+        open(os.path.join(self.output_dir, 'Science_Mode_Timeline.json'), 'w').close()
+
+    def XML_gen(self):
+        open(os.path.join(self.output_dir, 'XML_Timeline.xml'), 'w').close()
+
+
+class StubJob(Job):
+    def configure(self, output_dir):
+        return StubConfigFile(output_dir)
+
+
+def test_run_batch_succeeded(tmp_path):
+    jobs = [StubJob(job.config_file, job.start_date, job.duration)
+            for job in daily_jobs('config_file.json', '2022/11/04 18:00:00', 3, duration=3600)]
+
+    results = run_batch(jobs, str(tmp_path), processes=2)
+    with open(tmp_path / SUMMARY_FILE) as summary_file:
+        summary = json.load(summary_file)
+    assert [result['name'] for result in summary] == [
+        'config_file_20221104-180000', 'config_file_20221105-180000', 'config_file_20221106-180000']
+    assert all(result['succeeded'] and result['error'] is None for result in summary)
+    assert summary[2]['files'] == ['Science_Mode_Timeline.json', 'XML_Timeline.xml']
+    assert summary == results
+
+
+def test_RunContext():
+    configfile = get_test_configfile()
+    configfile.latestRelativeTime = 5
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def run(number):
+        with RunContext():
+            assert configfile.latestRelativeTime == 0
+            configfile.latestRelativeTime = number
+            barrier.wait()
+            results[number] = configfile.latestRelativeTime
+
+    threads = [threading.Thread(target=run, args=(number,)) for number in (10, 20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {10: 10, 20: 20}
+    assert configfile.latestRelativeTime == 5
+
+
+def enter_run(run):
+    "Enters a run sent to a worker process and returns its state"
+    with run:
+        return current_run().id, current_run().latestRelativeTime, current_run().precomputed, len(current_run().logger.handlers)
+
+
+def test_RunContext_pickle():
+    run = RunContext()
+    run.latestRelativeTime = 7
+    run.precomputed['key'] = [1, 2]
+    run.set_handlers([logging.NullHandler()])
+
+    "The logger stays in this process, so the unpickled run has a new logger without handlers"
+    with run:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(enter_run, run).result() == (run.id, 7, {'key': [1, 2]}, 0)
+        assert current_run() is run
+    assert current_run() is None
+
+
+def V_offset_calculation(configfile, Iteration):
+    "Date calculation which reads the config file it is sent with"
+    return configfile.Mode120_settings()['V_offset'][Iteration-1]*10 + Iteration, os.getpid()
+
+
+def test_speculate(tmp_path, monkeypatch):
+    configfile = get_test_configfile(tmp_path)
+    configfile.use_cache = False
+    configfile.processes = 2
+    configfile.Mode120_settings()['V_offset'] = [0, 0.5, 1]
+    calculations = [(('V_offset', Iteration), V_offset_calculation, (configfile, Iteration)) for Iteration in (1, 2, 3)]
+    monkeypatch.setattr(Speculation, 'date_calculations', lambda configFile, Scheduling_priority: calculations)
+
+    with RunContext():
+        Speculation.speculate(configfile, ['Mode120'])
+        for key, function, arguments in calculations:
+            result = Speculation.precomputed(configfile, key, function, *arguments)
+            serial = function(*arguments)
+            "Calculated in a worker process with the same result as in this process"
+            assert result[0] == serial[0] and result[1] != serial[1]
+        assert [Speculation.precomputed(configfile, key, function, *arguments)[0]
+                for key, function, arguments in calculations] == [1, 7, 13]
+
+
+def test_date_calculations(tmp_path):
+    configfile = get_test_configfile(tmp_path)
+    Scheduling_priority = ['PM', 'Mode124', 'Mode120', 'Mode120', 'Mode120']
+
+    "Mode124 has no settings and the V_offsets of Mode120 are equal"
+    assert len(date_calculations(configfile, Scheduling_priority)) == 1
+
+    configfile.Mode120_settings()['V_offset'] = [0, 0.5, 1, 1.5]
+    configfile.Mode120_settings()['H_offset'] = [0, 0, 0, 0]
+    calculations = date_calculations(configfile, Scheduling_priority)
+    assert [arguments[6] for key, function, arguments in calculations] == [0, 0.5, 1]
+
+
+def test_split_tracks():
+    candidates = np.zeros(6, dtype=CANDIDATE_DTYPE)
+    candidates['star'] = [7, 3, 3, 3, 7, 3]
+    candidates['timestep'] = [9, 1, 2, 8, 10, 4]
+
+    "The track of star 7 reaches the last timestep and may continue in the next window"
+    tracks, unfinished = split_tracks(candidates, 10)
+    assert [list(track['timestep']) for track in tracks] == [[1, 2, 4], [8]]
+    assert list(unfinished['timestep']) == [9, 10]
+
+    tracks, unfinished = split_tracks(unfinished, 11)
+    assert [list(track['star']) for track in tracks] == [[7, 7]]
+    assert len(unfinished) == 0
+
+
+def test_Mode12X_date_calculator(tmp_path, monkeypatch, caplog):
+    "A star on the optical axis is seen, a star at the orbit normal is removed before the simulation"
+    configfile = get_test_configfile(tmp_path)
+    Timeline_settings = configfile.Timeline_settings()
+    Settings = {'automatic': True, 'log_timestep': 60, 'timestep': 20, 'TimeToConsider': {'TimeToConsider': 200},
+                'freeze_start': 100, 'Vmag': 4, 'pointing_altitude': 227000, 'V_FOV': 2, 'H_FOV': 5.67,
+                'TimeSkip': {'TimeSkip': 1}}
+
+    TLE = configfile.getTLE()
+    MATS_skyfield = api.EarthSatellite(TLE[0], TLE[1])
+    start = ephem.Date(Timeline_settings['start_date'])
+    Satellite_dict = Satellite_Simulator(MATS_skyfield, ephem.Date(start+ephem.second*140), Timeline_settings, 227)
+
+    stars = np.zeros(2, dtype=[('hip', '<i4'), ('magnitude', '<f8'), ('ra_degrees', '<f8'), ('dec_degrees', '<f8')])
+    stars['hip'] = [1, 2]
+    stars['magnitude'] = [1.5, -1]
+    stars['ra_degrees'] = [Satellite_dict['RA_OpticalAxis [degrees]'], 0]
+    stars['dec_degrees'] = [Satellite_dict['Dec_OpticalAxis [degrees]'], 0]
+    normal = Satellite_dict['OrbitNormal']
+    stars['ra_degrees'][1] = np.rad2deg(np.arctan2(normal[1], normal[0])) % 360
+    stars['dec_degrees'][1] = np.rad2deg(np.arcsin(normal[2]))
+    monkeypatch.setattr(Mode12X, 'bright_stars', lambda Vmag: stars)
+
+    caplog.set_level(logging.DEBUG, logger="OPT_logger")
+    date_magnitude_array = Mode12X.date_calculator(Settings, configfile)
+    assert "1 of 2 stars are close to the orbital plane" in caplog.text
+    assert date_magnitude_array[2, 1] == 1.5
+    assert np.all(date_magnitude_array[:, 1] >= 1.5)
+
+
 if __name__ == "__main__":
 
     test_check_lat()
\ No newline at end of file